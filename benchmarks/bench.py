@@ -0,0 +1,302 @@
+"""
+罗盘生成的基准测试。
+
+对每个生成函数 (五个单图脚本、pyluopan.compass、批量模式) 按 半径 × 取点精度 × 环数 × 批量大小 的矩阵运行，
+记录 耗时 (多次运行取最小值)、峰值内存 (tracemalloc)、顶点数 和 输出字节数，
+可与保存的基线比较 (超过阈值视为退化)，并检查各脚本的默认输出与 kml/ 中的参考文件在数值容差内一致。
+
+用法:
+    python benchmarks/bench.py                          # 运行全部用例并打印结果
+    python benchmarks/bench.py -k compass --repeat 5    # 只运行名称含 compass 的用例
+    python benchmarks/bench.py --save-baseline          # 把结果保存为基线 (benchmarks/baseline.json)
+    python benchmarks/bench.py --compare                # 与基线比较，有退化时返回非0 (须先在本机 --save-baseline)
+    python benchmarks/bench.py --check-reference        # 只检查与 kml/ 参考文件的一致性
+"""
+import argparse
+import contextlib
+import gc
+import importlib.util
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIR = os.path.join(ROOT, "source")
+REFERENCE_DIR = os.path.join(ROOT, "kml")
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline.json")
+sys.path.insert(0, SOURCE_DIR)
+
+from pyluopan.batch import run_batch  # noqa: E402
+from pyluopan.compass import DEFAULT_RINGS, create_kml_compass  # noqa: E402
+from pyluopan.kmldiff import diff_kml  # noqa: E402
+
+CENTER = (39.9163, 116.3972)
+
+# --- 用例矩阵 ---
+RADII = (100, 1000, 10000, 100000)
+# 取点精度: None 为固定0.5度取点，其余为弧线最大弦高误差 (米)
+TOLERANCES = (None, 1.0, 0.1)
+RING_COUNTS = (1, 2, 3, 4)
+BATCH_SIZES = (1, 8, 32)
+# 密集环用例: 逐扇区输出与合并输出 (merge)、标签避让 (declutter)、线框 (wireframe) 对比
+DENSE_RINGS = ("360du", "dense120", "dense72", "60toudi")
+DENSE_VARIANTS = (("split", {}), ("merged", {"merge": True}), ("merged_declutter", {"merge": True, "declutter": True}),
+                  ("wireframe", {"wireframe": True}))
+
+# 与基线比较时允许的相对增幅，超过即为退化 (顶点数和字节数是确定的，不允许增加)
+THRESHOLDS = {"seconds": 0.25, "peak_bytes": 0.25, "vertices": 0.0, "bytes": 0.0}
+
+# 与参考文件比较时坐标允许的最大偏差 (米)
+REFERENCE_TOLERANCE_M = 0.001
+
+# 参考文件生成后有意改变的地标: {文件名: {地标名称, ...}}
+# celestial_triple_ring_map.kml 由旧的内置数据生成，其中 子 (十二地支) 只画到360度；工作簿中为345~15度。
+EXPECTED_DIFFERENCES = {"celestial_triple_ring_map.kml": {"子"}}
+
+_COORDS = re.compile(r"<coordinates>(.*?)</coordinates>", re.S)
+
+
+# ==============================================================================
+# 加载单图脚本
+# ==============================================================================
+
+def load_script(file_name):
+    """
+    按文件名加载 source/ 下的单图脚本 (文件名含 + 和空格，不能直接import)。
+    没有 __main__ 保护的脚本在导入时会直接生成文件，因此在临时目录中导入并丢弃其输出。
+    """
+    spec = importlib.util.spec_from_file_location(f"_bench_{len(sys.modules)}", os.path.join(SOURCE_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(tmp)
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            os.chdir(cwd)
+    return module
+
+
+def _scripts():
+    """
+    返回 {脚本文件名: 模块}，各脚本只加载一次。
+    """
+    if not _scripts.cache:
+        for name in ("import math.py", "28xiu.py", "28xiu+24shan.py", "28xiu+24shan+12dizhi.py", "28xiu+24shan+12dizhi+8卦.py"):
+            _scripts.cache[name] = load_script(name)
+    return _scripts.cache
+
+
+_scripts.cache = {}
+
+
+def script_call(file_name, radius=None, tolerance=None):
+    """
+    返回一个函数 f(target)，用脚本自身的配置常量调用该脚本的生成函数，把KML写入target。
+    radius/tolerance 不为None时覆盖脚本中的半径和弧线精度。
+    """
+    m = _scripts()[file_name]
+    if file_name == "import math.py":
+        r = radius or m.RADIUS_METERS
+        return lambda target: m.create_kml_circle_with_ticks(m.CENTER_LONGITUDE, m.CENTER_LATITUDE, r, m.TICK_LENGTH_METERS * r / m.RADIUS_METERS,
+                                                              m.NUMBER_OF_TICKS, target)
+    if file_name == "28xiu.py":
+        return lambda target: m.create_kml_celestial_map(m.CENTER_LATITUDE, m.CENTER_LONGITUDE, radius or m.RADIUS_METERS, target, tolerance)
+    if file_name == "28xiu+24shan.py":
+        return lambda target: m.create_kml_dual_ring(m.CENTER_LATITUDE, m.CENTER_LONGITUDE, radius or m.RING_1_OUTER_RADIUS_METERS, m.RING_1_THICKNESS_PERCENT,
+                                                      m.GAP_BETWEEN_RINGS_PERCENT, m.RING_2_THICKNESS_PERCENT, target, tolerance)
+    if file_name == "28xiu+24shan+12dizhi.py":
+        return lambda target: m.create_kml_triple_ring(m.CENTER_LATITUDE, m.CENTER_LONGITUDE, radius or m.RING_1_OUTER_RADIUS_METERS, m.RING_1_THICKNESS_PERCENT,
+                                                        m.GAP_1_2_PERCENT, m.RING_2_THICKNESS_PERCENT, m.GAP_2_3_PERCENT, m.RING_3_THICKNESS_PERCENT, target, tolerance)
+    return lambda target: m.create_kml_ultimate_map(m.CENTER_LATITUDE, m.CENTER_LONGITUDE, radius or m.RING_1_OUTER_RADIUS_METERS, m.RING_1_THICKNESS_PERCENT,
+                                                     m.GAP_1_2_PERCENT, m.RING_2_THICKNESS_PERCENT, m.GAP_2_3_PERCENT, m.RING_3_THICKNESS_PERCENT,
+                                                     m.GAP_3_4_PERCENT, m.RING_4_THICKNESS_PERCENT, target, tolerance)
+
+
+# ==============================================================================
+# 用例
+# ==============================================================================
+
+def _tolerance_tag(tolerance):
+    return "step0.5" if tolerance is None else f"tol{tolerance:g}m"
+
+
+def build_cases():
+    """
+    返回 [(用例名称, f(target)), ...]。f 把输出写入target (文本流) 并返回None。
+    """
+    cases = []
+    for radius in RADII:
+        cases.append((f"circle_with_ticks/r{radius}", script_call("import math.py", radius)))
+        for tolerance in TOLERANCES:
+            tag = f"r{radius}/{_tolerance_tag(tolerance)}"
+            cases.append((f"celestial_map/{tag}", script_call("28xiu.py", radius, tolerance)))
+            cases.append((f"dual_ring/{tag}", script_call("28xiu+24shan.py", radius, tolerance)))
+            cases.append((f"triple_ring/{tag}", script_call("28xiu+24shan+12dizhi.py", radius, tolerance)))
+            cases.append((f"ultimate_map/{tag}", script_call("28xiu+24shan+12dizhi+8卦.py", radius, tolerance)))
+            for n in RING_COUNTS:
+                cases.append((f"compass/rings{n}/{tag}", lambda target, r=radius, t=tolerance, n=n: create_kml_compass(
+                    *CENTER, r, target, rings=DEFAULT_RINGS[:n], thick_pcts=(20, 20, 20, 15)[:n], gap_pcts=(5, 5, 5)[:n - 1], tolerance_m=t)))
+        for tag, options in DENSE_VARIANTS:
+            cases.append((f"dense/{tag}/r{radius}", lambda target, r=radius, o=options: create_kml_compass(
+                *CENTER, r, target, rings=DENSE_RINGS, thick_pcts=(10,) * len(DENSE_RINGS), gap_pcts=(2,) * (len(DENSE_RINGS) - 1), **o)))
+    for size in BATCH_SIZES:
+        rows = [{"id": f"site{i}", "lat": CENTER[0] + i * 0.01, "lon": CENTER[1], "radius": RADII[i % len(RADII)]} for i in range(size)]
+        cases.append((f"batch/sites{size}", lambda target, rows=rows: _run_batch(rows, target)))
+    return cases
+
+
+def _run_batch(rows, target):
+    # 在当前进程内顺序执行，耗时和内存都只统计本进程
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "batch.kml")
+        run_batch(rows, path, combined=True, workers=1, progress=None)
+        with open(path, encoding="utf-8") as f:
+            target.write(f.read())
+
+
+# ==============================================================================
+# 测量
+# ==============================================================================
+
+def count_vertices(text):
+    return sum(len(c.split()) for c in _COORDS.findall(text))
+
+
+def measure(func, repeat=3):
+    """
+    运行一个用例，返回 {"seconds", "peak_bytes", "vertices", "bytes"}。
+    耗时取repeat次运行的最小值；峰值内存单独再运行一次 (tracemalloc会拖慢运行)。
+    """
+    best = math.inf
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            out = io.StringIO()
+            gc.collect()
+            start = time.perf_counter()
+            func(out)
+            best = min(best, time.perf_counter() - start)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(io.StringIO())
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    text = out.getvalue()
+    return {"seconds": best, "peak_bytes": peak, "vertices": count_vertices(text), "bytes": len(text.encode("utf-8"))}
+
+
+def run(cases, repeat=3, report=print):
+    results = {}
+    for name, func in cases:
+        results[name] = r = measure(func, repeat)
+        if report:
+            report(f"{name:40} {r['seconds'] * 1000:9.2f} ms {r['peak_bytes'] / 1024:9.0f} KiB {r['vertices']:9d} 顶点 {r['bytes'] / 1024:9.0f} KiB")
+    return results
+
+
+def compare(results, baseline, thresholds=THRESHOLDS):
+    """
+    与基线比较，返回 [(用例, 指标, 基线值, 当前值, 相对变化), ...] 中超过阈值的退化项。
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, limit in thresholds.items():
+            old, new = base.get(metric), current[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if change > limit:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+
+# ==============================================================================
+# 与参考文件比较
+# ==============================================================================
+
+def compare_reference(func, reference, tolerance_m=REFERENCE_TOLERANCE_M, expected=()):
+    """
+    运行一个生成函数，用 kmldiff 与参考文件逐个地标比较坐标、样式和标签，返回 kmldiff.DiffReport。
+    """
+    out = io.StringIO()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(out)
+    return diff_kml(reference, io.BytesIO(out.getvalue().encode("utf-8")), tolerance_m, ignore_names=expected, max_details=10)
+
+
+def check_references(tolerance_m=REFERENCE_TOLERANCE_M, report=print):
+    """
+    用各脚本自身的默认配置生成，与 kml/ 中同名的参考文件比较。全部一致时返回True。
+    """
+    ok = True
+    for file_name, module in _scripts().items():
+        reference = os.path.join(REFERENCE_DIR, module.OUTPUT_KML_FILE)
+        if not os.path.exists(reference):
+            report(f"{module.OUTPUT_KML_FILE:40} 跳过 (没有参考文件)")
+            continue
+        result = compare_reference(script_call(file_name), reference, tolerance_m, EXPECTED_DIFFERENCES.get(module.OUTPUT_KML_FILE, ()))
+        ok = ok and result.ok
+        report(f"{module.OUTPUT_KML_FILE:40} {'一致' if result.ok else '不一致'}  最大偏差 {result.max_deviation_m:.3g} 米")
+        if not result.ok:
+            report("\n".join(result.text().splitlines()[1:]))
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="罗盘生成的基准测试")
+    parser.add_argument("-k", "--filter", default=None, help="只运行名称中含此字符串的用例")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的计时次数 (取最小值)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线比较，有退化时返回1")
+    parser.add_argument("--threshold", type=float, default=None, help="耗时和内存允许的相对增幅 (默认 0.25)")
+    parser.add_argument("--check-reference", action="store_true", help="只检查与 kml/ 参考文件的一致性")
+    parser.add_argument("--tolerance", type=float, default=REFERENCE_TOLERANCE_M, help="与参考文件比较的坐标容差 (米)")
+    parser.add_argument("-o", "--output", default=None, help="把结果另存为JSON")
+    args = parser.parse_args(argv)
+
+    if args.check_reference:
+        return 0 if check_references(args.tolerance) else 1
+    # 先检查基线是否存在，免得运行完全部用例才失败
+    if args.compare and not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f"基线文件 '{args.baseline}' 不存在，请先在本机运行 --save-baseline 记录基线 (耗时与机器有关，仓库中不附带基线)")
+
+    cases = [(name, func) for name, func in build_cases() if not args.filter or args.filter in name]
+    results = run(cases, args.repeat)
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        saved = results
+        if args.save_baseline and path == args.baseline and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = dict(json.load(f), **results)  # 只运行部分用例时保留其余基线
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"成功！文件 '{path}' 已生成。", file=sys.stderr)
+
+    status = 0 if check_references(args.tolerance) else 1
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        thresholds = dict(THRESHOLDS)
+        if args.threshold is not None:
+            thresholds.update(seconds=args.threshold, peak_bytes=args.threshold)
+        regressions = compare(results, baseline, thresholds)
+        for name, metric, old, new, change in regressions:
+            print(f"退化: {name} {metric} {old:g} -> {new:g} (+{change:.0%})")
+        print(f"与基线比较: {len(results)} 个用例，{len(regressions)} 项退化。")
+        status = status or (1 if regressions else 0)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,8 @@
-import math
+from pyluopan.arcs import ArcCache
+from pyluopan.geocache import open_store
+from pyluopan.kml import POINT_PLACEMARK, KMLWriter, StyleRegistry, multiline_placemark, ring_placemarks
+from pyluopan.lod import lod_ring_placemarks
+from pyluopan.registry import load_rings
 
 # ==============================================================================
 # 1. 用户配置区域 - 请在此处修改参数
@@ -28,7 +32,32 @@ GAP_2_3_PERCENT = 5
 RING_3_THICKNESS_PERCENT = 20
 
 
-# --- 设置输出文件名 ---
+# --- 设置弧线精度 ---
+# 弧线允许的最大弦高误差 (米)。设为 None 时沿用固定的取点间隔；
+# 设置后按半径自适应取点：小半径少取点，大半径多取点。
+ARC_TOLERANCE_METERS = None
+
+# --- 设置大地测量模型 ---
+# "sphere": 球面公式 (默认)；"wgs84": WGS-84椭球面 (Vincenty)，几十公里以上的大半径时纬度方向更准确。
+GEODESIC_MODEL = "sphere"
+
+# --- 设置坐标精度 ---
+# 坐标保留的小数位数 (7位约1厘米)，设为 None 时保留完整精度；
+# OMIT_ALTITUDE 设为 True 时省略坐标中恒为0的高度。两者都能明显减小文件。
+COORD_PRECISION = None
+OMIT_ALTITUDE = False
+
+# --- 设置多级精度 ---
+# 设为 True 时每一环按 粗/中/细 三级精度输出 (KML Region/Lod)，
+# Google Earth 按缩放级别只绘制需要的一级；切换阈值由各环半径自动决定。
+ENABLE_LOD = False
+
+# --- 设置几何缓存 ---
+# 设为 True 时各环的几何 (顶点、标签位置) 按圆心、半径、取点参数缓存在磁盘上 (~/.cache/pyluopan/geometry)，
+# 只改配色、样式或名称时重新运行直接载入几何，不再重新计算。
+ENABLE_GEOMETRY_CACHE = False
+
+# --- 设置输出文件名 (以 .kmz 结尾时输出压缩的KMZ) ---
 OUTPUT_KML_FILE = "celestial_triple_ring_map.kml"
 
 
@@ -36,23 +65,24 @@ OUTPUT_KML_FILE = "celestial_triple_ring_map.kml"
 # 2. KML生成逻辑 - 一般无需修改以下内容
 # ==============================================================================
 
-def create_kml_triple_ring(center_lat, center_lon, r1_outer_m, r1_thick_pct, gap12_pct, r2_thick_pct, gap23_pct, r3_thick_pct, file_name):
+def create_kml_triple_ring(center_lat, center_lon, r1_outer_m, r1_thick_pct, gap12_pct, r2_thick_pct, gap23_pct, r3_thick_pct, file_name, arc_tolerance_m=None, geodesic_model="sphere", coord_precision=None, omit_altitude=False, lod=False, geometry_cache=False):
     """
     生成一个包含三层同心环的KML图谱。
     """
     
-    # --- 数据定义 ---
+    # --- 数据定义 (环的内容来自 database/绘制罗盘数据.xlsx) ---
+    rings = load_rings()
     # 环1: 二十八宿
-    mansions_data = [("虚",0,7.5),("女",7.5,22.5),("牛",22.5,37.5),("斗",37.5,52.5),("箕",52.5,67.5),("尾",67.5,82.5),("心",82.5,90),("房",90,97.5),("氐",97.5,112.5),("亢",112.5,127.5),("角",127.5,142.5),("轸",142.5,157.5),("翼",157.5,172.5),("张",172.5,180),("星",180,187.5),("柳",187.5,202.5),("鬼",202.5,217.5),("井",217.5,232.5),("参",232.5,247.5),("觜",247.5,262.5),("毕",262.5,270),("昴",270,277.5),("胃",277.5,292.5),("娄",292.5,307.5),("奎",307.5,322.5),("壁",322.5,337.5),("室",337.5,352.5),("危",352.5,360)]
-    elements_map = {"虚":"日","女":"土","牛":"金","斗":"木","箕":"水","尾":"火","心":"月","房":"日","氐":"土","亢":"金","角":"木","轸":"水","翼":"火","张":"月","星":"日","柳":"土","鬼":"金","井":"木","参":"水","觜":"火","毕":"月","昴":"日","胃":"土","娄":"金","奎":"木","壁":"水","室":"火","危":"月"}
+    mansions_data = rings["28xiu"].sectors
+    elements_map = rings["28xiu"].attributes["五行"]
     element_colors = {"木":"6078AB00","火":"601F25D9","土":"6000A5FF","金":"60E0E0E0","水":"60D07000"}
 
     # 环2: 二十四山
-    mountains_data = [("癸",7.5,22.5),("丑",22.5,37.5),("艮",37.5,52.5),("寅",52.5,67.5),("甲",67.5,82.5),("卯",82.5,97.5),("乙",97.5,112.5),("辰",112.5,127.5),("巽",127.5,142.5),("巳",142.5,157.5),("丙",157.5,172.5),("午",172.5,187.5),("丁",187.5,202.5),("未",202.5,217.5),("坤",217.5,232.5),("申",232.5,247.5),("庚",247.5,262.5),("酉",262.5,277.5),("辛",277.5,292.5),("戌",292.5,307.5),("乾",307.5,322.5),("亥",322.5,337.5),("壬",337.5,352.5),("子",352.5,7.5)]
+    mountains_data = rings["24shan"].sectors
     mountain_colors = ["60808080","60A0A0A0"]
 
     # 环3: 十二地支
-    branches_data = [("丑",15,45),("寅",45,75),("卯",75,105),("辰",105,135),("巳",135,165),("午",165,195),("未",195,225),("申",225,255),("酉",255,285),("戌",285,315),("亥",315,345),("子",345,360)]
+    branches_data = rings["12dizhi"].sectors
     branch_colors = ["606A4982", "608355A0"] # 两种紫色交替
 
     # --- 动态计算所有半径 ---
@@ -61,114 +91,70 @@ def create_kml_triple_ring(center_lat, center_lon, r1_outer_m, r1_thick_pct, gap
     gap23_m = r1_outer_m * (gap23_pct/100.0); r3_outer_m = r2_inner_m - gap23_m
     r3_inner_m = r3_outer_m * (1-r3_thick_pct/100.0)
 
-    # --- 辅助函数 ---
-    EARTH_RADIUS = 6378137.0
-    def get_destination_point(lat, lon, bearing, dist):
-        brng=math.radians(bearing);d=dist/EARTH_RADIUS;lat1=math.radians(lat);lon1=math.radians(lon)
-        lat2=math.asin(math.sin(lat1)*math.cos(d)+math.cos(lat1)*math.sin(d)*math.cos(brng))
-        lon2=lon1+math.atan2(math.sin(brng)*math.sin(d)*math.cos(lat1),math.cos(d)-math.sin(lat1)*math.sin(lat2))
-        return (math.degrees(lat2),math.degrees(lon2))
-
-    def create_ring_segment_coords(lat, lon, r_outer, r_inner, start, end):
-        coords=[];step=0.5
-        # ... (内部函数无需改动)
-        current = start
-        end_loop = end if start < end else 360.0
-        while current < end_loop:
-            n_lat,n_lon=get_destination_point(lat,lon,current,r_outer);coords.append(f"{n_lon},{n_lat},0")
-            current+=step
-        if start > end:
-            current=0.0
-            while current < end:
-                n_lat,n_lon=get_destination_point(lat,lon,current,r_outer);coords.append(f"{n_lon},{n_lat},0")
-                current+=step
-        n_lat,n_lon=get_destination_point(lat,lon,end,r_outer);coords.append(f"{n_lon},{n_lat},0")
-        current = end
-        start_loop = start if start < end else 0.0
-        while current > start_loop:
-            n_lat,n_lon=get_destination_point(lat,lon,current,r_inner);coords.append(f"{n_lon},{n_lat},0")
-            current-=step
-        if start > end:
-            current=360.0
-            while current > start:
-                n_lat,n_lon=get_destination_point(lat,lon,current,r_inner);coords.append(f"{n_lon},{n_lat},0")
-                current-=step
-        n_lat,n_lon=get_destination_point(lat,lon,start,r_inner);coords.append(f"{n_lon},{n_lat},0")
-        coords.append(coords[0])
-        return " ".join(coords)
-
-    # --- KML文件内容生成 ---
-    kml_content = f"""<?xml version="1.0" encoding="UTF-8"?>
+    # --- 圆弧缓存：每个半径的整圆只计算一次 ---
+    arcs = ArcCache(center_lat, center_lon, tolerance_m=arc_tolerance_m, model=geodesic_model,
+                    precision=coord_precision, altitude=not omit_altitude, store=open_store() if geometry_cache else None)
+    placemarks = lod_ring_placemarks if lod else ring_placemarks
+
+    # --- 共享样式 ---
+    styles = StyleRegistry()
+    for e,c in element_colors.items():styles.register(f"style{e}", f'<LineStyle><width>1.2</width><color>c0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    for i,c in enumerate(mountain_colors):styles.register(f"styleMountain{i}", f'<LineStyle><width>1</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    for i,c in enumerate(branch_colors):styles.register(f"styleBranch{i}", f'<LineStyle><width>0.8</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    styles.register("styleMansionLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ffffffff</color><scale>0.9</scale></LabelStyle>')
+    styles.register("styleMountainLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ffeeeeee</color><scale>0.75</scale></LabelStyle>')
+    styles.register("styleBranchLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ffd5d5d5</color><scale>0.6</scale></LabelStyle>')
+    styles.register("styleAngleLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>1.0</scale></LabelStyle>')
+    styles.register("styleCrosshair", '<LineStyle><color>ffffffff</color><width>1.5</width></LineStyle>')
+
+    def mansion_style(i, name):
+        element=elements_map.get(name,"");color_element="火" if element in ["日","月"] else element
+        return styles.url(f"style{color_element}"), f"{name} ({element})", f"{name}\n({element})"
+
+    # --- KML文件内容生成 (边生成边写入文件) ---
+    try:
+        with KMLWriter(file_name) as kml:
+            kml.write(f"""<?xml version="1.0" encoding="UTF-8"?>
 <kml xmlns="http://www.opengis.net/kml/2.2">
   <Document>
     <name>二十八宿、二十四山、十二地支三环图</name>
-    <description>从外到内依次为二十八宿、二十四山、十二地支。</description>"""
+    <description>从外到内依次为二十八宿、二十四山、十二地支。</description>""")
     
-    # --- 定义样式 ---
-    for e,c in element_colors.items():kml_content+=f'\n<Style id="style{e}"><LineStyle><width>1.2</width><color>c0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle></Style>'
-    for i,c in enumerate(mountain_colors):kml_content+=f'\n<Style id="styleMountain{i}"><LineStyle><width>1</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle></Style>'
-    for i,c in enumerate(branch_colors):kml_content+=f'\n<Style id="styleBranch{i}"><LineStyle><width>0.8</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle></Style>'
-    kml_content+="""
-    <Style id="styleMansionLabel"><IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ffffffff</color><scale>0.9</scale></LabelStyle></Style>
-    <Style id="styleMountainLabel"><IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ffeeeeee</color><scale>0.75</scale></LabelStyle></Style>
-    <Style id="styleBranchLabel"><IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ffd5d5d5</color><scale>0.6</scale></LabelStyle></Style>
-    <Style id="styleAngleLabel"><IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>1.0</scale></LabelStyle></Style>
-    <Style id="styleCrosshair"><LineStyle><color>ffffffff</color><width>1.5</width></LineStyle></Style>"""
-
-    # --- 创建KML文件夹和Placemarks ---
-    # 中心十字
-    kml_content += "\n<Folder><name>中心十字</name>"
-    cross_r = r3_inner_m * 0.9 if r3_inner_m > 0 else r2_inner_m * 0.5
-    lat_n,lon_n=get_destination_point(center_lat,center_lon,0,cross_r); lat_s,lon_s=get_destination_point(center_lat,center_lon,180,cross_r)
-    lat_e,lon_e=get_destination_point(center_lat,center_lon,90,cross_r); lat_w,lon_w=get_destination_point(center_lat,center_lon,270,cross_r)
-    kml_content+=f'<Placemark><name>中心十字</name><styleUrl>#styleCrosshair</styleUrl><MultiGeometry><LineString><coordinates>{lon_n},{lat_n},0 {lon_s},{lat_s},0</coordinates></LineString><LineString><coordinates>{lon_e},{lat_e},0 {lon_w},{lat_w},0</coordinates></LineString></MultiGeometry></Placemark>'
-    kml_content += "\n</Folder>"
-
-    # 环1: 二十八宿
-    kml_content += "\n<Folder><name>环1：二十八宿</name>"
-    for name,start,end in mansions_data:
-        element=elements_map.get(name,"");color_element="火" if element in ["日","月"] else element
-        coords=create_ring_segment_coords(center_lat,center_lon,r1_outer_m,r1_inner_m,start,end)
-        kml_content+=f'<Placemark><name>{name} ({element})</name><styleUrl>#style{color_element}</styleUrl><Polygon><altitudeMode>clampToGround</altitudeMode><outerBoundaryIs><LinearRing><coordinates>{coords}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>'
-        mid=((start+end)/2) if start<end else (((start+end+360)/2)%360)
-        lat,lon=get_destination_point(center_lat,center_lon,mid,(r1_outer_m+r1_inner_m)/2)
-        kml_content+=f'<Placemark><name>{name}\n({element})</name><styleUrl>#styleMansionLabel</styleUrl><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark>'
-    kml_content += "\n</Folder>"
-
-    # 环2: 二十四山
-    kml_content += "\n<Folder><name>环2：二十四山</name>"
-    for i,(name,start,end) in enumerate(mountains_data):
-        style_url = f"#styleMountain{i%len(mountain_colors)}"
-        coords=create_ring_segment_coords(center_lat,center_lon,r2_outer_m,r2_inner_m,start,end)
-        kml_content+=f'<Placemark><name>{name}</name><styleUrl>{style_url}</styleUrl><Polygon><altitudeMode>clampToGround</altitudeMode><outerBoundaryIs><LinearRing><coordinates>{coords}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>'
-        mid=((start+end)/2) if start<end else (((start+end+360)/2)%360)
-        lat,lon=get_destination_point(center_lat,center_lon,mid,(r2_outer_m+r2_inner_m)/2)
-        kml_content+=f'<Placemark><name>{name}</name><styleUrl>#styleMountainLabel</styleUrl><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark>'
-    kml_content += "\n</Folder>"
-
-    # 环3: 十二地支
-    kml_content += "\n<Folder><name>环3：十二地支</name>"
-    for i,(name,start,end) in enumerate(branches_data):
-        style_url = f"#styleBranch{i%len(branch_colors)}"
-        coords=create_ring_segment_coords(center_lat,center_lon,r3_outer_m,r3_inner_m,start,end)
-        kml_content+=f'<Placemark><name>{name}</name><styleUrl>{style_url}</styleUrl><Polygon><altitudeMode>clampToGround</altitudeMode><outerBoundaryIs><LinearRing><coordinates>{coords}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>'
-        mid=((start+end)/2) if start<end else (((start+end+360)/2)%360)
-        lat,lon=get_destination_point(center_lat,center_lon,mid,(r3_outer_m+r3_inner_m)/2)
-        kml_content+=f'<Placemark><name>{name}</name><styleUrl>#styleBranchLabel</styleUrl><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark>'
-    kml_content += "\n</Folder>"
-
-    # 外部角度环
-    kml_content += "\n<Folder><name>最外层角度环</name>"
-    for angle in range(0,360,15):
-        lat,lon=get_destination_point(center_lat,center_lon,angle,r1_outer_m*1.15)
-        kml_content+=f'<Placemark><name>{angle}°</name><styleUrl>#styleAngleLabel</styleUrl><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark>'
-    kml_content += "\n</Folder>"
+            # --- 定义样式 (内容相同的样式只输出一次) ---
+            styles.write(kml)
+
+            # --- 创建KML文件夹和Placemarks ---
+            # 中心十字
+            kml.write("\n<Folder><name>中心十字</name>")
+            cross_r = r3_inner_m * 0.9 if r3_inner_m > 0 else r2_inner_m * 0.5
+            n,s,e,w=(arcs.point_coord(cross_r,b) for b in (0,180,90,270))
+            kml.write(multiline_placemark("中心十字", "#styleCrosshair", (f"{n} {s}", f"{e} {w}")))
+            kml.write("\n</Folder>")
+
+            # 环1: 二十八宿
+            kml.write("\n<Folder><name>环1：二十八宿</name>")
+            kml.writelines(placemarks(arcs, mansions_data, r1_outer_m, r1_inner_m, "styleMansionLabel", mansion_style))
+            kml.write("\n</Folder>")
+
+            # 环2: 二十四山
+            kml.write("\n<Folder><name>环2：二十四山</name>")
+            kml.writelines(placemarks(arcs, mountains_data, r2_outer_m, r2_inner_m, "styleMountainLabel", lambda i, name: (styles.url(f"styleMountain{i%len(mountain_colors)}"), name, name)))
+            kml.write("\n</Folder>")
+
+            # 环3: 十二地支
+            kml.write("\n<Folder><name>环3：十二地支</name>")
+            kml.writelines(placemarks(arcs, branches_data, r3_outer_m, r3_inner_m, "styleBranchLabel", lambda i, name: (styles.url(f"styleBranch{i%len(branch_colors)}"), name, name)))
+            kml.write("\n</Folder>")
+
+            # 外部角度环
+            kml.write("\n<Folder><name>最外层角度环</name>")
+            for angle in range(0,360,15):
+                kml.writelines(POINT_PLACEMARK.parts(f"{angle}°", "#styleAngleLabel", arcs.point_coord(r1_outer_m*1.15,angle)))
+            kml.write("\n</Folder>")
     
-    kml_content += """\n</Document>\n</kml>"""
-    try:
-        with open(file_name,'w',encoding='utf-8') as f: f.write(kml_content)
+            kml.write("""\n</Document>\n</kml>""")
         print(f"成功！文件 '{file_name}' 已在当前目录生成。"); print(f"配置: 中心=({center_lat},{center_lon}), 外环半径={r1_outer_m}米")
-    except Exception as e: print(f"错误：无法写入文件。 {e}")
+    except OSError as e: print(f"错误：无法写入文件。 {e}")
 
 # ==============================================================================
 # 3. 运行主程序
@@ -183,5 +169,11 @@ if __name__ == "__main__":
         r2_thick_pct=RING_2_THICKNESS_PERCENT,
         gap23_pct=GAP_2_3_PERCENT,
         r3_thick_pct=RING_3_THICKNESS_PERCENT,
-        file_name=OUTPUT_KML_FILE
+        file_name=OUTPUT_KML_FILE,
+        arc_tolerance_m=ARC_TOLERANCE_METERS,
+        geodesic_model=GEODESIC_MODEL,
+        coord_precision=COORD_PRECISION,
+        omit_altitude=OMIT_ALTITUDE,
+        lod=ENABLE_LOD,
+        geometry_cache=ENABLE_GEOMETRY_CACHE
     )
\ No newline at end of file
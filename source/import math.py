@@ -1,6 +1,7 @@
-import math
+from pyluopan.geodesy import destination_points
+from pyluopan.kml import KMLWriter, line_placemark, multiline_placemark, polygon_placemark
 
-def create_kml_circle_with_ticks(center_lon, center_lat, radius_m, tick_length_m, num_ticks, file_name):
+def create_kml_circle_with_ticks(center_lon, center_lat, radius_m, tick_length_m, num_ticks, file_name, merge_minor=False):
     """
     生成一个包含带刻度的圆的KML文件。
 
@@ -11,30 +12,13 @@ def create_kml_circle_with_ticks(center_lon, center_lat, radius_m, tick_length_m
     tick_length_m (float): 刻度线长度 (米)
     num_ticks (int): 刻度线总数 (例如 36，即每10度一个)
     file_name (str): 输出的KML文件名
+    merge_minor (bool): 是否把所有次要刻度合并为一个Placemark (MultiGeometry)
     """
     
-    # 地球半径 (米)
-    EARTH_RADIUS = 6378137.0
-
-    def get_destination_point(lon, lat, bearing, distance):
-        """
-        根据起点、方位角和距离计算目标点的经纬度。
-        """
-        brng = math.radians(bearing)
-        d = distance / EARTH_RADIUS
-
-        lat1 = math.radians(lat)
-        lon1 = math.radians(lon)
-
-        lat2 = math.asin(math.sin(lat1) * math.cos(d) +
-                         math.cos(lat1) * math.sin(d) * math.cos(brng))
-        lon2 = lon1 + math.atan2(math.sin(brng) * math.sin(d) * math.cos(lat1),
-                                  math.cos(d) - math.sin(lat1) * math.sin(lat2))
-
-        return (math.degrees(lon2), math.degrees(lat2))
-
-    # --- KML 文件头部 ---
-    kml_content = f"""<?xml version="1.0" encoding="UTF-8"?>
+    # 边生成边写入文件
+    with KMLWriter(file_name) as kml:
+        # --- KML 文件头部 ---
+        kml.write(f"""<?xml version="1.0" encoding="UTF-8"?>
 <kml xmlns="http://www.opengis.net/kml/2.2">
   <Document>
     <name>带刻度的圆</name>
@@ -65,66 +49,41 @@ def create_kml_circle_with_ticks(center_lon, center_lat, radius_m, tick_length_m
 
     <Folder>
       <name>图形元素</name>
-      
-      <Placemark>
-        <name>圆</name>
-        <styleUrl>#circleStyle</styleUrl>
-        <Polygon>
-          <altitudeMode>clampToGround</altitudeMode>
-          <outerBoundaryIs>
-            <LinearRing>
-              <coordinates>
-"""
-    # 计算圆的顶点坐标
-    circle_coords = []
-    for i in range(361): # 361个点以确保多边形闭合
-        lon, lat = get_destination_point(center_lon, center_lat, i, radius_m)
-        circle_coords.append(f"{lon},{lat},0")
-    kml_content += " ".join(circle_coords)
-    
-    kml_content += """
-              </coordinates>
-            </LinearRing>
-          </outerBoundaryIs>
-        </Polygon>
-      </Placemark>
-
-      """
-    # 计算并添加刻度线
-    for i in range(num_ticks):
-        angle = (360 / num_ticks) * i
+      """)
+        # 计算圆的顶点坐标
+        circle_lats, circle_lons = destination_points(center_lat, center_lon, range(361), radius_m) # 361个点以确保多边形闭合
+        circle_coords = [f"{lon},{lat},0" for lat, lon in zip(circle_lats, circle_lons)]
+        kml.write(polygon_placemark("圆", "#circleStyle", " ".join(circle_coords)))
+
+        # 计算并添加刻度线 (一次性批量计算所有刻度的起点和终点)
+        angles = [(360 / num_ticks) * i for i in range(num_ticks)]
+        start_lats, start_lons = destination_points(center_lat, center_lon, angles, radius_m)
+        end_lats, end_lons = destination_points(center_lat, center_lon, angles, radius_m + tick_length_m)
+        minor_ticks = []
+        for i in range(num_ticks):
+            angle = angles[i]
         
-        # 判断是主要刻度还是次要刻度
-        is_major = (angle % 90 == 0)
-        style_url = "#majorTickStyle" if is_major else "#minorTickStyle"
-        label = f"{int(angle)}°" if is_major else ""
-
-        # 计算刻度线的起点和终点
-        start_lon, start_lat = get_destination_point(center_lon, center_lat, angle, radius_m)
-        end_lon, end_lat = get_destination_point(center_lon, center_lat, angle, radius_m + tick_length_m)
-        
-        tick_coords = f"{start_lon},{start_lat},0 {end_lon},{end_lat},0"
-
-        kml_content += f"""
-      <Placemark>
-        <name>{label}</name>
-        <styleUrl>{style_url}</styleUrl>
-        <LineString>
-          <altitudeMode>clampToGround</altitudeMode>
-          <coordinates>{tick_coords}</coordinates>
-        </LineString>
-      </Placemark>
-"""
-
-    # --- KML 文件尾部 ---
-    kml_content += """
+            # 判断是主要刻度还是次要刻度
+            is_major = (angle % 90 == 0)
+            style_url = "#majorTickStyle" if is_major else "#minorTickStyle"
+            label = f"{int(angle)}°" if is_major else ""
+
+            # 计算刻度线的起点和终点
+            tick_coords = f"{start_lons[i]},{start_lats[i]},0 {end_lons[i]},{end_lats[i]},0"
+            if merge_minor and not is_major:
+                minor_ticks.append(tick_coords)
+                continue
+
+            kml.write("\n      " + line_placemark(label, style_url, tick_coords))
+        if minor_ticks:
+            kml.write("\n      " + multiline_placemark("次要刻度", "#minorTickStyle", minor_ticks))
+
+        # --- KML 文件尾部 ---
+        kml.write("""
     </Folder>
   </Document>
 </kml>
-"""
-    # 写入文件
-    with open(file_name, 'w', encoding='utf-8') as f:
-        f.write(kml_content)
+""")
     print(f"文件 '{file_name}' 已成功生成！")
 
 
@@ -142,7 +101,10 @@ TICK_LENGTH_METERS = 200 # 主刻度会长一些，这里是基础长度
 # 刻度线数量 (36 表示每 10 度一个)
 NUMBER_OF_TICKS = 36
 
-# 输出文件名
+# 是否把所有次要刻度合并为一个Placemark (刻度很密时，如360个，Google Earth加载更快)
+MERGE_MINOR_TICKS = False
+
+# 输出文件名 (以 .kmz 结尾时输出压缩的KMZ)
 OUTPUT_KML_FILE = "circle_with_ticks.kml"
 
 # --- 运行脚本 ---
@@ -152,5 +114,6 @@ create_kml_circle_with_ticks(
     RADIUS_METERS,
     TICK_LENGTH_METERS,
     NUMBER_OF_TICKS,
-    OUTPUT_KML_FILE
+    OUTPUT_KML_FILE,
+    MERGE_MINOR_TICKS
 )
\ No newline at end of file
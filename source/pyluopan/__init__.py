@@ -0,0 +1,3 @@
+"""
+PyLuoPan 公共模块：罗盘几何计算与KML生成的共享部分。
+"""
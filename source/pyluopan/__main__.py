@@ -0,0 +1,5 @@
+import sys
+
+from pyluopan.cli import main
+
+sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+按半径缓存圆弧顶点。
+
+同一环的所有扇区共用相同的内外半径，相邻扇区还共用边界方位角。
+ArcCache 对每个半径只计算一次整圆 (0 ~ 360度，按step取点)，
+扇区多边形、标签中点等都从缓存中按索引切片取用。
+
+取点间隔默认固定为0.5度；也可以按最大弦高误差 (米) 或屏幕像素误差
+为每个半径单独选择间隔，小半径少取点，大半径多取点。
+
+给定磁盘几何缓存 (geocache.GeometryStore) 时，每一环的整圆和标签锚点按参数哈希保存在磁盘上，
+参数不变的重新生成直接载入，不再计算。
+
+设置 local_tolerance_m 时整圆按单位圆模板在圆心的局部平面 (东/北) 上缩放，再一次性换算回经纬度，
+不再逐点做球面/椭球面计算；单位圆模板对所有圆心共用。每个半径先抽样比较近似与精确结果，
+误差上界超过容差 (半径太大或纬度太高) 时该半径退回精确计算。
+误差随纬度升高而增大，检查按1度纬度带在靠近极地的一侧进行，同一纬度带内的圆心共用检查结果。
+"""
+import math
+
+from pyluopan import instrument
+from pyluopan.geodesy import (destination_points, format_coord, format_coords, get_mid_angle, local_radii, local_to_geodetic, numpy_module,
+                              ring_segment_bearings)
+
+# 自适应取点时的间隔上下限 (度)。上限取扇区边界的公约数，间隔取其二进制有限的整数分之一，保证边界正好落在网格上。
+BASE_STEP = 7.5
+MIN_STEP = 0.05
+
+# 局部平面模板的误差检查: 抽样的方位角数，以及抽样最大误差到误差上界的放大系数
+LOCAL_CHECK_BEARINGS = 24
+# 开启局部平面模板时默认的误差容差 (米)，与7位小数的坐标精度相当
+DEFAULT_LOCAL_TOLERANCE_M = 0.01
+LOCAL_CHECK_FACTOR = 2.0
+
+# 单位圆模板 {整圆点数: (sin, cos)}，所有圆心共用
+_unit_circles = {}
+# 误差检查的结果 {(模型, 半径, 纬度整度数, 容差): 是否可用}，同一纬度带内的圆心共用
+_local_checks = {}
+
+
+def unit_circle(n):
+    """
+    返回n等分整圆 (从正北顺时针) 各方位角的 (sin, cos) 数组。
+    """
+    c = _unit_circles.get(n)
+    if c is None:
+        np = numpy_module()
+        b = np.radians(np.arange(n) * (360.0 / n))
+        c = _unit_circles[n] = (np.sin(b), np.cos(b))
+    return c
+
+
+def grid_divisions(k, base_step=BASE_STEP, down=False):
+    """
+    返回不小于k (down=True 时不大于k) 的最小 (最大) 等分数n，使 base_step/n 为有限二进制小数。
+    这样的间隔逐次累加没有舍入误差，网格点正好落在扇区边界上 (如7.5度可以分为12份，不能分为11份)。
+    """
+    num, den = base_step.as_integer_ratio()
+    while k > 1:
+        d = den * k // math.gcd(num, den * k)
+        if d & (d - 1) == 0:
+            return k
+        k += -1 if down else 1
+    return 1
+
+
+def densify_step(r, tolerance_m=None, tolerance_px=None, viewport_px=1000, base_step=BASE_STEP, min_step=MIN_STEP):
+    """
+    按弦高误差为半径r选择取点间隔 (度)。
+
+    弦高 (弧与弦的最大偏差) = r * (1 - cos(step/2))，据此反解出允许的最大间隔，
+    再向下取到 base_step 的整数分之一 (见 grid_divisions)，使扇区边界仍落在网格上。
+
+    参数:
+    tolerance_m (float): 允许的最大弦高 (米)，必须为正数
+    tolerance_px (float): 允许的屏幕误差 (像素)，按罗盘直径占满 viewport_px 像素的视图换算为米
+    """
+    if tolerance_m is None:
+        if not tolerance_px > 0:
+            raise ValueError(f"像素误差必须为正数: {tolerance_px}")
+        tolerance_m = tolerance_px * (2 * r / viewport_px)
+    if not tolerance_m > 0:
+        raise ValueError(f"弦高误差必须为正数: {tolerance_m}")
+    if r <= 0 or tolerance_m >= r:
+        return base_step
+    max_step = math.degrees(2 * math.acos(1 - tolerance_m / r))
+    k = min(grid_divisions(math.ceil(base_step / max_step), base_step),
+            grid_divisions(int(base_step / min_step + 1e-9), base_step, down=True))
+    return base_step / k
+
+
+class ArcCache:
+    """
+    以圆心为单位的圆弧缓存。
+
+    参数:
+    lat, lon (float): 圆心纬度、经度
+    step (float): 固定的整圆取点间隔 (度)，360必须能被其整除
+    tolerance_m (float): 设置后按最大弦高 (米) 为每个半径自适应选择间隔，忽略step
+    tolerance_px (float): 设置后按屏幕像素误差为每个半径自适应选择间隔
+    viewport_px (int): 像素误差换算时罗盘直径所占的屏幕像素数
+    model (str): 大地测量模型，"sphere" 或 "wgs84"，见 geodesy.destination_points
+    precision (int): 坐标小数位数，None 时保留完整精度
+    altitude (bool): 坐标是否带 ",0" 高度
+    store (geocache.GeometryStore): 磁盘几何缓存，None 时不使用
+    local_tolerance_m (float): 设置后整圆用局部平面模板计算，误差上界超过此值 (米) 的半径退回精确计算
+    """
+
+    def __init__(self, lat, lon, step=0.5, tolerance_m=None, tolerance_px=None, viewport_px=1000, model="sphere",
+                 precision=None, altitude=True, store=None, local_tolerance_m=None):
+        if abs(round(360.0 / step) * step - 360.0) > 1e-9:
+            raise ValueError(f"step={step} 不能整除360度")
+        for option, value in (("tolerance_m", tolerance_m), ("tolerance_px", tolerance_px)):
+            if value is not None and not value > 0:
+                raise ValueError(f"{option}={value} 必须为正数")
+        self.lat = lat
+        self.lon = lon
+        self.step = step
+        self.tolerance_m = tolerance_m
+        self.tolerance_px = tolerance_px
+        self.viewport_px = viewport_px
+        self.model = model
+        self.precision = precision
+        self.altitude = altitude
+        self.store = store
+        # 没有NumPy时不使用局部平面模板
+        self.local_tolerance_m = local_tolerance_m if local_tolerance_m is not None and numpy_module() is not None else None
+        self._local = {}
+        self._steps = {}
+        self._derived = {}
+        self._circles = {}
+        self._points = {}
+
+    def options(self):
+        """
+        返回重建一个同参数 (空的) 缓存所需的构造参数，供其他进程使用。
+        """
+        return {"lat": self.lat, "lon": self.lon, "step": self.step, "tolerance_m": self.tolerance_m, "tolerance_px": self.tolerance_px,
+                "viewport_px": self.viewport_px, "model": self.model, "precision": self.precision, "altitude": self.altitude,
+                "store": self.store, "local_tolerance_m": self.local_tolerance_m}
+
+    def step_for(self, r):
+        """
+        返回半径r使用的取点间隔 (度)，每个半径只计算一次。
+        """
+        if self.tolerance_m is None and self.tolerance_px is None:
+            return self.step
+        step = self._steps.get(r)
+        if step is None:
+            step = self._steps[r] = densify_step(r, self.tolerance_m, self.tolerance_px, self.viewport_px)
+        return step
+
+    def derived(self, **options):
+        """
+        返回同一圆心、不同取点参数的缓存 (按参数记忆化)，用于同一罗盘的多级精度。
+        """
+        key = tuple(sorted(options.items()))
+        cache = self._derived.get(key)
+        if cache is None:
+            cache = self._derived[key] = ArcCache(self.lat, self.lon, model=self.model, precision=self.precision, altitude=self.altitude,
+                                                           store=self.store, local_tolerance_m=self.local_tolerance_m, **options)
+        return cache
+
+    def _grid_index(self, r, bearing):
+        step = self.step_for(r)
+        k = bearing / step
+        return int(k) % int(round(360.0 / step)) if k == int(k) else None
+
+    def local_error(self, r, lat=None):
+        """
+        估计纬度lat (默认为圆心纬度) 处半径r的局部平面模板误差上界 (米):
+        抽样若干方位角与精确结果比较，取最大偏差乘以放大系数。
+        """
+        lat = self.lat if lat is None else lat
+        bearings = [k * 360.0 / LOCAL_CHECK_BEARINGS for k in range(LOCAL_CHECK_BEARINGS)]
+        lats, lons = destination_points(lat, 0.0, bearings, r, self.model)
+        np = numpy_module()
+        b = np.radians(bearings)
+        approx_lats, approx_lons = local_to_geodetic(lat, 0.0, r * np.sin(b), r * np.cos(b), self.model)
+        m, n = local_radii(lat, self.model)
+        north = np.radians(approx_lats - np.asarray(lats)) * m
+        east = np.radians(approx_lons - np.asarray(lons)) * n * math.cos(math.radians(lat))
+        return float(np.hypot(north, east).max()) * LOCAL_CHECK_FACTOR
+
+    def use_local(self, r):
+        """
+        半径r是否使用局部平面模板。
+        """
+        if self.local_tolerance_m is None:
+            return False
+        ok = self._local.get(r)
+        if ok is None:
+            band = math.floor(abs(self.lat))
+            key = (self.model, r, band, self.local_tolerance_m)
+            ok = _local_checks.get(key)
+            if ok is None:
+                with instrument.stage("arcs"):
+                    ok = _local_checks[key] = band < 89 and self.local_error(r, band + 1.0) <= self.local_tolerance_m
+            self._local[r] = ok
+        return ok
+
+    def prefetch(self, r, bearings):
+        """
+        使用局部平面模板时，把半径r上的一组点一次性换算并缓存 (之后逐个取用)；否则不做任何事。
+        """
+        if self.use_local(r):
+            self.points(r, bearings)
+
+    def circle(self, r):
+        """
+        返回半径r处整圆的 (lats, lons, coords)，coords为KML坐标字符串列表。
+        """
+        c = self._circles.get(r)
+        if c is None:
+            step = self.step_for(r)
+            n = int(round(360.0 / step))
+            with instrument.stage("arcs"):
+                if self.use_local(r):
+                    sin_b, cos_b = unit_circle(n)
+                    lats, lons = (a.tolist() for a in local_to_geodetic(self.lat, self.lon, r * sin_b, r * cos_b, self.model))
+                else:
+                    lats, lons = destination_points(self.lat, self.lon, [k * step for k in range(n)], r, self.model)
+            with instrument.stage("serialize"):
+                c = self._circles[r] = (lats, lons, format_coords(lons, lats, self.precision, self.altitude))
+        return c
+
+    def prepare_ring(self, r_outer, r_inner, data):
+        """
+        有磁盘几何缓存时，预先载入一环的内外整圆和标签锚点；未命中时按原来的方式逐一计算后写入缓存。
+        载入的数值与计算结果完全相同，输出逐字节一致。使用局部平面模板时标签锚点一次性换算。
+        """
+        r_mid = (r_outer + r_inner) / 2
+        mids = [get_mid_angle(start, end) for _, start, end in data]
+        self.prefetch(r_mid, mids)
+        if self.store is None:
+            return
+        key = self.store.key(self.lat, self.lon, r_outer, r_inner, [(start, end) for _, start, end in data],
+                             self.step_for(r_outer), self.step_for(r_inner), self.model, self.local_tolerance_m)
+        with instrument.stage("cache"):
+            arrays = self.store.load(key)
+        if arrays is None:
+            labels = [self.point(r_mid, b) for b in mids]
+            arrays = {"outer": self.circle(r_outer)[:2], "inner": self.circle(r_inner)[:2], "labels": list(zip(*labels)) or [[], []]}
+            with instrument.stage("cache"):
+                self.store.save(key, arrays)
+            return
+        for r, name in ((r_outer, "outer"), (r_inner, "inner")):
+            if r not in self._circles:
+                lats, lons = arrays[name].tolist()
+                with instrument.stage("serialize"):
+                    self._circles[r] = (lats, lons, format_coords(lons, lats, self.precision, self.altitude))
+        for b, lat, lon in zip(mids, *arrays["labels"].tolist()):
+            self._points.setdefault((r_mid, b), (lat, lon))
+
+    def points(self, r, bearings):
+        """
+        批量取点，返回 (lats, lons)。已有整圆的网格角直接查表，其余按 (半径, 方位角) 记忆化。
+        """
+        circle = self._circles.get(r)
+        lats = [None] * len(bearings); lons = [None] * len(bearings); missing = []
+        for i, b in enumerate(bearings):
+            k = self._grid_index(r, b) if circle is not None else None
+            if k is not None:
+                lats[i] = circle[0][k]; lons[i] = circle[1][k]
+                continue
+            p = self._points.get((r, b))
+            if p is None: missing.append(i)
+            else: lats[i], lons[i] = p
+        if missing:
+            with instrument.stage("arcs"):
+                if len(missing) > 1 and self.use_local(r):
+                    np = numpy_module()
+                    b = np.radians([bearings[i] for i in missing])
+                    new_lats, new_lons = (a.tolist() for a in local_to_geodetic(self.lat, self.lon, r * np.sin(b), r * np.cos(b), self.model))
+                else:
+                    new_lats, new_lons = destination_points(self.lat, self.lon, [bearings[i] for i in missing], r, self.model)
+            for i, lat, lon in zip(missing, new_lats, new_lons):
+                self._points[(r, bearings[i])] = (lat, lon)
+                lats[i] = lat; lons[i] = lon
+        return lats, lons
+
+    def point(self, r, bearing):
+        lats, lons = self.points(r, [bearing])
+        return lats[0], lons[0]
+
+    def point_coord(self, r, bearing):
+        """
+        返回半径r、方位角bearing处的一个KML坐标字符串，按本缓存的精度格式化。
+        """
+        lat, lon = self.point(r, bearing)
+        return format_coord(lon, lat, self.precision, self.altitude)
+
+    def arc_coords(self, r, start, end, reverse=False):
+        """
+        返回半径r上从start顺时针到end的弧线坐标字符串列表 (含两端点)；reverse=True时从end逆时针回到start。
+        """
+        i0 = self._grid_index(r, start); i1 = self._grid_index(r, end)
+        if i0 is None or i1 is None:
+            # 边界不在网格上时逐点记忆化计算
+            bearings = ring_segment_bearings(start, end, self.step_for(r))[1 if reverse else 0]
+            lats, lons = self.points(r, bearings)
+            return format_coords(lons, lats, self.precision, self.altitude)
+
+        coords = self.circle(r)[2]; n = len(coords); count = (i1 - i0) % n or n
+        # 跨0度时按索引取模回绕
+        if reverse:
+            return [coords[(i1 - k) % n] for k in range(count + 1)]
+        return [coords[(i0 + k) % n] for k in range(count + 1)]
+
+    def arc_points(self, r, start, end, reverse=False):
+        """
+        与 arc_coords 相同，但返回顶点的数值 (lons, lats)。
+        """
+        i0 = self._grid_index(r, start); i1 = self._grid_index(r, end)
+        if i0 is None or i1 is None:
+            bearings = ring_segment_bearings(start, end, self.step_for(r))[1 if reverse else 0]
+            lats, lons = self.points(r, bearings)
+            return lons, lats
+
+        lats, lons = self.circle(r)[:2]; n = len(lats); count = (i1 - i0) % n or n
+        indices = [(i1 - k) % n for k in range(count + 1)] if reverse else [(i0 + k) % n for k in range(count + 1)]
+        return [lons[k] for k in indices], [lats[k] for k in indices]
+
+    def segment_points(self, r_outer, r_inner, start, end):
+        """
+        与 segment_coords 相同，但返回闭合多边形顶点的数值 (lons, lats)，与坐标字符串一一对应。
+        """
+        outer_lons, outer_lats = self.arc_points(r_outer, start, end)
+        inner_lons, inner_lats = self.arc_points(r_inner, start, end, reverse=True)
+        lons = outer_lons + inner_lons; lats = outer_lats + inner_lats
+        return lons + lons[:1], lats + lats[:1]
+
+    def segment_coords(self, r_outer, r_inner, start, end):
+        """
+        生成环形扇区的闭合多边形坐标字符串，与 geodesy.create_ring_segment_coords 输出一致。
+        外弧从起点顺时针到终点，内弧从终点逆时针回到起点。
+        """
+        coords = self.arc_coords(r_outer, start, end) + self.arc_coords(r_inner, start, end, reverse=True)
+        coords.append(coords[0])
+        return " ".join(coords)
@@ -0,0 +1,333 @@
+"""
+批量模式：从CSV或JSONL站点列表生成罗盘。
+
+每行一个站点，字段:
+    id        站点编号 (用作文件名和文件夹名)
+    lat, lon  圆心纬度、经度
+    radius    最外环外部半径 (米)
+    rings     可选，从外到内的环，如 "28xiu;24shan;12dizhi;8gua" 或 "二十八宿;二十四山"
+    thickness 可选，各环厚度百分比，如 "20;20;20;15"
+    gaps      可选，相邻环间距百分比，如 "5;5;5"
+    tolerance 可选，弧线最大弦高误差 (米)，缺省时使用 --tolerance 或固定0.5度取点
+    lod       可选，1/true 时按三级精度输出 (KML Region/Lod)，缺省时使用 --lod
+    geodesic  可选，大地测量模型 sphere/wgs84，缺省时使用 --geodesic
+    precision 可选，坐标小数位数，缺省时使用 --precision
+    altitude  可选，0/false 时坐标省略 ",0" 高度，缺省时使用 --no-altitude
+    template  可选，局部平面模板的误差容差 (米)，缺省时使用 --template
+    merge     可选，1/true 时每环同样式的扇区合并为一个Placemark，缺省时使用 --merge
+    declutter 可选，1/true 时标签按缩放级别避让，缺省时使用 --declutter
+    wireframe 可选，1/true 时各环只输出线框，缺省时使用 --wireframe
+    fill      可选，线框模式下仍填色的环，如 "28xiu"，缺省时使用 --fill
+(列表字段可用 ; | 空格 分隔；JSONL中也可以直接写成数组。)
+
+站点分块分发到进程池并行渲染。单个站点出错只记录错误，不影响其余站点。
+加 --geometry-cache 时各环的几何保存在磁盘上，参数相同的站点或重新运行时直接载入。
+加 --profile 时各工作进程分别计时计数 (见 instrument)，汇总为一份JSON报告。
+
+用法:
+    python -m pyluopan.batch sites.csv -o out_dir            # 每个站点一个KML
+    python -m pyluopan.batch sites.jsonl -o all.kml --combined  # 合并为一个文档，每个站点一个Folder
+    python -m pyluopan.batch sites.csv -o out_dir --kmz      # 每个站点一个KMZ (合并输出时用 -o all.kmz)
+    python -m pyluopan.batch sites.csv -o out_dir --profile report.json  # 输出分阶段耗时与计数
+"""
+import argparse
+import collections
+import contextlib
+import csv
+import functools
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+
+from pyluopan import geocache, instrument
+from pyluopan.arcs import DEFAULT_LOCAL_TOLERANCE_M
+from pyluopan.compass import (DEFAULT_RINGS, DOCUMENT_FOOTER, DOCUMENT_HEADER, create_kml_compass, ring_layout, write_compass,
+                              write_styles)
+from pyluopan.geodesy import GEODESIC_MODELS
+from pyluopan.kml import KMZ_COMPRESSLEVEL, KMLWriter
+
+
+# JSONL中无法解析的一行: 保留在站点列表中，渲染时作为该站点的错误报告，不影响其余站点
+InvalidRow = collections.namedtuple("InvalidRow", "line error")
+
+
+def _json_row(number, line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidRow(number, f"第{number}行不是有效的JSON: {e}")
+
+
+def read_sites(path):
+    """
+    读取站点列表，返回原始行 (dict) 的列表。扩展名为 .jsonl/.json 时按JSONL解析，否则按CSV解析。
+    JSONL中无法解析的行返回为 InvalidRow，与不是JSON对象的行一样在渲染时记为该站点的错误。
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith(('.jsonl', '.json')):
+            return [_json_row(number, line) for number, line in enumerate(f, 1) if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def _split_list(value, cast):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (list, tuple)):
+        return tuple(cast(v) for v in value)
+    return tuple(cast(v) for v in re.split(r"[;|\s]+", str(value).strip()) if v)
+
+
+def _parse_bool(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def parse_site(row, tolerance_m=None, lod=False, model="sphere", precision=None, altitude=True, local_tolerance_m=None, merge=False, declutter=False,
+               wireframe=False, fill_rings=()):
+    """
+    把一行原始数据转换为 create_kml_compass 的参数。缺少必填字段或数值非法时抛出 ValueError/KeyError。
+    其余参数为该行未指定 tolerance、lod、geodesic、precision、altitude、template、merge、declutter、wireframe、fill 时使用的默认值。
+    """
+    model = str(row.get("geodesic") or model).strip().lower()
+    if model not in GEODESIC_MODELS:
+        raise ValueError(f"未知的大地测量模型: {model}")
+    rings = _split_list(row.get("rings"), str) or DEFAULT_RINGS
+    thick_pcts, gap_pcts = ring_layout(rings, _split_list(row.get("thickness"), float), _split_list(row.get("gaps"), float))
+    return {
+        "center_lat": float(row["lat"]),
+        "center_lon": float(row["lon"]),
+        "r1_outer_m": float(row["radius"]),
+        "rings": rings,
+        "thick_pcts": thick_pcts,
+        "gap_pcts": gap_pcts,
+        "tolerance_m": float(row["tolerance"]) if row.get("tolerance") not in (None, "") else tolerance_m,
+        "lod": _parse_bool(row["lod"]) if row.get("lod") not in (None, "") else lod,
+        "model": model,
+        "precision": int(row["precision"]) if row.get("precision") not in (None, "") else precision,
+        "altitude": _parse_bool(row["altitude"]) if row.get("altitude") not in (None, "") else altitude,
+        "local_tolerance_m": float(row["template"]) if row.get("template") not in (None, "") else local_tolerance_m,
+        "merge": _parse_bool(row["merge"]) if row.get("merge") not in (None, "") else merge,
+        "declutter": _parse_bool(row["declutter"]) if row.get("declutter") not in (None, "") else declutter,
+        "wireframe": _parse_bool(row["wireframe"]) if row.get("wireframe") not in (None, "") else wireframe,
+        "fill_rings": _split_list(row.get("fill"), str) or tuple(fill_rings),
+    }
+
+
+def _site_id(index, row):
+    """
+    返回站点的id，缺省时为 "site<序号>"。行无法解析或不是对象时抛出 ValueError。
+    """
+    if isinstance(row, InvalidRow):
+        raise ValueError(row.error)
+    if not isinstance(row, dict):
+        raise ValueError(f"第{index + 1}个站点不是JSON对象: {json.dumps(row, ensure_ascii=False)[:80]}")
+    site_id = str(row.get("id") or "").strip()
+    return site_id or f"site{index + 1}"
+
+
+# 文件名中不允许的字符 (含路径分隔符) 和Windows保留的设备名
+_UNSAFE_FILE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+_RESERVED_FILE_NAMES = {"CON", "PRN", "AUX", "NUL", *(f"COM{i}" for i in range(1, 10)), *(f"LPT{i}" for i in range(1, 10))}
+
+
+def safe_file_stem(site_id, max_length=100):
+    """
+    把站点id转换为安全的文件名 (不含扩展名): 替换路径分隔符等字符，去掉首尾的点和空格，
+    因此 "../x" 或绝对路径不会写到输出目录之外。
+    """
+    stem = _UNSAFE_FILE_CHARS.sub("_", site_id)[:max_length].strip(" .") or "site"
+    return f"_{stem}" if stem.split(".")[0].upper() in _RESERVED_FILE_NAMES else stem
+
+
+def site_file_stems(rows):
+    """
+    返回各站点的输出文件名 (不含扩展名)。清理后重名 (不区分大小写) 的站点依次加后缀 "-2"、"-3"，不会互相覆盖。
+    """
+    stems = []; seen = set()
+    for i, row in enumerate(rows):
+        try:
+            site_id = _site_id(i, row)
+        except ValueError:  # 渲染时报告错误，这里只需要一个不重名的文件名
+            site_id = f"site{i + 1}"
+        base = stem = safe_file_stem(site_id); n = 2
+        while stem.lower() in seen:
+            stem = f"{base}-{n}"; n += 1
+        seen.add(stem.lower()); stems.append(stem)
+    return stems
+
+
+def _open_store(cache_dir):
+    return geocache.open_store(cache_dir) if cache_dir else None
+
+
+def _render_file(task):
+    """
+    工作进程: 渲染一个站点到 out_dir/<文件名>.kml (或.kmz)，返回 (id, None, 错误信息)。出错时删除不完整的文件。
+    """
+    index, row, (out_dir, ext, compresslevel, defaults, _, cache_dir), stem = task
+    site_id = f"site{index + 1}"
+    file_name = os.path.join(out_dir, f"{stem}{ext}")
+    try:
+        site_id = _site_id(index, row)
+        create_kml_compass(file_name=file_name, name=site_id, compresslevel=compresslevel, geometry_cache=_open_store(cache_dir),
+                           **parse_site(row, *defaults))
+        return site_id, None, None
+    except Exception as e:
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        return site_id, None, f"{type(e).__name__}: {e}"
+
+
+def _render_folder(task):
+    """
+    工作进程: 把一个站点渲染为 <Folder> 片段字符串，返回 (id, 片段, 错误信息)。
+    """
+    index, row, (_, _, _, defaults, _, cache_dir), _ = task
+    site_id = f"site{index + 1}"
+    try:
+        site_id = _site_id(index, row)
+        buf = io.StringIO()
+        with KMLWriter(buf) as kml, kml.folder(site_id):
+            write_compass(kml, geometry_cache=_open_store(cache_dir), **parse_site(row, *defaults))
+        return site_id, buf.getvalue(), None
+    except Exception as e:
+        return site_id, None, f"{type(e).__name__}: {e}"
+
+
+def _render_task(render, task):
+    """
+    工作进程入口: 调用 render(task)，在结果后加上该站点的计时报告 (未开启计时时为None)。
+    开启时每个站点单独记录，由主进程汇总。
+    """
+    if not task[2][4]:
+        return render(task) + (None,)
+    with instrument.recording() as rec:
+        result = render(task)
+    return result + (rec.report(),)
+
+
+def print_progress(done, total, errors):
+    sys.stderr.write(f"\r进度: {done}/{total}  失败: {errors}")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def run_batch(rows, output, combined=False, workers=None, chunksize=16, progress=print_progress, kmz=False, compresslevel=KMZ_COMPRESSLEVEL,
+              tolerance_m=None, lod=False, model="sphere", precision=None, altitude=True, profile=None,
+              geometry_cache_dir=None, local_tolerance_m=None, merge=False, declutter=False, wireframe=False, fill_rings=()):
+    """
+    批量渲染站点。
+
+    参数:
+    rows (list): read_sites 返回的原始行
+    output (str): combined=False 时为输出目录 (文件名由站点id清理得到，见 site_file_stems)；combined=True 时为输出文件名 (或 "-")
+    combined (bool): 是否合并为一个文档 (每个站点一个Folder)
+    workers (int): 进程数，默认为CPU核数；1 表示在当前进程内顺序执行
+    chunksize (int): 每次分发给工作进程的站点数
+    progress: 进度回调 (已完成数, 总数, 失败数)，为None时不报告
+    kmz (bool): 输出KMZ而不是KML (合并输出时文件名以 .kmz 结尾也会输出KMZ)
+    compresslevel (int): KMZ的压缩级别
+    tolerance_m (float): 未在行中指定时使用的弧线最大弦高误差 (米)
+    lod (bool): 未在行中指定时是否按三级精度输出
+    model (str): 未在行中指定时使用的大地测量模型
+    precision (int): 未在行中指定时使用的坐标小数位数
+    altitude (bool): 未在行中指定时坐标是否带 ",0" 高度
+    local_tolerance_m (float): 未在行中指定时使用的局部平面模板误差容差 (米)，None 时不使用模板
+    merge (bool): 未在行中指定时是否把每环同样式的扇区合并为一个Placemark
+    declutter (bool): 未在行中指定时是否按缩放级别避让标签
+    wireframe (bool): 未在行中指定时是否只输出线框
+    fill_rings (序列): 未在行中指定时线框模式下仍填色的环
+    geometry_cache_dir (str): 设置后各环的几何缓存在该目录 (见 geocache)
+    profile (instrument.Recorder): 设置后把各站点的分阶段耗时与计数汇总到该记录器
+
+    返回:
+    (成功数, [(站点id, 错误信息), ...])
+    """
+    if not combined:
+        os.makedirs(output, exist_ok=True)
+    defaults = (tolerance_m, lod, model, precision, altitude, local_tolerance_m, merge, declutter, wireframe, tuple(fill_rings))
+    options = (output, ".kmz" if kmz else ".kml", compresslevel, defaults, profile is not None, geometry_cache_dir)
+    stems = site_file_stems(rows) if not combined else [None] * len(rows)
+    tasks = [(i, row, options, stem) for i, (row, stem) in enumerate(zip(rows, stems))]
+    render = functools.partial(_render_task, _render_folder if combined else _render_file)
+    errors = []; done = 0
+
+    with contextlib.ExitStack() as stack:
+        if workers != 1:
+            pool = stack.enter_context(multiprocessing.Pool(workers))
+            # imap保持输入顺序，合并文档中的站点顺序与输入一致
+            results = pool.imap(render, tasks, chunksize)
+        else:
+            results = map(render, tasks)
+        kml = stack.enter_context(KMLWriter(output, kmz=kmz or None, compresslevel=compresslevel)) if combined else None
+        if kml:
+            kml.write(DOCUMENT_HEADER.format(name="罗盘批量图", description=f"共 {len(rows)} 个站点"))
+            write_styles(kml)
+        for site_id, fragment, error, report in results:
+            done += 1
+            if report and not error:
+                profile.merge(report, None if combined else site_id)
+            if error:
+                errors.append((site_id, error))
+            elif kml and report:
+                # 片段已在工作进程中计数，这里只计写入耗时
+                with instrument.stage("write"):
+                    kml.stream.write(fragment)
+            elif kml:
+                kml.write(fragment)
+            if progress:
+                progress(done, len(tasks), len(errors))
+        if kml:
+            kml.write(DOCUMENT_FOOTER)
+    return done - len(errors), errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从CSV/JSONL站点列表批量生成罗盘KML")
+    parser.add_argument("input", help="站点列表 (.csv 或 .jsonl)")
+    parser.add_argument("-o", "--output", required=True, help="输出目录；--combined 时为输出文件 ('-' 为标准输出，.kmz 结尾时输出KMZ)")
+    parser.add_argument("--combined", action="store_true", help="合并为一个KML文档，每个站点一个Folder")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="工作进程数 (默认: CPU核数)")
+    parser.add_argument("--chunksize", type=int, default=16, help="每次分发给工作进程的站点数")
+    parser.add_argument("--kmz", action="store_true", help="输出压缩的KMZ")
+    parser.add_argument("--compresslevel", type=int, default=KMZ_COMPRESSLEVEL, help="KMZ压缩级别 (0~9)")
+    parser.add_argument("--tolerance", type=float, default=None, help="弧线最大弦高误差 (米)，默认使用固定0.5度取点")
+    parser.add_argument("--lod", action="store_true", help="每一环按 粗/中/细 三级精度输出 (KML Region/Lod)")
+    parser.add_argument("--merge", action="store_true", help="每一环中样式相同的扇区合并为一个Placemark (MultiGeometry)，适合密集环")
+    parser.add_argument("--declutter", action="store_true", help="标签按缩放级别避让，缩小时只显示互不重叠的标签 (Region分级)")
+    parser.add_argument("--wireframe", action="store_true", help="各环只输出线框 (内外圆与扇区边界线)，不填色")
+    parser.add_argument("--fill", nargs="+", default=(), metavar="RING", help="线框模式下仍按扇区填色的环")
+    parser.add_argument("--geodesic", choices=GEODESIC_MODELS, default="sphere", help="大地测量模型: sphere 球面 (默认) 或 wgs84 椭球面")
+    parser.add_argument("--precision", type=int, default=None, help="坐标小数位数 (7位约1厘米)，默认保留完整精度")
+    parser.add_argument("--no-altitude", dest="altitude", action="store_false", help="坐标省略恒为0的高度")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不显示进度")
+    parser.add_argument("--template", nargs="?", type=float, const=DEFAULT_LOCAL_TOLERANCE_M, default=None, metavar="TOL",
+                        help=f"整圆按局部平面模板缩放换算，误差超过TOL米时退回精确计算 (默认 {DEFAULT_LOCAL_TOLERANCE_M})；适合大量几公里内的小罗盘")
+    parser.add_argument("--geometry-cache", nargs="?", const=geocache.GEOMETRY_CACHE_DIR, default=None, metavar="DIR",
+                        help=f"把各环的几何缓存在磁盘上，重新运行时直接载入 (默认目录: {geocache.GEOMETRY_CACHE_DIR})")
+    parser.add_argument("--profile", nargs="?", const="-", default=None, metavar="REPORT",
+                        help="记录分阶段耗时与计数，写入JSON报告 (不指定文件时输出到标准错误)")
+    args = parser.parse_args(argv)
+
+    rows = read_sites(args.input)
+    with contextlib.ExitStack() as stack:
+        profile = stack.enter_context(instrument.recording()) if args.profile else None
+        ok, errors = run_batch(rows, args.output, combined=args.combined, workers=args.workers,
+                               chunksize=args.chunksize, progress=None if args.quiet else print_progress,
+                               kmz=args.kmz, compresslevel=args.compresslevel, tolerance_m=args.tolerance, lod=args.lod, model=args.geodesic,
+                               precision=args.precision, altitude=args.altitude, profile=profile,
+                               geometry_cache_dir=args.geometry_cache, local_tolerance_m=args.template, merge=args.merge, declutter=args.declutter,
+                               wireframe=args.wireframe, fill_rings=args.fill)
+    if profile:
+        instrument.write_report(profile.report(), args.profile)
+    for site_id, error in errors:
+        print(f"错误：站点 '{site_id}' 生成失败。{error}", file=sys.stderr)
+    print(f"完成！成功 {ok} 个，失败 {len(errors)} 个。", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+批量点位分类：每个点相对罗盘圆心的方位角、距离，以及落在各环的哪个扇区。
+
+方位角和距离用与 geodesy 相同的球面模型 (反算公式) 按NumPy数组一次性计算；
+每一环的扇区按起始角排序，对方位角做二分查找 (np.searchsorted)，并处理跨0度的扇区。
+结果以列存的形式返回 {列名: 数组}，也可以直接写成CSV。
+
+用法:
+    python -m pyluopan.classify points.csv --lat 39.9163 --lon 116.3972 -o result.csv
+    python -m pyluopan.classify points.csv --lat 39.9163 --lon 116.3972 --rings 24shan 8gua --lat-col y --lon-col x
+"""
+import argparse
+import csv
+import sys
+
+from pyluopan.geodesy import EARTH_RADIUS, numpy_module
+from pyluopan.registry import get_ring
+
+DEFAULT_RINGS = ("28xiu", "24shan", "12dizhi", "8gua")
+
+
+def _require_numpy():
+    # 与其他模块一样在调用时才导入NumPy，并遵守 PYLUOPAN_NUMPY=0
+    np = numpy_module()
+    if np is None:
+        raise ImportError("批量点位分类需要NumPy (未安装，或已用 PYLUOPAN_NUMPY=0 禁用)")
+    return np
+
+
+def inverse_points(lat, lon, lats, lons):
+    """
+    批量反算圆心到各点的 (方位角[度, 0~360), 距离[米])，与 destination_points 互逆。
+    """
+    np = _require_numpy()
+    lat1 = np.radians(lat); lon1 = np.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=float)); dlon = np.radians(np.asarray(lons, dtype=float)) - lon1
+    cos_lat2 = np.cos(lat2); sin_lat2 = np.sin(lat2)
+    y = np.sin(dlon) * cos_lat2
+    x = np.cos(lat1) * sin_lat2 - np.sin(lat1) * cos_lat2 * np.cos(dlon)
+    bearings = np.degrees(np.arctan2(y, x)) % 360.0
+    # haversine
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * cos_lat2 * np.sin(dlon / 2) ** 2
+    dists = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return bearings, dists
+
+
+class SectorIndex:
+    """
+    一个环的扇区查找表。
+
+    参数:
+    sectors (list): [(名称, 起始角, 终止角), ...]，起始角大于终止角的扇区跨越0度
+    """
+
+    def __init__(self, sectors):
+        np = _require_numpy()
+        self.names = np.array([s[0] for s in sectors], dtype=object)
+        starts = np.array([s[1] % 360.0 for s in sectors], dtype=float)
+        spans = np.array([(s[2] - s[1]) % 360.0 or 360.0 for s in sectors], dtype=float)
+        self._order = np.argsort(starts, kind="stable")
+        self._starts = starts[self._order]
+        self._spans = spans[self._order]
+
+    def lookup(self, bearings):
+        """
+        返回每个方位角所在扇区的序号 (对应 sectors 中的位置)，不在任何扇区内时为 -1。
+        """
+        np = numpy_module()
+        b = np.asarray(bearings, dtype=float) % 360.0
+        # 起始角不大于b的最后一个扇区；b小于最小起始角时回绕到最后一个 (跨0度的) 扇区
+        k = np.searchsorted(self._starts, b, side="right") - 1
+        k[k < 0] = len(self._starts) - 1
+        inside = (b - self._starts[k]) % 360.0 < self._spans[k]
+        return np.where(inside, self._order[k], -1)
+
+    def names_of(self, indices):
+        np = numpy_module()
+        names = self.names[np.maximum(indices, 0)]
+        names[indices < 0] = ""
+        return names
+
+
+def classify_points(center_lat, center_lon, lats, lons, rings=DEFAULT_RINGS):
+    """
+    批量分类点位。
+
+    参数:
+    center_lat, center_lon (float): 罗盘圆心
+    lats, lons (数组): 点的纬度、经度
+    rings (序列): 环键或名称
+
+    返回:
+    {"bearing": 方位角, "distance": 距离(米), <环键>: 扇区名称, "<环键>_index": 扇区序号}，各列为等长的NumPy数组
+    """
+    bearings, dists = inverse_points(center_lat, center_lon, lats, lons)
+    table = {"bearing": bearings, "distance": dists}
+    for key in rings:
+        ring = get_ring(key)
+        index = SectorIndex(ring.sectors)
+        indices = index.lookup(bearings)
+        table[ring.key] = index.names_of(indices)
+        table[f"{ring.key}_index"] = indices
+    return table
+
+
+def read_points(path, lat_col="lat", lon_col="lon"):
+    """
+    从CSV读取点位的纬度、经度两列 (按表头列名定位，可以带引号或BOM)，返回两个NumPy数组。
+    """
+    np = _require_numpy()
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        reader.fieldnames = header = [h.strip() for h in reader.fieldnames or ()]
+        if lat_col not in header or lon_col not in header:
+            raise KeyError(f"{path} 中没有 {lat_col}/{lon_col} 列 (表头: {','.join(header)})")
+        lats = []; lons = []
+        for row in reader:
+            lats.append(row[lat_col]); lons.append(row[lon_col])
+    try:
+        return np.array(lats, dtype=float), np.array(lons, dtype=float)
+    except ValueError as e:
+        raise ValueError(f"{path}: {lat_col}/{lon_col} 列含有非数值: {e}") from None
+
+
+def write_csv(table, target, lats=None, lons=None, chunk=65536):
+    """
+    把 classify_points 的结果写成CSV (可选地在前面加上原始的纬度、经度两列)。target 为可写的文本流。
+    """
+    np = _require_numpy()
+    columns = ([("lat", lats), ("lon", lons)] if lats is not None else []) + list(table.items())
+    target.write(",".join(name for name, _ in columns) + "\n")
+    n = len(table["bearing"])
+    for i in range(0, n, chunk):
+        parts = [np.asarray(col[i:i + chunk]).tolist() for _, col in columns]
+        target.writelines(",".join(map(str, row)) + "\n" for row in zip(*parts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量计算点位的方位角、距离及所在扇区")
+    parser.add_argument("input", help="点位CSV (含表头)")
+    parser.add_argument("--lat", type=float, required=True, help="罗盘圆心纬度")
+    parser.add_argument("--lon", type=float, required=True, help="罗盘圆心经度")
+    parser.add_argument("--rings", nargs="+", default=list(DEFAULT_RINGS), help="要分类的环 (键或名称)")
+    parser.add_argument("--lat-col", default="lat", help="纬度列名")
+    parser.add_argument("--lon-col", default="lon", help="经度列名")
+    parser.add_argument("-o", "--output", default="-", help="输出CSV ('-' 为标准输出)")
+    args = parser.parse_args(argv)
+
+    lats, lons = read_points(args.input, args.lat_col, args.lon_col)
+    table = classify_points(args.lat, args.lon, lats, lons, args.rings)
+    if args.output == "-":
+        write_csv(table, sys.stdout, lats, lons)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            write_csv(table, f, lats, lons)
+        print(f"成功！文件 '{args.output}' 已生成，共 {len(lats)} 个点。", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+pyluopan 命令行入口 (安装后为 pyluopan 命令，也可以用 python -m pyluopan)。
+
+用法:
+    pyluopan render --lat 39.9163 --lon 116.3972 -r 1000 -o compass.kml
+    pyluopan render --lat 39.9163 --lon 116.3972 -r 1000 --rings 24shan 8gua --thickness 30 20 --gap 5 -f geojson > compass.geojson
+    pyluopan batch sites.csv -o out_dir --kmz
+    pyluopan diff kml/celestial_final_map_v11.kml compass.kml
+    pyluopan serve | rings | classify | timeseries ...   (参数同各模块的 python -m pyluopan.xxx)
+
+子命令的模块在调用时才导入。render 只导入生成一个罗盘所需的模块，且默认不使用NumPy:
+单个罗盘逐点计算比导入NumPy (几十毫秒) 更快，在shell管道中逐站点调用时启动开销只有几十毫秒。
+大半径或高精度的罗盘可以加 --numpy。
+"""
+import argparse
+import importlib
+import os
+import sys
+
+# 转交给各模块 main() 的子命令: 名称 -> (模块, 说明)
+COMMANDS = {
+    "batch": ("pyluopan.batch", "从CSV/JSONL站点列表批量生成罗盘"),
+    "diff": ("pyluopan.kmldiff", "流式比较两个KML/KMZ文件"),
+    "serve": ("pyluopan.server", "本地罗盘KML服务"),
+    "rings": ("pyluopan.registry", "把罗盘数据工作簿编译为环定义缓存"),
+    "classify": ("pyluopan.classify", "批量计算点位的方位角、距离及所在扇区"),
+    "timeseries": ("pyluopan.timeseries", "生成逐年/逐月高亮地支的时间序列罗盘"),
+}
+# render 的输出格式: kml/kmz 由 compass.create_kml_compass 写出，其余由 export 的写出器写出
+FORMATS = ("kml", "kmz", "geojson", "fgb")
+# 只用于KML输出的选项: (参数名, 选项)
+KML_ONLY_OPTIONS = (("lod", "--lod"), ("merge", "--merge"), ("declutter", "--declutter"), ("wireframe", "--wireframe"),
+                    ("fill", "--fill"), ("workers", "--workers"))
+
+
+def add_render_arguments(parser):
+    parser.add_argument("--lat", type=float, required=True, help="圆心纬度")
+    parser.add_argument("--lon", type=float, required=True, help="圆心经度")
+    parser.add_argument("-r", "--radius", type=float, required=True, help="最外环外部半径 (米)")
+    parser.add_argument("--rings", nargs="+", default=None, metavar="RING",
+                        help="从外到内的环 (环键或名称，如 28xiu 二十四山 60toudi dense72)，默认 28xiu 24shan 12dizhi 8gua")
+    parser.add_argument("--thickness", nargs="+", type=float, default=None, metavar="PCT", help="各环厚度 (本环外半径的百分比)，默认 20 20 20 15 (超过4环时各环等宽)")
+    parser.add_argument("--gap", nargs="+", type=float, default=None, metavar="PCT", help="相邻环间距 (最外环半径的百分比)，默认 5 5 5 (超过4环时平均分配)")
+    parser.add_argument("--name", default=None, help="文档名称")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，默认为标准输出")
+    parser.add_argument("-f", "--format", choices=FORMATS, default=None, help="输出格式，默认按文件扩展名确定 (标准输出时为kml)")
+    parser.add_argument("--tolerance", type=float, default=None, help="弧线最大弦高误差 (米)，默认使用固定0.5度取点")
+    parser.add_argument("--geodesic", choices=("sphere", "wgs84"), default="sphere", help="大地测量模型: sphere 球面 (默认) 或 wgs84 椭球面")
+    parser.add_argument("--precision", type=int, default=None, help="坐标小数位数 (7位约1厘米)，默认保留完整精度")
+    parser.add_argument("--no-altitude", dest="altitude", action="store_false", help="KML坐标省略恒为0的高度")
+    parser.add_argument("--lod", action="store_true", help="每一环按 粗/中/细 三级精度输出 (KML Region/Lod)")
+    parser.add_argument("--merge", action="store_true", help="每一环中样式相同的扇区合并为一个Placemark")
+    parser.add_argument("--declutter", action="store_true", help="标签按缩放级别避让")
+    parser.add_argument("--wireframe", action="store_true", help="各环只输出线框，不填色")
+    parser.add_argument("--fill", nargs="+", default=(), metavar="RING", help="线框模式下仍按扇区填色的环")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="各环并行生成的进程数，默认依次生成")
+    parser.add_argument("--numpy", action="store_true", help="用NumPy批量计算顶点 (大半径或高精度时更快)")
+
+
+def output_format(output, fmt=None):
+    """
+    确定render的输出格式: 指定的格式，或按文件扩展名，标准输出时为kml。无法确定时返回None。
+    """
+    if fmt:
+        return fmt
+    ext = os.path.splitext(output)[1].lower()
+    if output == "-" or ext == ".kml":
+        return "kml"
+    if ext == ".kmz":
+        return "kmz"
+    from pyluopan.export import format_for
+    return format_for(output)
+
+
+def render(args, parser):
+    """
+    生成一个罗盘。
+    """
+    if not args.numpy:
+        os.environ.setdefault("PYLUOPAN_NUMPY", "0")  # 并行时工作进程同样不导入NumPy
+    fmt = output_format(args.output, args.format)
+    if fmt is None:
+        parser.error(f"无法从文件名 '{args.output}' 确定输出格式，请指定 --format")
+    if fmt not in ("kml", "kmz"):
+        used = [option for dest, option in KML_ONLY_OPTIONS if getattr(args, dest)]
+        if used:
+            parser.error(f"{' '.join(used)} 只用于KML/KMZ输出")
+
+    from pyluopan.compass import DEFAULT_RINGS, ring_layout
+    rings = tuple(args.rings or DEFAULT_RINGS)
+    try:
+        thick_pcts, gap_pcts = ring_layout(rings, args.thickness, args.gap)
+    except ValueError as e:
+        parser.error(f"{e}，请指定 --thickness/--gap")
+    extra = {"name": args.name} if args.name else {}
+    try:
+        if fmt in ("kml", "kmz"):
+            from pyluopan.compass import create_kml_compass
+            create_kml_compass(args.lat, args.lon, args.radius, args.output, rings, thick_pcts, gap_pcts, tolerance_m=args.tolerance,
+                               lod=args.lod, kmz=fmt == "kmz", model=args.geodesic, precision=args.precision, altitude=args.altitude,
+                               workers=args.workers, merge=args.merge, declutter=args.declutter, wireframe=args.wireframe,
+                               fill_rings=tuple(args.fill), **extra)
+        else:
+            from pyluopan.export import export
+            from pyluopan.model import build_compass
+            compass = build_compass(args.lat, args.lon, args.radius, rings, thick_pcts, gap_pcts, tolerance_m=args.tolerance,
+                                    model=args.geodesic, **extra)
+            export(compass, args.output, fmt, args.precision)
+    except (KeyError, ValueError) as e:
+        print(f"错误：{e.args[0] if e.args else e}", file=sys.stderr)
+        return 1
+    if args.output != "-":
+        print(f"成功！文件 '{args.output}' 已生成。", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        module = importlib.import_module(COMMANDS[argv[0]][0])
+        sys.argv[0] = f"pyluopan {argv[0]}"  # 各模块的用法说明中显示为子命令
+        return module.main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog="pyluopan", description="罗盘KML生成工具")
+    commands = parser.add_subparsers(dest="command", metavar="命令")
+    commands.required = True
+    render_parser = commands.add_parser("render", help="生成一个罗盘 (KML/KMZ/GeoJSON/FlatGeobuf)")
+    add_render_arguments(render_parser)
+    for name, (_, help_text) in COMMANDS.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+    args = parser.parse_args(argv)
+    return render(args, render_parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+多环罗盘的数据与渲染。
+
+环的内容 (二十八宿、二十四山、十二地支、八卦) 由 registry 从罗盘数据工作簿加载，
+这里把"按环配置渲染一个罗盘"做成可复用的函数，供单图脚本和批量模式共用；
+rings 参数可以是任意顺序、任意个数的环，包括 registry 中的密集环 (如 "60toudi"、"360du"、"dense72")。
+
+declutter 时所有标签不再随各环输出，而是经 labels 按缩放级别避让后写入"标签"文件夹。
+
+各环文件夹相互独立，可以分发到进程池并行渲染 (workers)，再按原顺序拼接，输出与顺序渲染逐字节一致。
+"""
+import contextlib
+import io
+import re
+
+from pyluopan import instrument
+from pyluopan.arcs import ArcCache
+from pyluopan.geodesy import get_mid_angle
+from pyluopan.kml import KMZ_COMPRESSLEVEL, POINT_PLACEMARK, KMLWriter, StyleRegistry, escape_text, multiline_placemark, ring_placemarks
+from pyluopan.labels import Label, decluttered_label_placemarks
+from pyluopan.lod import lod_ring_placemarks
+from pyluopan.registry import get_ring
+
+# ==============================================================================
+# 环的配色与样式 (环的内容见 registry，来自 database/绘制罗盘数据.xlsx)
+# ==============================================================================
+
+ELEMENT_COLORS = {"木":"6078AB00","火":"601F25D9","土":"6000A5FF","金":"60E0E0E0","水":"60D07000"}
+MOUNTAIN_COLORS = ["60808080","60A0A0A0"]
+BRANCH_COLORS = ["606A4982", "608355A0"]
+GUA_COLORS = ["60334C66", "604A6680"]
+
+
+# 将所有字体颜色设为醒目的金黄色(ff00ffff)，并保持深色光晕效果
+LABEL_STYLES = (
+    ("styleMansionLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>0.9</scale><bgColor>b3000000</bgColor></LabelStyle>'),
+    ("styleMountainLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>0.75</scale><bgColor>b3000000</bgColor></LabelStyle>'),
+    ("styleBranchLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>0.6</scale><bgColor>b3000000</bgColor></LabelStyle>'),
+    ("styleGuaLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>0.8</scale><bgColor>b3000000</bgColor></LabelStyle>'),
+    ("styleAngleLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>1.0</scale><bgColor>b3000000</bgColor></LabelStyle>'),
+    ("styleCrosshair", '<LineStyle><color>ffffffff</color><width>1.5</width></LineStyle>'),
+)
+
+# 标签样式id -> LabelStyle的scale (标签避让时估算字号)
+LABEL_SCALES = {style_id: float(m.group(1)) for style_id, m in ((style_id, re.search(r"<LabelStyle>.*<scale>([\d.]+)</scale>", body)) for style_id, body in LABEL_STYLES) if m}
+# 外部角度标签所在半径与最外环半径之比
+ANGLE_LABEL_FACTOR = 1.15
+
+
+def register_styles(styles):
+    """
+    在样式表中登记罗盘用到的全部共享样式，返回样式表。
+    """
+    for e,c in ELEMENT_COLORS.items(): styles.register(f"style{e}", f'<LineStyle><width>1.2</width><color>c0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    for i,c in enumerate(MOUNTAIN_COLORS): styles.register(f"styleMountain{i}", f'<LineStyle><width>1</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    for i,c in enumerate(BRANCH_COLORS): styles.register(f"styleBranch{i}", f'<LineStyle><width>0.8</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    for i,c in enumerate(GUA_COLORS): styles.register(f"styleGua{i}", f'<LineStyle><width>0.6</width><color>a0ffffff</color></LineStyle><PolyStyle><color>{c}</color></PolyStyle>')
+    for style_id, body in LABEL_STYLES: styles.register(style_id, body)
+    return styles
+
+
+# 样式id -> 去重后的styleUrl (各进程独立计算，结果相同)
+STYLE_URLS = register_styles(StyleRegistry())
+
+
+def _mansion_styles(ring):
+    elements = ring.attributes.get("五行", {})
+
+    def style(i, name):
+        element = elements.get(name, '')
+        return (STYLE_URLS.url(f"style{'火' if element in ['日','月'] else element}"), f"{name} ({element})", f"{name}\n({element})")
+    return style
+
+
+def _alternating_styles(prefix, colors):
+    return lambda ring: lambda i, name: (STYLE_URLS.url(f"{prefix}{i%len(colors)}"), name, name)
+
+
+# 环的样式: 键 -> (标签样式, 由环生成样式映射函数)。工作表中新增的环和密集环沿用二十四山的样式。
+RING_STYLES = {
+    "28xiu": ("styleMansionLabel", _mansion_styles),
+    "24shan": ("styleMountainLabel", _alternating_styles("styleMountain", MOUNTAIN_COLORS)),
+    "12dizhi": ("styleBranchLabel", _alternating_styles("styleBranch", BRANCH_COLORS)),
+    "8gua": ("styleGuaLabel", _alternating_styles("styleGua", GUA_COLORS)),
+}
+
+DEFAULT_RINGS = ("28xiu", "24shan", "12dizhi", "8gua")
+DEFAULT_THICKNESS_PERCENTS = (20, 20, 20, 15)
+DEFAULT_GAP_PERCENTS = (5, 5, 5)
+
+DOCUMENT_HEADER = '<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>{name}</name><description>{description}</description>'
+DOCUMENT_FOOTER = "\n</Document>\n</kml>"
+
+
+def resolve_ring(key):
+    """
+    按键 ("24shan") 或名称 ("二十四山") 查找环，返回 (名称, 扇区数据, 标签样式, 样式映射函数)。
+    """
+    ring = get_ring(key)
+    label_style, styles = RING_STYLES.get(ring.key, RING_STYLES["24shan"])
+    return ring.name, ring.sectors, label_style, styles(ring)
+
+
+def ring_layout(rings, thick_pcts=None, gap_pcts=None):
+    """
+    返回 rings 的 (厚度百分比, 间距百分比)，未指定的一项使用默认值。参数个数不匹配或超出外部半径时抛出 ValueError。
+    不超过4环时默认值取 DEFAULT_THICKNESS_PERCENTS/DEFAULT_GAP_PERCENTS 的前几项；
+    更多环时把外部半径的75%平均分给各环、15%平均分给各间距，各环等宽。
+    """
+    n = len(rings)
+    if n <= len(DEFAULT_THICKNESS_PERCENTS):
+        default_thick, default_gaps = DEFAULT_THICKNESS_PERCENTS[:n], DEFAULT_GAP_PERCENTS[:max(n - 1, 0)]
+    else:
+        width, gap = 75.0 / n, 15.0 / (n - 1)
+        default_thick = tuple(100.0 * width / (100.0 - i * (width + gap)) for i in range(n))
+        default_gaps = (gap,) * (n - 1)
+    thick_pcts = tuple(thick_pcts or default_thick)
+    gap_pcts = tuple(gap_pcts or default_gaps)
+    if len(thick_pcts) != n or len(gap_pcts) < n - 1:
+        raise ValueError(f"环数({n})与厚度({len(thick_pcts)})/间距({len(gap_pcts)})参数个数不匹配")
+    if not all(0 < t <= 100 for t in thick_pcts) or not all(0 <= g < 100 for g in gap_pcts):
+        raise ValueError("厚度须在 (0, 100] 之间，间距须在 [0, 100) 之间")
+    if n and ring_radii(100.0, thick_pcts, gap_pcts)[-1][1] < 0:
+        raise ValueError("各环厚度与间距之和超过了外部半径")
+    return thick_pcts, gap_pcts
+
+
+def ring_radii(r1_outer_m, thick_pcts, gap_pcts):
+    """
+    由最外环半径和各环厚度/间距百分比计算每一环的 (外半径, 内半径)。
+    厚度按本环外半径的百分比计，间距按最外环半径的百分比计。
+    """
+    radii = []
+    for i, thick_pct in enumerate(thick_pcts):
+        r_outer = r1_outer_m if i == 0 else radii[-1][1] - r1_outer_m * (gap_pcts[i - 1] / 100.0)
+        radii.append((r_outer, r_outer * (1 - thick_pct / 100.0)))
+    return radii
+
+
+def write_styles(kml, styles=None):
+    """
+    写出罗盘的共享样式。传入文档的样式表时，已经输出过的样式不会重复输出。
+    """
+    with instrument.stage("styles"):
+        register_styles(styles if styles is not None else StyleRegistry()).write(kml)
+
+
+def _write_ring(kml, arcs, n, key, r_outer, r_inner, lod, merge, labels=True, wireframe=False):
+    name, data, label_style, style_map_func = resolve_ring(key)
+    with kml.folder(f"环{n}：{name}"):
+        if lod:
+            kml.writelines(lod_ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, merge=merge, labels=labels,
+                                               wireframe=wireframe))
+        else:
+            kml.writelines(ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, labels, merge, wireframe))
+
+
+def _write_labels(kml, arcs, rings, radii, r1_outer_m):
+    labels = []
+    for key, (r_outer, r_inner) in zip(rings, radii):
+        _, data, label_style, style_map_func = resolve_ring(key)
+        scale = LABEL_SCALES.get(label_style, 1.0)
+        for i, (item_name, start, end) in enumerate(data):
+            labels.append(Label(style_map_func(i, item_name)[2], f"#{label_style}", (r_outer + r_inner) / 2, get_mid_angle(start, end), scale))
+    for angle in range(0,360,15):
+        labels.append(Label(f"{angle}°", "#styleAngleLabel", r1_outer_m*ANGLE_LABEL_FACTOR, angle, LABEL_SCALES["styleAngleLabel"]))
+    with kml.folder("标签"):
+        kml.writelines(decluttered_label_placemarks(arcs, labels, r1_outer_m*ANGLE_LABEL_FACTOR))
+
+
+def _write_markers(kml, arcs, r1_outer_m, r_innermost, angle_labels=True):
+    with kml.folder("中心与外部标记"):
+        if r_innermost > 0:
+            cross_r = r_innermost * 0.9
+            with instrument.stage("labels"):
+                n,s,e,w=[arcs.point_coord(cross_r,b) for b in (0,180,90,270)]
+            kml.write(multiline_placemark("中心十字", "#styleCrosshair", (f"{n} {s}", f"{e} {w}")))
+        if not angle_labels:
+            return
+        with instrument.stage("labels"):
+            arcs.prefetch(r1_outer_m*ANGLE_LABEL_FACTOR, list(range(0,360,15)))
+            angle_coords = [arcs.point_coord(r1_outer_m*ANGLE_LABEL_FACTOR,angle) for angle in range(0,360,15)]
+        for angle, coord in zip(range(0,360,15), angle_coords):
+            kml.writelines(POINT_PLACEMARK.parts(f"{angle}°", "#styleAngleLabel", coord))
+
+
+def _render_part(task):
+    """
+    工作进程: 用独立的圆弧缓存把一个文件夹渲染为字符串。
+    """
+    arc_options, write_part, args = task
+    buf = io.StringIO()
+    with KMLWriter(buf) as kml:
+        write_part(kml, ArcCache(**arc_options), *args)
+    return buf.getvalue()
+
+
+def write_compass(kml, center_lat, center_lon, r1_outer_m, rings=DEFAULT_RINGS, thick_pcts=DEFAULT_THICKNESS_PERCENTS, gap_pcts=DEFAULT_GAP_PERCENTS,
+                  tolerance_m=None, lod=False, model="sphere", precision=None, altitude=True, geometry_cache=None, local_tolerance_m=None, arcs=None,
+                  workers=None, merge=False, declutter=False, wireframe=False, fill_rings=()):
+    """
+    把一个罗盘的所有环文件夹及"中心与外部标记"写入kml (不含文档头尾和样式)。
+
+    参数:
+    rings (序列): 从外到内的环键或名称
+    thick_pcts (序列): 每一环的厚度百分比，长度与rings相同
+    gap_pcts (序列): 相邻两环之间的间距百分比，长度为len(rings)-1
+    tolerance_m (float): 弧线最大弦高误差 (米)，None时使用固定0.5度取点
+    lod (bool): 是否按 粗/中/细 三级精度输出每一环 (KML Region/Lod)，切换阈值由各环半径决定
+    model (str): 大地测量模型，"sphere" 球面 或 "wgs84" 椭球面
+    precision (int): 坐标小数位数 (7位约1厘米)，None 时保留完整精度
+    altitude (bool): False 时坐标省略恒为0的高度
+    geometry_cache (geocache.GeometryStore): 磁盘几何缓存，参数不变时直接载入各环的几何
+    local_tolerance_m (float): 设置后整圆用局部平面模板计算 (适合几公里内的罗盘)，误差上界超过此值 (米) 的半径退回精确计算
+    arcs (ArcCache): 与调用方共用的圆弧缓存 (如时间序列中的高亮扇区)，None 时按上面的参数新建
+    workers (int 或 Executor): 并行渲染各环文件夹的进程数 (或现成的进程池/线程池)，None/1 时顺序渲染。
+        进程池的启动开销约几十毫秒，只在取点很密或环很多时才值得开启
+    merge (bool): 每一环中样式相同的扇区合并为一个 <MultiGeometry> Placemark (适合72、120、360等分的密集环)
+    declutter (bool): 标签按缩放级别避让，写入带Region的"标签"文件夹 (见 labels)，缩小时只显示互不重叠的标签
+    wireframe (bool): 各环只输出线框 (内外圆与扇区边界线，各输出一次)，不输出填色的扇区多边形
+    fill_rings (序列): 线框模式下仍按扇区填色输出的环 (键或名称)
+    """
+    if len(thick_pcts) != len(rings) or len(gap_pcts) < len(rings) - 1:
+        raise ValueError(f"环数({len(rings)})与厚度({len(thick_pcts)})/间距({len(gap_pcts)})参数个数不匹配")
+    if arcs is None:
+        arcs = ArcCache(center_lat, center_lon, tolerance_m=tolerance_m, model=model, precision=precision, altitude=altitude, store=geometry_cache,
+                        local_tolerance_m=local_tolerance_m)
+    with instrument.stage("radii"):
+        radii = ring_radii(r1_outer_m, thick_pcts, gap_pcts)
+    # 各环文件夹及"中心与外部标记"，按输出顺序排列
+    filled = {get_ring(key).key for key in fill_rings}
+    parts = [(_write_ring, (n, key, r_outer, r_inner, lod, merge, not declutter, wireframe and get_ring(key).key not in filled))
+             for n, (key, (r_outer, r_inner)) in enumerate(zip(rings, radii), 1)]
+    parts.append((_write_markers, (r1_outer_m, radii[-1][1] if radii else 0, not declutter)))
+    if declutter:
+        parts.append((_write_labels, (tuple(rings), radii, r1_outer_m)))
+
+    if workers is None or workers == 1:
+        for write_part, args in parts:
+            write_part(kml, arcs, *args)
+        return
+    import concurrent.futures  # 导入较慢 (约15毫秒)，只在并行时导入
+    with contextlib.ExitStack() as stack:
+        pool = workers if isinstance(workers, concurrent.futures.Executor) else stack.enter_context(concurrent.futures.ProcessPoolExecutor(workers))
+        # map按提交顺序返回，先完成的文件夹等待前面的文件夹写出后再写
+        for fragment in pool.map(_render_part, [(arcs.options(), write_part, args) for write_part, args in parts]):
+            kml.write(fragment)
+
+
+def create_kml_compass(center_lat, center_lon, r1_outer_m, file_name, rings=DEFAULT_RINGS, thick_pcts=DEFAULT_THICKNESS_PERCENTS, gap_pcts=DEFAULT_GAP_PERCENTS,
+                       name="四环-天文地理总图(V11)", description=None, compresslevel=KMZ_COMPRESSLEVEL, tolerance_m=None, lod=False, kmz=None, model="sphere",
+                       precision=None, altitude=True, geometry_cache=None, local_tolerance_m=None, workers=None, merge=False, declutter=False,
+                       wireframe=False, fill_rings=()):
+    """
+    生成一个完整的多环罗盘KML文档。file_name 可以是文件名、"-" 或可写流，以 .kmz 结尾时 (或 kmz=True) 输出KMZ。
+    description 缺省时按环的顺序生成，如 "从外到内:二十八宿、二十四山、十二地支、八卦。"
+    """
+    if description is None:
+        description = f"从外到内:{'、'.join(resolve_ring(key)[0] for key in rings)}。"
+    with KMLWriter(file_name, kmz=kmz, compresslevel=compresslevel) as kml:
+        kml.write(DOCUMENT_HEADER.format(name=escape_text(name), description=escape_text(description)))
+        write_styles(kml)
+        write_compass(kml, center_lat, center_lon, r1_outer_m, rings, thick_pcts, gap_pcts, tolerance_m, lod, model, precision, altitude,
+                      geometry_cache, local_tolerance_m, workers=workers, merge=merge, declutter=declutter,
+                      wireframe=wireframe, fill_rings=fill_rings)
+        kml.write(DOCUMENT_FOOTER)
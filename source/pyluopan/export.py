@@ -0,0 +1,180 @@
+"""
+把罗盘几何模型 (model.Compass) 写成不同的格式。
+
+    kml      与 create_kml_compass 的输出相同 (.kml/.kmz)
+    geojson  RFC 7946 FeatureCollection，逐个要素流式写出，每个要素一行
+    fgb      FlatGeobuf，带紧凑Hilbert R树空间索引，QGIS/GDAL/PostGIS 可按外包框只读取需要的要素
+
+每个要素的属性: id, kind, ring, folder, name, title, element, style (含义见 model.Feature)。
+写出器按格式名登记在 WRITERS 中，也可以登记新的格式。
+
+用法:
+    python -m pyluopan.export --lat 39.9163 --lon 116.3972 -r 1000 -o compass.geojson
+    python -m pyluopan.export --lat 39.9163 --lon 116.3972 -r 1000 -o compass.fgb --rings 28xiu 24shan
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from pyluopan.compass import DEFAULT_RINGS, DOCUMENT_FOOTER, DOCUMENT_HEADER, ring_layout, write_styles
+from pyluopan.flatgeobuf import write_flatgeobuf
+from pyluopan.geodesy import GEODESIC_MODELS, format_coords
+from pyluopan.kml import KMZ_COMPRESSLEVEL, POINT_PLACEMARK, POLYGON_PLACEMARK, KMLWriter, escape_text, multiline_placemark
+from pyluopan.model import build_compass
+
+# 属性列: (名称, FlatGeobuf列类型)
+COLUMNS = (("id", "String"), ("kind", "String"), ("ring", "String"), ("folder", "String"), ("name", "String"), ("title", "String"),
+           ("element", "String"), ("style", "String"))
+
+
+def feature_properties(folder, feature):
+    return {"id": feature.id, "kind": feature.kind, "ring": feature.ring, "folder": folder.name, "name": feature.name, "title": feature.title,
+            "element": feature.element, "style": feature.style}
+
+
+@contextlib.contextmanager
+def _open_output(target, binary=False):
+    """
+    打开输出: 文件名、"-" (标准输出) 或可写的流 (不关闭)。
+    """
+    if hasattr(target, "write"):
+        yield target
+    elif target == "-":
+        yield sys.stdout.buffer if binary else sys.stdout
+    else:
+        with open(target, "wb" if binary else "w", encoding=None if binary else "utf-8", buffering=1 << 16) as f:
+            yield f
+
+
+# ==============================================================================
+# 写出器
+# ==============================================================================
+
+def write_kml(compass, target, precision=None, altitude=True, kmz=None, compresslevel=KMZ_COMPRESSLEVEL):
+    """
+    写成KML/KMZ，Folder与Placemark的顺序和内容与 create_kml_compass 相同。
+    """
+    def coords(part):
+        return format_coords([p[0] for p in part], [p[1] for p in part], precision, altitude)
+
+    with KMLWriter(target, kmz=kmz, compresslevel=compresslevel) as kml:
+        kml.write(DOCUMENT_HEADER.format(name=escape_text(compass.name), description=escape_text(compass.description)))
+        write_styles(kml)
+        for folder in compass.folders:
+            with kml.folder(folder.name):
+                for f in folder.features:
+                    url = f"#{f.style}"
+                    if f.geometry == "Polygon":
+                        kml.writelines(POLYGON_PLACEMARK.parts(f.title, url, " ".join(coords(f.parts[0]))))
+                    elif f.geometry == "Point":
+                        kml.writelines(POINT_PLACEMARK.parts(f.title, url, coords(f.parts[0])[0]))
+                    else:
+                        kml.write(multiline_placemark(f.title, url, [" ".join(coords(part)) for part in f.parts]))
+        kml.write(DOCUMENT_FOOTER)
+
+
+def geojson_geometry(feature, precision=None):
+    """
+    返回要素的GeoJSON几何。多边形外环按RFC 7946改为逆时针 (模型中扇区外弧为顺时针)。
+    """
+    def position(p):
+        return [round(p[0], precision), round(p[1], precision)] if precision is not None else list(p)
+
+    if feature.geometry == "Point":
+        return {"type": "Point", "coordinates": position(feature.parts[0][0])}
+    if feature.geometry == "Polygon":
+        return {"type": "Polygon", "coordinates": [[position(p) for p in reversed(part)] for part in feature.parts]}
+    return {"type": feature.geometry, "coordinates": [[position(p) for p in part] for part in feature.parts]}
+
+
+def write_geojson(compass, target, precision=None):
+    """
+    写成GeoJSON FeatureCollection。要素逐个序列化写出，不在内存中拼接整个文档。
+    """
+    with _open_output(target) as out:
+        out.write('{"type":"FeatureCollection","name":%s,"features":[\n' % json.dumps(compass.name, ensure_ascii=False))
+        first = True
+        for folder in compass.folders:
+            for feature in folder.features:
+                item = {"type": "Feature", "id": feature.id, "properties": feature_properties(folder, feature),
+                        "geometry": geojson_geometry(feature, precision)}
+                out.write(("" if first else ",\n") + json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+                first = False
+        out.write("\n]}\n")
+
+
+def write_fgb(compass, target, precision=None):
+    """
+    写成带空间索引的FlatGeobuf (见 flatgeobuf)。
+    """
+    def part(points):
+        return [(round(x, precision), round(y, precision)) for x, y in points] if precision is not None else points
+
+    features = [(f.geometry, [part(p) for p in f.parts], feature_properties(folder, f)) for folder in compass.folders for f in folder.features]
+    with _open_output(target, binary=True) as out:
+        write_flatgeobuf(out, features, COLUMNS, name=compass.name)
+
+
+# 格式名 -> (写出函数, 文件扩展名)。写出函数为 f(compass, target, precision=None)
+WRITERS = {
+    "kml": (write_kml, (".kml", ".kmz")),
+    "geojson": (write_geojson, (".geojson", ".json")),
+    "fgb": (write_fgb, (".fgb",)),
+}
+
+
+def format_for(file_name):
+    """
+    按文件扩展名确定格式，无法确定时返回None。
+    """
+    ext = os.path.splitext(str(file_name))[1].lower()
+    for name, (_, extensions) in WRITERS.items():
+        if ext in extensions:
+            return name
+    return None
+
+
+def export(compass, target, fmt=None, precision=None):
+    """
+    按格式写出罗盘模型。fmt 缺省时按文件扩展名确定。
+    """
+    fmt = fmt or format_for(target)
+    if fmt not in WRITERS:
+        raise ValueError(f"未知的输出格式: {fmt}")
+    WRITERS[fmt][0](compass, target, precision=precision)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把罗盘导出为 KML / GeoJSON / FlatGeobuf")
+    parser.add_argument("--lat", type=float, required=True, help="圆心纬度")
+    parser.add_argument("--lon", type=float, required=True, help="圆心经度")
+    parser.add_argument("-r", "--radius", type=float, required=True, help="最外环外部半径 (米)")
+    parser.add_argument("--rings", nargs="+", default=list(DEFAULT_RINGS), help="罗盘的环 (从外到内)")
+    parser.add_argument("--thickness", nargs="+", type=float, default=None, metavar="PCT", help="各环厚度 (本环外半径的百分比)")
+    parser.add_argument("--gap", nargs="+", type=float, default=None, metavar="PCT", help="相邻环间距 (最外环半径的百分比)")
+    parser.add_argument("--tolerance", type=float, default=None, help="弧线最大弦高误差 (米)")
+    parser.add_argument("--geodesic", choices=GEODESIC_MODELS, default="sphere", help="大地测量模型")
+    parser.add_argument("--precision", type=int, default=None, help="坐标小数位数，默认保留完整精度")
+    parser.add_argument("-f", "--format", choices=sorted(WRITERS), default=None, help="输出格式，默认按文件扩展名确定")
+    parser.add_argument("-o", "--output", required=True, help="输出文件 ('-' 为标准输出，此时须指定 --format)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or format_for(args.output)
+    if fmt is None:
+        parser.error(f"无法从文件名 '{args.output}' 确定输出格式，请指定 --format")
+    try:
+        thick_pcts, gap_pcts = ring_layout(args.rings, args.thickness, args.gap)
+    except ValueError as e:
+        parser.error(f"{e}，请指定 --thickness/--gap")
+    compass = build_compass(args.lat, args.lon, args.radius, rings=args.rings, thick_pcts=thick_pcts,
+                            gap_pcts=gap_pcts, tolerance_m=args.tolerance, model=args.geodesic)
+    export(compass, args.output, fmt, args.precision)
+    if args.output != "-":
+        print(f"成功！文件 '{args.output}' 已生成。", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+FlatGeobuf 写出 (不依赖GDAL或flatbuffers库)。
+
+FlatGeobuf 文件的结构:
+    魔数 "fgb\\x03fgb\\x00"
+    头部      uint32长度 + FlatBuffers表 Header (名称、外包框、属性列、要素数、CRS)
+    空间索引  紧凑Hilbert R树 (packed Hilbert R-tree)，每个节点 40 字节: minX, minY, maxX, maxY (double), offset (uint64)
+    要素      每个要素 uint32长度 + FlatBuffers表 Feature (几何、属性)
+要素按外包框中心的Hilbert值排序后写出，读取方 (GDAL/QGIS/PostGIS的ogr_fdw等) 按外包框查询时
+只需读索引和命中的要素，不必解析整个文件。
+
+这里只实现写出罗盘要用到的部分: 二维几何 (Point/LineString/Polygon/MultiLineString 等)，
+String/Double/Int 属性列，整个文件的几何类型为 Unknown (每个要素各自带类型)。
+"""
+import struct
+
+MAGIC = b"fgb\x03fgb\x00"
+DEFAULT_NODE_SIZE = 16
+
+# 几何类型
+GEOMETRY_TYPES = {"Unknown": 0, "Point": 1, "LineString": 2, "Polygon": 3, "MultiPoint": 4, "MultiLineString": 5, "MultiPolygon": 6}
+# 属性列类型: 名称 -> (类型编号, 编码函数)
+COLUMN_TYPES = {
+    "Int": (5, lambda v: struct.pack("<i", v)),
+    "Double": (10, lambda v: struct.pack("<d", v)),
+    "String": (11, lambda v: struct.pack("<I", len(v.encode("utf-8"))) + v.encode("utf-8")),
+}
+
+_NODE = struct.Struct("<4dQ")
+
+
+# ==============================================================================
+# FlatBuffers 编码 (只支持正向布局: 每个表之前是它的vtable，被引用的对象写在引用它的表之后)
+# ==============================================================================
+
+class _Builder:
+    """
+    把嵌套的表编码为一个FlatBuffers缓冲区。
+
+    表用字段列表表示，下标为字段编号，缺省的字段为None；每个字段为 (格式, 值):
+        struct格式 ("B", "?", "H", "i", "I", "Q", "d")  标量
+        "s"   字符串
+        "v" + struct格式 (如 "vd")                         标量向量，值为序列 (字节向量也可以直接给bytes)
+        "t"   子表 (值为字段列表)
+        "vt"  子表向量 (值为字段列表的列表)
+    """
+
+    def __init__(self):
+        self.buf = bytearray(4)
+
+    def _pad(self, align, extra=0):
+        self.buf += bytes(-(len(self.buf) + extra) % align)
+
+    def _table(self, fields):
+        layout = []; size = 4
+        present = [(i, f) for i, f in enumerate(fields) if f is not None]
+        # 大的标量在前，减少对齐填充
+        for i, (fmt, value) in sorted(present, key=lambda p: -self._inline_size(p[1][0])):
+            width = self._inline_size(fmt)
+            size += -size % width
+            layout.append((i, fmt, value, size)); size += width
+        offsets = [0] * len(fields)
+        for i, _, _, offset in layout:
+            offsets[i] = offset
+        self._pad(2)
+        vtable = len(self.buf)
+        self.buf += struct.pack(f"<{2 + len(fields)}H", 4 + 2 * len(fields), size, *offsets)
+        self._pad(8)
+        table = len(self.buf)
+        self.buf += bytes(size)
+        struct.pack_into("<i", self.buf, table, table - vtable)
+        for _, fmt, value, offset in layout:
+            if len(fmt) == 1 and fmt not in "st":
+                struct.pack_into(f"<{fmt}", self.buf, table + offset, value)
+        for _, fmt, value, offset in layout:
+            if len(fmt) > 1 or fmt in "st":
+                target = self._object(fmt, value)
+                struct.pack_into("<I", self.buf, table + offset, target - (table + offset))
+        return table
+
+    @staticmethod
+    def _inline_size(fmt):
+        return 4 if len(fmt) > 1 or fmt in "st" else struct.calcsize(f"<{fmt}")
+
+    def _object(self, fmt, value):
+        if fmt == "t":
+            return self._table(value)
+        if fmt == "s":
+            data = value.encode("utf-8")
+            self._pad(4)
+            pos = len(self.buf)
+            self.buf += struct.pack("<I", len(data)) + data + b"\0"
+            return pos
+        if fmt == "vt":
+            self._pad(4)
+            pos = len(self.buf)
+            self.buf += struct.pack("<I", len(value)) + bytes(4 * len(value))
+            for k, fields in enumerate(value):
+                slot = pos + 4 + 4 * k
+                struct.pack_into("<I", self.buf, slot, self._table(fields) - slot)
+            return pos
+        elem = fmt[1:]
+        self._pad(max(4, struct.calcsize(f"<{elem}")), 4)
+        pos = len(self.buf)
+        data = bytes(value) if isinstance(value, (bytes, bytearray)) else struct.pack(f"<{len(value)}{elem}", *value)
+        self.buf += struct.pack("<I", len(value)) + data
+        return pos
+
+    def finish(self, fields):
+        struct.pack_into("<I", self.buf, 0, self._table(fields))
+        self._pad(4)
+        return bytes(self.buf)
+
+
+def encode_table(fields):
+    """
+    把一个表 (字段列表，见 _Builder) 编码为带uint32长度前缀的FlatBuffers缓冲区。
+    """
+    data = _Builder().finish(fields)
+    return struct.pack("<I", len(data)) + data
+
+
+# ==============================================================================
+# 空间索引
+# ==============================================================================
+
+def hilbert(x, y):
+    """
+    16位整数坐标 (x, y) 的Hilbert曲线值。
+    """
+    a = x ^ y; b = 0xFFFF ^ a; c = 0xFFFF ^ (x | y); d = x & (y ^ 0xFFFF)
+    A = a | (b >> 1); B = (a >> 1) ^ a; C = ((c >> 1) ^ (b & (d >> 1))) ^ c; D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+    for shift in (2, 4):
+        a, b, c, d = A, B, C, D
+        A = (a & (a >> shift)) ^ (b & (b >> shift))
+        B = (a & (b >> shift)) ^ (b & ((a ^ b) >> shift))
+        C ^= (a & (c >> shift)) ^ (b & (d >> shift))
+        D ^= (b & (c >> shift)) ^ ((a ^ b) & (d >> shift))
+    a, b, c, d = A, B, C, D
+    C ^= (a & (c >> 8)) ^ (b & (d >> 8))
+    D ^= (b & (c >> 8)) ^ ((a ^ b) & (d >> 8))
+    a = C ^ (C >> 1); b = D ^ (D >> 1)
+    i0 = x ^ y; i1 = b | (0xFFFF ^ (i0 | a))
+
+    def spread(v):
+        v = (v | (v << 8)) & 0x00FF00FF; v = (v | (v << 4)) & 0x0F0F0F0F
+        v = (v | (v << 2)) & 0x33333333; return (v | (v << 1)) & 0x55555555
+    return ((spread(i1) << 1) | spread(i0)) & 0xFFFFFFFF
+
+
+def hilbert_order(boxes, extent):
+    """
+    返回按外包框中心的Hilbert值排序的下标。
+    """
+    min_x, min_y, max_x, max_y = extent
+    width = (max_x - min_x) or 1.0; height = (max_y - min_y) or 1.0
+
+    def key(i):
+        x0, y0, x1, y1 = boxes[i]
+        return hilbert(int(0xFFFF * ((x0 + x1) / 2 - min_x) / width), int(0xFFFF * ((y0 + y1) / 2 - min_y) / height))
+    return sorted(range(len(boxes)), key=key)
+
+
+def level_bounds(count, node_size):
+    """
+    返回R树各层在节点数组中的 [起, 止) 范围，从叶子层 (数组末尾) 到根 (数组开头)。
+    """
+    sizes = [count]; n = count
+    while True:
+        n = (n + node_size - 1) // node_size
+        sizes.append(n)
+        if n == 1:
+            break
+    end = sum(sizes); bounds = []
+    for size in sizes:
+        bounds.append((end - size, end)); end -= size
+    return bounds
+
+
+def packed_rtree(boxes, offsets, node_size=DEFAULT_NODE_SIZE):
+    """
+    由已排序要素的外包框和字节偏移构造紧凑R树，返回编码后的bytes。
+    """
+    bounds = level_bounds(len(boxes), node_size)
+    nodes = [None] * bounds[0][1]
+    leaf_start = bounds[0][0]
+    for k, (box, offset) in enumerate(zip(boxes, offsets)):
+        nodes[leaf_start + k] = (*box, offset)
+    for (child_start, child_end), (parent_start, _) in zip(bounds, bounds[1:]):
+        for parent, first in enumerate(range(child_start, child_end, node_size), parent_start):
+            children = nodes[first:min(first + node_size, child_end)]
+            nodes[parent] = (min(c[0] for c in children), min(c[1] for c in children), max(c[2] for c in children), max(c[3] for c in children), first)
+    return b"".join(_NODE.pack(*node) for node in nodes)
+
+
+# ==============================================================================
+# 写出
+# ==============================================================================
+
+def _geometry(geometry, parts):
+    xy = [v for part in parts for point in part for v in point]
+    fields = [None] * 8
+    if len(parts) > 1:
+        ends = []; total = 0
+        for part in parts:
+            total += len(part); ends.append(total)
+        fields[0] = ("vI", ends)
+    fields[1] = ("vd", xy)
+    fields[6] = ("B", GEOMETRY_TYPES[geometry])
+    return fields
+
+
+def _bbox(parts):
+    xs = [p[0] for part in parts for p in part]; ys = [p[1] for part in parts for p in part]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def write_flatgeobuf(stream, features, columns, name="", node_size=DEFAULT_NODE_SIZE, crs_code=4326):
+    """
+    把要素写成FlatGeobuf。
+
+    参数:
+    stream: 可写的二进制流
+    features (序列): [(几何类型, parts, {列名: 值}), ...]，parts 为 [[(x, y), ...], ...]
+    columns (序列): [(列名, 列类型), ...]，列类型见 COLUMN_TYPES；值为None的属性不写出
+    name (str): 图层名称
+    node_size (int): R树节点的子节点数，0 表示不写空间索引
+    """
+    boxes = [_bbox(parts) for _, parts, _ in features]
+    extent = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)) if boxes else None
+    order = hilbert_order(boxes, extent) if node_size and boxes else range(len(features))
+
+    header = [None] * 14
+    header[0] = ("s", name)
+    if extent:
+        header[1] = ("vd", extent)
+    header[2] = ("B", GEOMETRY_TYPES["Unknown"])
+    header[7] = ("vt", [[("s", column), ("B", COLUMN_TYPES[kind][0])] for column, kind in columns])
+    header[8] = ("Q", len(features))
+    header[9] = ("H", node_size if boxes else 0)
+    header[10] = ("t", [("s", "EPSG"), ("i", crs_code)])
+    stream.write(MAGIC)
+    stream.write(encode_table(header))
+
+    encoded = []; offsets = []; offset = 0
+    for i in order:
+        geometry, parts, properties = features[i]
+        props = bytearray()
+        for k, (column, kind) in enumerate(columns):
+            value = properties.get(column)
+            if value is not None:
+                props += struct.pack("<H", k) + COLUMN_TYPES[kind][1](value)
+        fields = [("t", _geometry(geometry, parts)), ("vB", bytes(props)) if props else None]
+        data = encode_table(fields)
+        encoded.append(data); offsets.append(offset); offset += len(data)
+    if node_size and boxes:
+        stream.write(packed_rtree([boxes[i] for i in order], offsets, node_size))
+    for data in encoded:
+        stream.write(data)
@@ -0,0 +1,128 @@
+"""
+磁盘上的几何缓存 (按内容寻址)。
+
+重新生成时大多只改了配色、标签样式或名称，圆心和半径不变。
+每一环的几何 (内外整圆的顶点、各扇区标签的锚点) 按
+(圆心, 内外半径, 扇区边界, 取点间隔, 大地测量模型) 的哈希保存为 .npy 文件，
+再次生成时以内存映射方式载入，只需重新格式化坐标，不再做三角函数计算。
+
+缓存目录有总大小上限，超出时按最近使用时间 (LRU) 删除最旧的条目。
+
+用法:
+    在脚本中设置 ENABLE_GEOMETRY_CACHE = True，或
+    python -m pyluopan.batch sites.csv -o out_dir --geometry-cache [DIR]
+"""
+import hashlib
+import os
+import shutil
+
+from pyluopan.geodesy import numpy_module
+from pyluopan.registry import CACHE_DIR
+
+GEOMETRY_CACHE_DIR = os.environ.get("PYLUOPAN_GEOMETRY_CACHE") or os.path.join(CACHE_DIR, "geometry")
+# 缓存目录的总大小上限 (字节)
+DEFAULT_MAX_BYTES = 256 << 20
+
+# 缓存格式的版本，格式变化时旧条目自动失效
+GEOMETRY_VERSION = 1
+
+_stores = {}
+
+
+class GeometryStore:
+    """
+    按内容寻址的几何缓存目录。每个条目是一个子目录，其中每个数组一个 .npy 文件。
+
+    参数:
+    directory (str): 缓存目录
+    max_bytes (int): 总大小上限，超出时按最近使用时间删除旧条目
+
+    目录的总大小在创建时统计一次，之后随保存和淘汰累加，只在超过上限时才重新扫描目录并淘汰，
+    保存的开销与缓存中的条目数无关。其他进程 (批量模式的工作进程) 写入的条目在下一次扫描时计入。
+    """
+
+    def __init__(self, directory=GEOMETRY_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        if numpy_module() is None:
+            raise ImportError("磁盘几何缓存需要安装NumPy")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(*parts):
+        """
+        由参数计算条目的键。浮点数按repr参与哈希，相同的几何参数得到相同的键。
+        """
+        return hashlib.sha256(repr((GEOMETRY_VERSION,) + parts).encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        """
+        返回 {名称: 只读内存映射数组}，未命中时返回None。命中时刷新条目的使用时间。
+        """
+        np = numpy_module()
+        path = os.path.join(self.directory, key)
+        try:
+            arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode="r") for name in os.listdir(path) if name.endswith(".npy")}
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def save(self, key, arrays):
+        """
+        保存一个条目 {名称: 数组}，然后按大小上限淘汰旧条目。多个进程同时保存同一个键时只保留一份。
+        """
+        np = numpy_module()
+        path = os.path.join(self.directory, key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(array, dtype=float))
+            size = sum(f.stat().st_size for f in os.scandir(tmp))
+            os.rename(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.total_bytes += size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        重新扫描目录，总大小超过上限时从最久未使用的条目开始删除。
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+        self.total_bytes = total
+
+    def _entries(self):
+        # [(使用时间, 字节数, 路径), ...]，不含正在写入的临时目录
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, sum(f.stat().st_size for f in os.scandir(entry.path)), entry.path))
+            except OSError:  # 其他进程刚刚删除
+                continue
+        return entries
+
+
+def open_store(directory=GEOMETRY_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    返回目录对应的 GeometryStore，同一进程内每个目录只创建一次 (供批量模式的工作进程使用)。
+    """
+    store = _stores.get(directory)
+    if store is None:
+        store = _stores[directory] = GeometryStore(directory, max_bytes)
+    return store
@@ -0,0 +1,264 @@
+"""
+罗盘几何计算公共模块。
+
+所有生成脚本共用同一套"起点+方位角+距离 -> 终点"的计算。
+默认使用球面公式；也可以选择WGS-84椭球面上的Vincenty正解 (model="wgs84")，
+大半径 (几十公里以上) 的罗盘在纬度方向更准确。
+安装了NumPy时按数组一次性批量计算，否则退回逐点的math实现。
+NumPy在第一次批量计算时才导入 (导入约需几十毫秒)，环境变量 PYLUOPAN_NUMPY=0 时不使用NumPy。
+"""
+import math
+import os
+
+# 由 numpy_module() 在第一次需要时设置；没有NumPy或已禁用时为None，使用纯Python实现
+np = None
+_numpy_checked = False
+
+# 地球半径 (米)，沿用WGS-84赤道半径
+EARTH_RADIUS = 6378137.0
+
+# WGS-84椭球参数
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# 大地测量模型: "sphere" 球面 (默认)，"wgs84" 椭球面Vincenty正解
+GEODESIC_MODELS = ("sphere", "wgs84")
+
+# Vincenty迭代的次数上限和收敛阈值 (弧度，约0.006毫米)。正解问题通常3~4次即收敛。
+VINCENTY_MAX_ITER = 10
+VINCENTY_TOLERANCE = 1e-12
+
+# 点数少于此值时逐点计算更快 (避免NumPy的调用开销)
+NUMPY_MIN_POINTS = 8
+
+# 推荐的坐标小数位数: 7位约1厘米
+DEFAULT_PRECISION = 7
+
+
+def numpy_module():
+    """
+    返回NumPy模块，没有安装或已禁用 (PYLUOPAN_NUMPY=0) 时返回None。第一次调用时才导入。
+    """
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        if os.environ.get("PYLUOPAN_NUMPY", "1") != "0":
+            try:
+                import numpy
+                np = numpy
+            except ImportError:
+                pass
+    return np
+
+
+def get_destination_point(lat, lon, bearing, dist):
+    """
+    根据起点、方位角和距离计算单个目标点，返回 (纬度, 经度)。
+    """
+    brng = math.radians(bearing); d = dist / EARTH_RADIUS
+    lat1 = math.radians(lat); lon1 = math.radians(lon)
+    lat2 = math.asin(math.sin(lat1) * math.cos(d) + math.cos(lat1) * math.sin(d) * math.cos(brng))
+    lon2 = lon1 + math.atan2(math.sin(brng) * math.sin(d) * math.cos(lat1), math.cos(d) - math.sin(lat1) * math.sin(lat2))
+    return (math.degrees(lat2), math.degrees(lon2))
+
+
+def get_destination_point_wgs84(lat, lon, bearing, dist, max_iter=VINCENTY_MAX_ITER):
+    """
+    WGS-84椭球面上的Vincenty正解 (单点)，返回 (纬度, 经度)。
+    """
+    f = WGS84_F; alpha1 = math.radians(bearing)
+    sin_alpha1 = math.sin(alpha1); cos_alpha1 = math.cos(alpha1)
+    tan_u1 = (1 - f) * math.tan(math.radians(lat))
+    cos_u1 = 1 / math.sqrt(1 + tan_u1 * tan_u1); sin_u1 = tan_u1 * cos_u1
+    sigma1 = math.atan2(tan_u1, cos_alpha1)
+    sin_alpha = cos_u1 * sin_alpha1; cos2_alpha = 1 - sin_alpha * sin_alpha
+    u2 = cos2_alpha * (WGS84_A * WGS84_A - WGS84_B * WGS84_B) / (WGS84_B * WGS84_B)
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    sigma = sigma0 = dist / (WGS84_B * A)
+    for _ in range(max_iter):
+        cos_2sm = math.cos(2 * sigma1 + sigma); sin_s = math.sin(sigma); cos_s = math.cos(sigma)
+        delta = B * sin_s * (cos_2sm + B / 4 * (cos_s * (-1 + 2 * cos_2sm * cos_2sm) - B / 6 * cos_2sm * (-3 + 4 * sin_s * sin_s) * (-3 + 4 * cos_2sm * cos_2sm)))
+        sigma_new = sigma0 + delta
+        converged = abs(sigma_new - sigma) < VINCENTY_TOLERANCE
+        sigma = sigma_new
+        if converged:
+            break
+    cos_2sm = math.cos(2 * sigma1 + sigma); sin_s = math.sin(sigma); cos_s = math.cos(sigma)
+    x = sin_u1 * sin_s - cos_u1 * cos_s * cos_alpha1
+    lat2 = math.atan2(sin_u1 * cos_s + cos_u1 * sin_s * cos_alpha1, (1 - f) * math.sqrt(sin_alpha * sin_alpha + x * x))
+    lam = math.atan2(sin_s * sin_alpha1, cos_u1 * cos_s - sin_u1 * sin_s * cos_alpha1)
+    C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+    L = lam - (1 - C) * f * sin_alpha * (sigma + C * sin_s * (cos_2sm + C * cos_s * (-1 + 2 * cos_2sm * cos_2sm)))
+    return (math.degrees(lat2), lon + math.degrees(L))
+
+
+def vincenty_direct(lat, lon, bearings, dists, max_iter=VINCENTY_MAX_ITER):
+    """
+    Vincenty正解的NumPy批量版本。所有点一起迭代，迭代次数固定不超过max_iter，
+    每次只更新尚未收敛的点。
+
+    返回:
+    (lats, lons, converged): 三个NumPy数组，converged 标记每个点是否在迭代上限内收敛
+    """
+    numpy_module()
+    f = WGS84_F
+    alpha1 = np.radians(np.asarray(bearings, dtype=float))
+    sin_alpha1 = np.sin(alpha1); cos_alpha1 = np.cos(alpha1)
+    tan_u1 = (1 - f) * math.tan(math.radians(lat))
+    cos_u1 = 1 / math.sqrt(1 + tan_u1 * tan_u1); sin_u1 = tan_u1 * cos_u1
+    sigma1 = np.arctan2(tan_u1, cos_alpha1)
+    sin_alpha = cos_u1 * sin_alpha1; cos2_alpha = 1 - sin_alpha * sin_alpha
+    u2 = cos2_alpha * (WGS84_A * WGS84_A - WGS84_B * WGS84_B) / (WGS84_B * WGS84_B)
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    sigma0 = np.asarray(dists, dtype=float) / (WGS84_B * A)
+    sigma = sigma0.copy()
+    converged = np.zeros(sigma.shape, dtype=bool)
+    active = np.arange(sigma.size)
+    for _ in range(max_iter):
+        s = sigma[active]; b = B[active]
+        cos_2sm = np.cos(2 * sigma1[active] + s); sin_s = np.sin(s); cos_s = np.cos(s)
+        delta = b * sin_s * (cos_2sm + b / 4 * (cos_s * (-1 + 2 * cos_2sm * cos_2sm) - b / 6 * cos_2sm * (-3 + 4 * sin_s * sin_s) * (-3 + 4 * cos_2sm * cos_2sm)))
+        s_new = sigma0[active] + delta
+        sigma[active] = s_new
+        done = np.abs(s_new - s) < VINCENTY_TOLERANCE
+        converged[active[done]] = True
+        active = active[~done]
+        if active.size == 0:
+            break
+    cos_2sm = np.cos(2 * sigma1 + sigma); sin_s = np.sin(sigma); cos_s = np.cos(sigma)
+    x = sin_u1 * sin_s - cos_u1 * cos_s * cos_alpha1
+    lat2 = np.arctan2(sin_u1 * cos_s + cos_u1 * sin_s * cos_alpha1, (1 - f) * np.sqrt(sin_alpha * sin_alpha + x * x))
+    lam = np.arctan2(sin_s * sin_alpha1, cos_u1 * cos_s - sin_u1 * sin_s * cos_alpha1)
+    C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+    L = lam - (1 - C) * f * sin_alpha * (sigma + C * sin_s * (cos_2sm + C * cos_s * (-1 + 2 * cos_2sm * cos_2sm)))
+    return np.degrees(lat2), lon + np.degrees(L), converged
+
+
+def destination_points(lat, lon, bearings, dists, model="sphere"):
+    """
+    批量计算目标点。
+
+    参数:
+    lat, lon (float): 起点纬度、经度
+    bearings (序列): 方位角 (度)
+    dists (序列 或 float): 距离 (米)，可以是与bearings等长的序列，也可以是单个数值
+    model (str): "sphere" 球面公式，"wgs84" 椭球面Vincenty正解
+
+    返回:
+    (lats, lons): 两个与bearings等长的列表
+    """
+    if model not in GEODESIC_MODELS:
+        raise ValueError(f"未知的大地测量模型: {model} (可选: {'/'.join(GEODESIC_MODELS)})")
+    if len(bearings) < NUMPY_MIN_POINTS or numpy_module() is None:
+        if isinstance(dists, (int, float)):
+            dists = [dists] * len(bearings)
+        point = get_destination_point if model == "sphere" else get_destination_point_wgs84
+        points = [point(lat, lon, b, r) for b, r in zip(bearings, dists)]
+        return [p[0] for p in points], [p[1] for p in points]
+
+    if model == "wgs84":
+        dists = np.broadcast_to(np.asarray(dists, dtype=float), (len(bearings),))
+        lat2, lon2, _ = vincenty_direct(lat, lon, bearings, dists)
+        return lat2.tolist(), lon2.tolist()
+
+    brng = np.radians(np.asarray(bearings, dtype=float))
+    d = np.asarray(dists, dtype=float) / EARTH_RADIUS
+    lat1 = math.radians(lat); lon1 = math.radians(lon)
+    sin_lat1 = math.sin(lat1); cos_lat1 = math.cos(lat1)
+    sin_d = np.sin(d); cos_d = np.cos(d)
+    lat2 = np.arcsin(sin_lat1 * cos_d + cos_lat1 * sin_d * np.cos(brng))
+    lon2 = lon1 + np.arctan2(np.sin(brng) * sin_d * cos_lat1, cos_d - sin_lat1 * np.sin(lat2))
+    lat2, lon2 = np.broadcast_arrays(np.degrees(lat2), np.degrees(lon2))
+    return lat2.tolist(), lon2.tolist()
+
+
+def local_radii(lat, model="sphere"):
+    """
+    返回纬度lat处的 (子午圈曲率半径M, 卯酉圈曲率半径N)，球面时都为 EARTH_RADIUS。
+    """
+    if model == "sphere":
+        return EARTH_RADIUS, EARTH_RADIUS
+    e2 = WGS84_F * (2 - WGS84_F)
+    w = 1 - e2 * math.sin(math.radians(lat)) ** 2
+    return WGS84_A * (1 - e2) / w ** 1.5, WGS84_A / math.sqrt(w)
+
+
+def local_to_geodetic(lat, lon, east, north, model="sphere"):
+    """
+    把圆心局部平面 (东, 北，米) 上的点换算回经纬度 (NumPy数组)。
+
+    按二阶展开近似方位等距投影的反算: 纬度加上 -e²·tanφ/(2MN) 的修正，经度按各点的一阶纬度取余弦。
+    几公里内误差在毫米以下，半径越大、纬度越高误差越大 (见 arcs.ArcCache 的误差检查)。
+    """
+    numpy_module()
+    m, n = local_radii(lat, model)
+    east = np.asarray(east, dtype=float); north = np.asarray(north, dtype=float)
+    lat1 = lat + np.degrees(north / m)
+    lats = lat1 - np.degrees(east * east * math.tan(math.radians(lat)) / (2 * m * n))
+    lons = lon + np.degrees(east / (n * np.cos(np.radians(lat1))))
+    return lats, lons
+
+
+def ring_segment_bearings(start, end, step=0.5):
+    """
+    给出环形扇区边界的方位角序列 (外弧顺时针，内弧逆时针)，处理跨0度的扇区。
+
+    返回:
+    (outer, inner): 外弧和内弧的方位角列表
+    """
+    outer = []; current = start; end_loop = end if start < end else 360.0
+    while current < end_loop: outer.append(current); current += step
+    if start > end:
+        current = 0.0
+        while current < end: outer.append(current); current += step
+    outer.append(end)
+
+    inner = []; current = end; start_loop = start if start < end else 0.0
+    while current > start_loop: inner.append(current); current -= step
+    if start > end:
+        current = 360.0
+        while current > start: inner.append(current); current -= step
+    inner.append(start)
+    return outer, inner
+
+
+def format_coords(lons, lats, precision=None, altitude=True):
+    """
+    把一组顶点一次性格式化为KML坐标字符串列表 ("经度,纬度,0")。
+
+    参数:
+    precision (int): 小数位数 (7位约1厘米)，None 时保留完整的float精度
+    altitude (bool): False 时省略恒为0的高度 (clampToGround下是多余的)
+
+    定精度时把整组数值交给一个格式串一次格式化再切分，而不是逐点调用f-string。
+    """
+    suffix = ",0" if altitude else ""
+    if precision is None:
+        return [f"{lon},{lat}{suffix}" for lon, lat in zip(lons, lats)]
+    n = len(lons)
+    if n == 0:
+        return []
+    flat = [None] * (2 * n); flat[0::2] = lons; flat[1::2] = lats
+    return (" ".join([f"%.{precision}f,%.{precision}f{suffix}"] * n) % tuple(flat)).split(" ")
+
+
+def format_coord(lon, lat, precision=None, altitude=True):
+    return format_coords((lon,), (lat,), precision, altitude)[0]
+
+
+def create_ring_segment_coords(lat, lon, r_outer, r_inner, start, end, step=0.5, precision=None, altitude=True):
+    """
+    生成一个环形扇区的闭合多边形坐标字符串 (KML coordinates格式)。
+    """
+    outer, inner = ring_segment_bearings(start, end, step)
+    lats, lons = destination_points(lat, lon, outer + inner, [r_outer] * len(outer) + [r_inner] * len(inner))
+    coords = format_coords(lons, lats, precision, altitude)
+    coords.append(coords[0])
+    return " ".join(coords)
+
+
+def get_mid_angle(start, end):
+    return ((start + end) / 2) if start < end else (((start + end + 360) / 2) % 360)
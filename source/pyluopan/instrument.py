@@ -0,0 +1,192 @@
+"""
+生成过程的分阶段计时与计数。
+
+默认关闭，关闭时各埋点只是一次全局变量判断。开启后记录:
+    各阶段耗时 (秒，扣除嵌套的子阶段):
+        radii      计算各环半径
+        arcs       圆弧取点 (大地测量计算)
+        labels     标签定位
+        styles     样式登记与输出
+        serialize  坐标格式化与片段拼接
+        write      写入文件/流
+        cache      磁盘几何缓存的读写
+    每个Folder的 顶点数、Placemark数、字节数 (UTF-8)，以及各阶段在该Folder内的耗时。
+
+开启方式:
+    环境变量  PYLUOPAN_PROFILE=1 python 28xiu.py          # 退出时把JSON报告输出到标准错误
+              PYLUOPAN_PROFILE=report.json python ...    # 退出时写入文件
+    命令行    python -m pyluopan.batch sites.csv -o out --profile report.json
+    代码      with recording(hooks=[callback]) as rec: ...; rec.report()
+
+钩子 callback(event, info) 在每个阶段结束 (event="stage") 和每个Folder结束 (event="folder") 时调用。
+记录器是进程级的，不区分线程；多线程服务中不要开启。
+"""
+import atexit
+import contextlib
+import json
+import os
+import sys
+import time
+
+ENV_VAR = "PYLUOPAN_PROFILE"
+
+_NULL = contextlib.nullcontext()
+_recorder = None
+
+
+class Recorder:
+    """
+    一次生成过程的计时与计数。
+
+    参数:
+    hooks (序列): 回调 callback(event, info)
+    """
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.folders = {}
+        self._stack = []
+        self._path = []
+        self._in_coords = False
+
+    def _folder(self, path=None):
+        path = "/".join(self._path) if path is None else path
+        folder = self.folders.get(path)
+        if folder is None:
+            folder = self.folders[path] = {"folder": path, "vertices": 0, "placemarks": 0, "bytes": 0, "stages": {}}
+        return folder
+
+    def _emit(self, event, info):
+        for hook in self.hooks:
+            hook(event, info)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        计时一个阶段。嵌套的子阶段的耗时只计入子阶段。
+        """
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            total = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += own; total["calls"] += 1
+            folder = self._folder()["stages"]
+            folder[name] = folder.get(name, 0.0) + own
+            if self.hooks:
+                self._emit("stage", {"stage": name, "folder": "/".join(self._path), "seconds": own})
+
+    def enter_folder(self, name):
+        self._path.append(str(name))
+
+    def exit_folder(self):
+        if self.hooks:
+            self._emit("folder", dict(self._folder()))
+        self._path.pop()
+
+    def count(self, text):
+        """
+        统计写入当前Folder的一段文本: 字节数、Placemark数，以及 <coordinates> 中的顶点数。
+        """
+        folder = self._folder()
+        folder["bytes"] += len(text.encode("utf-8"))
+        folder["placemarks"] += text.count("<Placemark>")
+        pos = 0
+        while True:
+            if self._in_coords:
+                end = text.find("</coordinates>", pos)
+                folder["vertices"] += len(text[pos:end if end >= 0 else len(text)].split())
+                if end < 0:
+                    return
+                self._in_coords = False; pos = end
+            start = text.find("<coordinates>", pos)
+            if start < 0:
+                return
+            self._in_coords = True; pos = start + len("<coordinates>")
+
+    def merge(self, report, prefix=None):
+        """
+        合并另一个记录器 (如工作进程) 的报告。prefix 不为None时其Folder路径加上该前缀。
+        """
+        for name, s in report["stages"].items():
+            total = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += s["seconds"]; total["calls"] += s["calls"]
+        for f in report["folders"]:
+            path = "/".join(filter(None, (prefix, f["folder"])))
+            folder = self._folder(path)
+            for key in ("vertices", "placemarks", "bytes"):
+                folder[key] += f[key]
+            for name, seconds in f["stages"].items():
+                folder["stages"][name] = folder["stages"].get(name, 0.0) + seconds
+
+    def report(self):
+        """
+        返回可直接存为JSON的报告。
+        """
+        folders = list(self.folders.values())
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "stages": self.stages,
+            "totals": {key: sum(f[key] for f in folders) for key in ("vertices", "placemarks", "bytes")},
+            "folders": folders,
+        }
+
+
+def active():
+    """
+    返回当前的记录器，未开启时为None。
+    """
+    return _recorder
+
+
+def stage(name):
+    """
+    计时一个阶段的上下文管理器；未开启时返回空的上下文管理器。
+    """
+    return _NULL if _recorder is None else _recorder.stage(name)
+
+
+@contextlib.contextmanager
+def recording(hooks=()):
+    """
+    在with块内开启记录，产出 Recorder。块结束后恢复之前的状态 (可以嵌套)。
+    """
+    global _recorder
+    previous = _recorder
+    rec = _recorder = Recorder(hooks)
+    try:
+        yield rec
+    finally:
+        _recorder = previous
+
+
+def write_report(report, target):
+    """
+    把报告写成JSON。target 为文件名，"-" 表示标准错误。
+    """
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if target == "-":
+        print(text, file=sys.stderr)
+    else:
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def _enable_from_env():
+    global _recorder
+    target = os.environ.get(ENV_VAR, "").strip()
+    if target in ("", "0"):
+        return
+    _recorder = Recorder()
+    rec = _recorder
+    atexit.register(lambda: write_report(rec.report(), "-" if target == "1" else target))
+
+
+_enable_from_env()
@@ -0,0 +1,354 @@
+"""
+流式KML写入。
+
+生成脚本不再把整个文档拼接成一个大字符串再一次性写出，
+而是边生成边写入带缓冲的文件 (或任意可写的文本流，包括标准输出)，
+峰值内存与顶点数量无关。
+
+输出文件名以 .kmz 结尾时，文档直接流式压缩写入zip中的 doc.kml 条目，
+还可以把图标、叠加图片等资源一并打包进同一个KMZ。
+
+Placemark/Folder/Style 等片段使用预先切分好的模板 (Template)，输出时只是把固定块和
+数值依次交给 writelines，不再为每个Placemark拼出一个包含全部坐标的大字符串。
+共享样式通过 StyleRegistry 登记，内容相同的样式按哈希去重，每个文档只输出一次。
+
+合并模式 (merge) 下一个环中样式相同的扇区合并为一个带 <MultiGeometry> 的Placemark，
+Google Earth 中每个Placemark都有固定开销，72、120、360等分的密集环合并后Placemark数减少一个数量级。
+线框模式 (wireframe) 下一个环不输出扇区多边形，只把内外圆各输出一条LineString、每条扇区边界输出一条径向线，
+相邻扇区共用的边界不再重复输出，也不再为每个扇区闭合多边形。
+"""
+import contextlib
+import hashlib
+import io
+import sys
+
+from pyluopan import instrument
+from pyluopan.geodesy import format_coord, get_mid_angle
+
+# KMZ默认压缩级别 (zlib 0~9)
+KMZ_COMPRESSLEVEL = 6
+
+
+class KMLWriter:
+    """
+    KML文档的流式写入器，作为上下文管理器使用。
+
+    参数:
+    target: 输出文件名；"-" 表示标准输出；也可以是任意带write方法的文本流 (KMZ时为二进制流)
+    buffer_size (int): 写缓冲大小 (字节)
+    kmz (bool): 是否输出KMZ，默认按文件名是否以 .kmz 结尾判断
+    compresslevel (int): KMZ的压缩级别
+    resources (dict): 要一并打包进KMZ的文件 {包内路径: 本地文件名 或 bytes}
+    """
+
+    def __init__(self, target, buffer_size=1 << 16, kmz=None, compresslevel=KMZ_COMPRESSLEVEL, resources=None):
+        self.target = target
+        self.buffer_size = buffer_size
+        self.kmz = kmz if kmz is not None else isinstance(target, str) and target.lower().endswith(".kmz")
+        self.compresslevel = compresslevel
+        self.resources = dict(resources or {})
+        self.stream = None
+        self._zip = None
+        self._owns_stream = False
+        self._recorder = None
+
+    def __enter__(self):
+        if self.kmz:
+            import zipfile  # 只在输出KMZ时导入
+            if self.target == "-":
+                zip_target = sys.stdout.buffer
+            else:
+                zip_target = self.target
+            self._zip = zipfile.ZipFile(zip_target, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel)
+            # doc.kml 必须是KMZ中的第一个条目
+            entry = self._zip.open("doc.kml", 'w', force_zip64=True)
+            self.stream = io.TextIOWrapper(io.BufferedWriter(entry, self.buffer_size), encoding='utf-8')
+            self._owns_stream = True
+        elif self.target == "-":
+            self.stream = sys.stdout
+        elif hasattr(self.target, "write"):
+            self.stream = self.target
+        else:
+            self.stream = open(self.target, 'w', encoding='utf-8', buffering=self.buffer_size)
+            self._owns_stream = True
+        self._recorder = instrument.active()
+        if self._recorder is not None:
+            # 开启计时时换成带计数的写入方法，关闭时没有额外开销
+            self.write = self._recorded_write
+            self.writelines = self._recorded_writelines
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with instrument.stage("write"):
+            if self._owns_stream:
+                self.stream.close()
+            else:
+                self.stream.flush()
+        if self._zip is not None:
+            try:
+                if exc_type is None:
+                    for arcname, data in self.resources.items():
+                        if isinstance(data, (bytes, bytearray)):
+                            self._zip.writestr(arcname, data)
+                        else:
+                            self._zip.write(data, arcname)
+            finally:
+                self._zip.close()
+        return False
+
+    def add_resource(self, arcname, data):
+        """
+        登记一个要打包进KMZ的资源 (图标、叠加图片等)，在文档写完后写入。
+        KML中用相对路径 arcname 引用即可。
+        """
+        if not self.kmz:
+            raise ValueError("只有KMZ输出才能打包资源文件")
+        self.resources[arcname] = data
+        return arcname
+
+    def write(self, fragment):
+        self.stream.write(fragment)
+
+    def writelines(self, fragments):
+        """
+        写入一个片段序列，通常是下面的placemark生成器。
+        """
+        self.stream.writelines(fragments)
+
+    def _recorded_write(self, fragment):
+        self._recorder.count(fragment)
+        with self._recorder.stage("write"):
+            self.stream.write(fragment)
+
+    def _recorded_writelines(self, fragments):
+        # 先生成全部片段 (计入 serialize 及其中的 arcs/labels 等)，再单独计时写入
+        with self._recorder.stage("serialize"):
+            fragments = list(fragments)
+        for fragment in fragments:
+            self._recorder.count(fragment)
+        with self._recorder.stage("write"):
+            self.stream.writelines(fragments)
+
+    @contextlib.contextmanager
+    def folder(self, name):
+        self.writelines(FOLDER_OPEN.parts(name))
+        if self._recorder is not None:
+            self._recorder.enter_folder(name)
+        yield self
+        if self._recorder is not None:
+            self._recorder.exit_folder()
+        self.write(FOLDER_CLOSE)
+
+
+# ==============================================================================
+# 片段模板与共享样式
+# ==============================================================================
+
+def escape_text(text):
+    """
+    转义XML文本中的 & < >，与 xml.sax.saxutils.escape 相同 (导入saxutils会连带导入urllib.request，约40毫秒)。
+    """
+    text = str(text)
+    if "&" in text or "<" in text or ">" in text:
+        text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+
+class Template:
+    """
+    预先切分的XML片段模板，{} 为占位。固定部分在定义时切分一次，
+    parts() 返回 [固定块, 值, 固定块, ...]，可直接交给 writelines。
+    escape 为需要按XML文本转义的占位下标 (名称等)，坐标和样式链接原样输出。
+    """
+    __slots__ = ("chunks", "escape")
+
+    def __init__(self, text, escape=()):
+        self.chunks = tuple(text.split("{}"))
+        self.escape = tuple(escape)
+
+    def parts(self, *values):
+        out = [None] * (2 * len(values) + 1)
+        out[0::2] = self.chunks; out[1::2] = values
+        for i in self.escape:
+            out[2 * i + 1] = escape_text(values[i])
+        return out
+
+    def fill(self, *values):
+        return "".join(self.parts(*values))
+
+
+POLYGON_PLACEMARK = Template('<Placemark><name>{}</name><styleUrl>{}</styleUrl><Polygon><altitudeMode>clampToGround</altitudeMode><outerBoundaryIs><LinearRing><coordinates>{}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>', escape=(0,))
+MULTI_GEOMETRY_OPEN = Template('<Placemark><name>{}</name><styleUrl>{}</styleUrl><MultiGeometry>', escape=(0,))
+MULTI_POLYGON = Template('<Polygon><altitudeMode>clampToGround</altitudeMode><outerBoundaryIs><LinearRing><coordinates>{}</coordinates></LinearRing></outerBoundaryIs></Polygon>')
+MULTI_GEOMETRY_CLOSE = '</MultiGeometry></Placemark>'
+LINE_STRING = Template('<LineString><coordinates>{}</coordinates></LineString>')
+LINE_PLACEMARK = Template('<Placemark><name>{}</name><styleUrl>{}</styleUrl><LineString><coordinates>{}</coordinates></LineString></Placemark>', escape=(0,))
+# 第3个占位为若干 LINE_STRING 片段 (见 multiline_placemark)
+MULTILINE_PLACEMARK = Template('<Placemark><name>{}</name><styleUrl>{}</styleUrl><MultiGeometry>{}</MultiGeometry></Placemark>', escape=(0,))
+POINT_PLACEMARK = Template('<Placemark><name>{}</name><styleUrl>{}</styleUrl><Point><coordinates>{}</coordinates></Point></Placemark>', escape=(0,))
+FOLDER_OPEN = Template("\n<Folder><name>{}</name>", escape=(0,))
+FOLDER_CLOSE = "\n</Folder>"
+STYLE = Template('\n<Style id="{}">{}</Style>')
+
+
+class StyleRegistry:
+    """
+    文档级的共享样式表。
+
+    register() 登记样式并返回应使用的styleUrl。内容相同 (哈希相同) 的样式只保留第一次登记的id，
+    之后以其他id登记的同样内容都指向它；write() 只写出尚未输出过的样式。
+    同一个id登记两次不同的内容时抛出 ValueError。
+    """
+
+    def __init__(self):
+        self._by_hash = {}
+        self._urls = {}
+        self._pending = []
+
+    def register(self, style_id, body):
+        key = hashlib.sha1(body.encode("utf-8")).digest()
+        url = f"#{self._by_hash.get(key, style_id)}"
+        if self._urls.get(style_id, url) != url:
+            raise ValueError(f"样式 '{style_id}' 重复登记且内容不同")
+        if key not in self._by_hash:
+            self._by_hash[key] = style_id
+            self._pending.append((style_id, body))
+        self._urls[style_id] = url
+        return url
+
+    def url(self, style_id):
+        return self._urls[style_id]
+
+    def write(self, kml):
+        """
+        写出尚未输出的样式。共享样式应写在Document下、各Folder之前。
+        """
+        with instrument.stage("styles"):
+            for style_id, body in self._pending:
+                kml.writelines(STYLE.parts(style_id, body))
+        self._pending = []
+
+
+# ==============================================================================
+# Placemark 片段生成器
+# ==============================================================================
+
+def polygon_placemark(name, style_url, coords):
+    return POLYGON_PLACEMARK.fill(name, style_url, coords)
+
+
+def point_placemark(name, style_url, lat, lon, precision=None, altitude=True):
+    return POINT_PLACEMARK.fill(name, style_url, format_coord(lon, lat, precision, altitude))
+
+
+def line_placemark(name, style_url, coords):
+    return LINE_PLACEMARK.fill(name, style_url, coords)
+
+
+def multiline_placemark(name, style_url, lines):
+    """
+    多条折线组成的一个Placemark。lines 为各折线的坐标字符串。
+    """
+    return MULTILINE_PLACEMARK.fill(name, style_url, "".join(LINE_STRING.fill(coords) for coords in lines))
+
+
+def ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, labels=True, merge=False, wireframe=False):
+    """
+    逐个产出一个环的扇区多边形和文字标签片段 (模板的固定块与数值，供 writelines 直接写入)。
+    merge=True 时改为 merged_ring_placemarks，wireframe=True 时改为 wireframe_ring_placemarks。
+
+    参数:
+    arcs (ArcCache): 圆心对应的圆弧缓存
+    data (list): [(名称, 起始角, 终止角), ...]
+    r_outer, r_inner (float): 环的内外半径 (米)
+    label_style (str): 标签样式id (不含#)
+    style_map_func: (序号, 名称) -> (styleUrl, 扇区名称, 标签文字)
+    labels (bool): 是否产出文字标签
+    """
+    if wireframe:
+        yield from wireframe_ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, labels)
+        return
+    if merge:
+        yield from merged_ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, labels)
+        return
+    label_url = f"#{label_style}"
+    arcs.prepare_ring(r_outer, r_inner, data)
+    for i, (item_name, start, end) in enumerate(data):
+        style_url, placemark_name, label_text = style_map_func(i, item_name)
+        yield from POLYGON_PLACEMARK.parts(placemark_name, style_url, arcs.segment_coords(r_outer, r_inner, start, end))
+        if not labels:
+            continue
+        with instrument.stage("labels"):
+            label_coord = arcs.point_coord((r_outer + r_inner) / 2, get_mid_angle(start, end))
+        yield from POINT_PLACEMARK.parts(label_text, label_url, label_coord)
+
+
+def merged_ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, labels=True):
+    """
+    与 ring_placemarks 相同，但样式相同的扇区合并为一个 <MultiGeometry> Placemark (按样式首次出现的顺序)，
+    名称为各扇区名称以 "、" 连接。文字标签仍是各自的Placemark，排在所有多边形之后。
+    """
+    arcs.prepare_ring(r_outer, r_inner, data)
+    groups = {}  # styleUrl -> ([扇区名称, ...], [坐标字符串, ...])
+    label_items = []
+    for i, (item_name, start, end) in enumerate(data):
+        style_url, placemark_name, label_text = style_map_func(i, item_name)
+        names, coords = groups.setdefault(style_url, ([], []))
+        names.append(placemark_name); coords.append(arcs.segment_coords(r_outer, r_inner, start, end))
+        label_items.append((label_text, start, end))
+    for style_url, (names, coords) in groups.items():
+        yield from MULTI_GEOMETRY_OPEN.parts("、".join(names), style_url)
+        for c in coords:
+            yield from MULTI_POLYGON.parts(c)
+        yield MULTI_GEOMETRY_CLOSE
+    if not labels:
+        return
+    label_url = f"#{label_style}"
+    for label_text, start, end in label_items:
+        with instrument.stage("labels"):
+            label_coord = arcs.point_coord((r_outer + r_inner) / 2, get_mid_angle(start, end))
+        yield from POINT_PLACEMARK.parts(label_text, label_url, label_coord)
+
+
+def boundary_runs(data):
+    """
+    由扇区边界构造环的拓扑: 返回 (相连的弧段 [(起始角, 终止角), ...], 去重后的边界方位角)。
+    按顺序首尾相接的扇区合并为一段；覆盖整圆时只有一段且起止角相同。
+    """
+    runs = []
+    for _, start, end in data:
+        if runs and runs[-1][1] % 360 == start % 360:
+            runs[-1][1] = end
+        else:
+            runs.append([start, end])
+    if len(runs) > 1 and runs[-1][1] % 360 == runs[0][0] % 360:
+        runs[0][0] = runs.pop()[0]
+    bearings = sorted({b % 360 for _, start, end in data for b in (start, end)})
+    return [tuple(run) for run in runs], bearings
+
+
+def wireframe_ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, labels=True):
+    """
+    与 ring_placemarks 相同，但只产出一个环的线框: 一个 <MultiGeometry> Placemark，包含内外圆 (或相连的弧段) 的LineString
+    和每个边界方位角一条径向线，使用第一个扇区的样式 (线宽与颜色取其LineStyle)。标签与 ring_placemarks 相同。
+    """
+    arcs.prepare_ring(r_outer, r_inner, data)
+    runs, bearings = boundary_runs(data)
+    yield from MULTI_GEOMETRY_OPEN.parts("轮廓", style_map_func(0, data[0][0])[0])
+    for r in (r_outer, r_inner):
+        for start, end in runs:
+            if start % 360 == end % 360:
+                coords = arcs.circle(r)[2]
+                yield from LINE_STRING.parts(" ".join(coords + coords[:1]))
+            else:
+                yield from LINE_STRING.parts(" ".join(arcs.arc_coords(r, start, end)))
+    for b in bearings:
+        yield from LINE_STRING.parts(f"{arcs.point_coord(r_inner, b)} {arcs.point_coord(r_outer, b)}")
+    yield MULTI_GEOMETRY_CLOSE
+    if not labels:
+        return
+    label_url = f"#{label_style}"
+    for i, (item_name, start, end) in enumerate(data):
+        with instrument.stage("labels"):
+            label_coord = arcs.point_coord((r_outer + r_inner) / 2, get_mid_angle(start, end))
+        yield from POINT_PLACEMARK.parts(style_map_func(i, item_name)[2], label_url, label_coord)
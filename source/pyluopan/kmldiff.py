@@ -0,0 +1,316 @@
+"""
+流式比较两个KML/KMZ文件 (回归检查)。
+
+两个文件同时用 iterparse 逐个读出Placemark，按 (文件夹路径, 名称, 同名序号) 对齐，
+逐点比较坐标 (米，容差内视为一致)，并比较样式 (styleUrl指向的 <Style> 内容) 和标签 (Point地标)。
+两边顺序一致时只需暂存尚未配对的少量地标；某个文件夹在两边都结束后，其中仍未配对的地标
+即为缺失/多出，立即报告并释放。因此内存占用与文件大小无关，只与单个文件夹中错位的地标数有关。
+
+结果按文件夹 (即各环) 汇总: 比较的地标数、最大偏差、坐标/样式不一致数、缺失/多出数。
+
+用法:
+    python -m pyluopan.kmldiff kml/celestial_final_map_v11.kml new.kml
+    python -m pyluopan.kmldiff old.kmz new.kmz --tolerance 0.01 --json report.json
+    库:  report = diff_kml(a, b, tolerance_m=0.001); assert report.ok, report.text()
+"""
+import argparse
+import collections
+import json
+import math
+import sys
+import xml.etree.ElementTree as ET
+import zipfile
+
+# 默认坐标容差 (米)
+DEFAULT_TOLERANCE_M = 0.001
+# 每个文件夹最多记录的不一致明细条数
+MAX_DETAILS = 20
+
+# folder: 文件夹路径 (元组)；index: 同一文件夹中同名地标的序号；geometry: 几何类型 (Polygon/Point/...)；
+# parts: 各 <coordinates> 的原文 (比较时才解析)；style: styleUrl
+Placemark = collections.namedtuple("Placemark", "folder name index geometry parts style")
+GEOMETRIES = ("Point", "LineString", "LinearRing", "Polygon", "MultiGeometry")
+
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+
+def open_kml(source):
+    """
+    打开KML或KMZ (取zip中的第一个 .kml 条目)，返回二进制流。source 为文件名或二进制流。
+    """
+    if hasattr(source, "read"):
+        return source
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        name = next((n for n in archive.namelist() if n.lower().endswith(".kml")), None)
+        if name is None:
+            raise ValueError(f"{source}: KMZ中没有 .kml 文件")
+        return archive.open(name)
+    return open(source, "rb")
+
+
+def iter_kml(source):
+    """
+    流式读出KML中的条目: ("style", id, 内容)、("placemark", Placemark)、("folder_end", 文件夹路径)。
+    已读完的元素立即从树中移除，内存占用与文件大小无关。
+    """
+    stream = open_kml(source)
+    stack = []       # 打开的元素
+    folders = []     # [(文件夹名, {地标名: 出现次数})]
+    placemark = None
+    root_counts = {}  # 不在任何Folder中的地标
+    try:
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                stack.append(elem)
+                if tag == "Folder":
+                    folders.append([None, {}])
+                elif tag == "Placemark":
+                    placemark = {"name": None, "geometry": None, "parts": [], "style": None}
+                elif placemark is not None and tag in GEOMETRIES and placemark["geometry"] is None:
+                    placemark["geometry"] = tag
+                continue
+            stack.pop()
+            if placemark is not None:
+                if tag == "name" and placemark["name"] is None:
+                    placemark["name"] = elem.text or ""
+                elif tag == "styleUrl":
+                    placemark["style"] = (elem.text or "").strip()
+                elif tag == "coordinates":
+                    placemark["parts"].append(" ".join((elem.text or "").split()))
+                elif tag == "Placemark":
+                    path = tuple(f[0] or "" for f in folders)
+                    counts = folders[-1][1] if folders else root_counts
+                    index = counts.get(placemark["name"], 0); counts[placemark["name"]] = index + 1
+                    yield "placemark", Placemark(path, placemark["name"], index, placemark["geometry"], placemark["parts"], placemark["style"])
+                    placemark = None
+            elif tag == "name" and folders and folders[-1][0] is None and stack and _local(stack[-1].tag) == "Folder":
+                folders[-1][0] = elem.text or ""
+            elif tag == "Style" and elem.get("id"):
+                yield "style", elem.get("id"), " ".join(f"{path}={text}" for path, text in _style_values(elem))
+            elif tag == "Folder":
+                yield "folder_end", tuple(f[0] or "" for f in folders)
+                folders.pop()
+            if tag in ("Placemark", "Folder", "Style") and stack:
+                # 刚结束的元素是父元素的最后一个子元素
+                del stack[-1][-1]
+    finally:
+        stream.close()
+
+
+def _style_values(elem, prefix=""):
+    # 样式各叶子元素的 (路径, 值)，如 ("PolyStyle/color", "6078AB00")
+    for child in elem:
+        path = prefix + _local(child.tag)
+        if len(child):
+            yield from _style_values(child, path + "/")
+        else:
+            yield path, (child.text or "").strip()
+
+
+def parse_coordinates(text):
+    """
+    解析 <coordinates> 的文字，返回 [(经度, 纬度), ...] (忽略高度)。
+    """
+    return [tuple(map(float, c.split(",")[:2])) for c in text.split()]
+
+
+def distance_m(a, b):
+    """
+    两点 (经度, 纬度) 间的近似距离 (米)，等距圆柱近似，足以判断米级以内的偏差。
+    """
+    lat = math.radians((a[1] + b[1]) / 2)
+    return math.hypot((a[0] - b[0]) * math.cos(lat), a[1] - b[1]) * math.pi / 180 * 6371000
+
+
+class FolderDiff:
+    """
+    一个文件夹 (一环) 的比较结果。
+    """
+
+    def __init__(self):
+        self.compared = 0; self.labels = 0
+        self.max_deviation_m = 0.0
+        self.coordinate_mismatches = 0; self.style_mismatches = 0; self.label_mismatches = 0
+        self.missing = 0; self.extra = 0
+        self.details = []; self.omitted = 0
+
+    @property
+    def ok(self):
+        return not (self.coordinate_mismatches or self.style_mismatches or self.label_mismatches or self.missing or self.extra)
+
+    def note(self, message, max_details):
+        if len(self.details) < max_details:
+            self.details.append(message)
+        else:
+            self.omitted += 1
+
+    def as_dict(self):
+        return {key: value for key, value in vars(self).items()}
+
+
+class DiffReport:
+    """
+    两个文件的比较结果: folders {文件夹路径: FolderDiff}，styles [(样式id, 说明), ...]。
+    """
+
+    def __init__(self, tolerance_m):
+        self.tolerance_m = tolerance_m
+        self.folders = collections.OrderedDict()
+        self.styles = []
+
+    @property
+    def ok(self):
+        return not self.styles and all(f.ok for f in self.folders.values())
+
+    @property
+    def max_deviation_m(self):
+        return max((f.max_deviation_m for f in self.folders.values()), default=0.0)
+
+    def folder(self, path):
+        diff = self.folders.get(path)
+        if diff is None:
+            diff = self.folders[path] = FolderDiff()
+        return diff
+
+    def as_dict(self):
+        return {"ok": self.ok, "tolerance_m": self.tolerance_m, "max_deviation_m": self.max_deviation_m,
+                "styles": [{"id": i, "message": m} for i, m in self.styles],
+                "folders": [dict(f.as_dict(), folder="/".join(path)) for path, f in self.folders.items()]}
+
+    def text(self):
+        """
+        返回按文件夹汇总的文字报告。
+        """
+        lines = [f"{'一致' if self.ok else '不一致'}  最大偏差 {self.max_deviation_m:.3g} 米 (容差 {self.tolerance_m} 米)"]
+        for style_id, message in self.styles:
+            lines.append(f"  样式 {style_id}: {message}")
+        for path, f in self.folders.items():
+            status = "一致" if f.ok else "不一致"
+            lines.append(f"  {'/'.join(path) or '(根)'}: {status}  地标 {f.compared} (标签 {f.labels})  最大偏差 {f.max_deviation_m:.3g} 米"
+                         + ("" if f.ok else f"  坐标 {f.coordinate_mismatches}  样式 {f.style_mismatches}  标签 {f.label_mismatches}"
+                                             f"  缺失 {f.missing}  多出 {f.extra}"))
+            lines.extend(f"    {d}" for d in f.details)
+            if f.omitted:
+                lines.append(f"    ……另有 {f.omitted} 条")
+        return "\n".join(lines)
+
+
+def _compare(a, b, styles_a, styles_b, report, tolerance_m, max_details):
+    diff = report.folder(a.folder)
+    diff.compared += 1
+    label = a.geometry == "Point"
+    diff.labels += label
+    where = f"{a.name}" + (f" #{a.index + 1}" if a.index else "")
+    # styleUrl不同但指向内容相同的样式时视为一致；同名样式内容的不同只在样式中报告一次
+    if a.style != b.style and styles_a.get((a.style or "").lstrip("#"), a.style) != styles_b.get((b.style or "").lstrip("#"), b.style):
+        diff.style_mismatches += 1
+        diff.note(f"{where}: 样式 {a.style} -> {b.style}", max_details)
+    if a.geometry == b.geometry and a.parts == b.parts:
+        return
+    parts_a = [parse_coordinates(p) for p in a.parts]; parts_b = [parse_coordinates(p) for p in b.parts]
+    if a.geometry != b.geometry or [len(p) for p in parts_a] != [len(p) for p in parts_b]:
+        diff.label_mismatches += label; diff.coordinate_mismatches += not label
+        diff.note(f"{where}: 几何 {a.geometry}{[len(p) for p in parts_a]} -> {b.geometry}{[len(p) for p in parts_b]}", max_details)
+        return
+    deviation = max((distance_m(p, q) for pa, pb in zip(parts_a, parts_b) for p, q in zip(pa, pb)), default=0.0)
+    diff.max_deviation_m = max(diff.max_deviation_m, deviation)
+    if deviation > tolerance_m:
+        diff.label_mismatches += label; diff.coordinate_mismatches += not label
+        diff.note(f"{where}: 偏差 {deviation:.3g} 米", max_details)
+
+
+def diff_kml(a, b, tolerance_m=DEFAULT_TOLERANCE_M, ignore_names=(), max_details=MAX_DETAILS):
+    """
+    流式比较两个KML/KMZ文件 (文件名或二进制流)，返回 DiffReport。
+
+    参数:
+    tolerance_m (float): 坐标容差 (米)
+    ignore_names (序列): 不参与比较的地标名称 (已知的差异)
+    max_details (int): 每个文件夹最多记录的明细条数
+    """
+    report = DiffReport(tolerance_m)
+    ignore_names = set(ignore_names)
+    styles = ({}, {})
+    pending = ({}, {})                            # 尚未配对的地标 {(路径, 名称, 序号): Placemark}
+    closed = (collections.Counter(), collections.Counter())   # 各文件夹在两边结束的次数
+    streams = [iter_kml(a), iter_kml(b)]
+    active = [True, True]
+
+    def flush(path):
+        # 文件夹在两边都已结束: 其中未配对的地标为缺失/多出
+        for side, label in ((0, "missing"), (1, "extra")):
+            for key in [k for k in pending[side] if k[0] == path]:
+                p = pending[side].pop(key)
+                diff = report.folder(path)
+                setattr(diff, label, getattr(diff, label) + 1)
+                diff.note(f"{p.name}: {'只在第一个文件中' if side == 0 else '只在第二个文件中'}", max_details)
+
+    while any(active):
+        for side in (0, 1):
+            if not active[side]:
+                continue
+            item = next(streams[side], None)
+            if item is None:
+                active[side] = False
+                continue
+            kind = item[0]
+            if kind == "style":
+                styles[side][item[1]] = item[2]
+            elif kind == "folder_end":
+                closed[side][item[1]] += 1
+                if closed[0][item[1]] == closed[1][item[1]]:
+                    flush(item[1])
+            else:
+                p = item[1]
+                if p.name in ignore_names:
+                    continue
+                key = (p.folder, p.name, p.index)
+                other = pending[1 - side].pop(key, None)
+                if other is None:
+                    pending[side][key] = p
+                else:
+                    first, second = (p, other) if side == 0 else (other, p)
+                    _compare(first, second, styles[0], styles[1], report, tolerance_m, max_details)
+    for path in {k[0] for k in pending[0]} | {k[0] for k in pending[1]}:
+        flush(path)
+
+    for style_id in sorted(styles[0].keys() | styles[1].keys()):
+        sa, sb = styles[0].get(style_id), styles[1].get(style_id)
+        if sa != sb:
+            report.styles.append((style_id, "只在第一个文件中" if sb is None else "只在第二个文件中" if sa is None else f"内容不同: {sa} -> {sb}"))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="流式比较两个KML/KMZ文件的地标坐标、样式与标签")
+    parser.add_argument("a", help="第一个文件 (参考)")
+    parser.add_argument("b", help="第二个文件")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_M, help=f"坐标容差 (米)，默认 {DEFAULT_TOLERANCE_M}")
+    parser.add_argument("--ignore", nargs="+", default=(), metavar="NAME", help="不参与比较的地标名称")
+    parser.add_argument("--details", type=int, default=MAX_DETAILS, help="每个文件夹最多显示的明细条数")
+    parser.add_argument("--json", default=None, metavar="REPORT", help="另存JSON报告 ('-' 为标准输出)")
+    args = parser.parse_args(argv)
+
+    try:
+        report = diff_kml(args.a, args.b, args.tolerance, args.ignore, args.details)
+    except (OSError, ValueError, ET.ParseError) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 2
+    if args.json:
+        text = json.dumps(report.as_dict(), ensure_ascii=False, indent=1)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+    if args.json != "-":
+        print(report.text())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+按缩放级别的标签避让。
+
+各环扇区的标签和外部角度标签先作为候选收集，再按 DECLUTTER_LEVELS 中每一级罗盘在屏幕上的像素尺寸
+估算每个标签占据的矩形 (字数 × 字号 × LabelStyle的scale)，用网格碰撞索引按优先级依次放置:
+字号大的优先，字号相同时按输出顺序 (外环在前)。与已放置的标签重叠的标签留到更高一级再试。
+
+每一级新放下的标签写入一个带 <Region> 的子Folder，minLodPixels 为该级的像素尺寸，maxLodPixels 为 -1，
+因此罗盘在屏幕上越大显示的标签越多，已显示的标签放大后不会消失；
+任何缩放级别下同时显示的标签不超过 MAX_VISIBLE_LABELS，最高一级仍放不下的标签 (如360等分的密集环) 不输出。
+"""
+import collections
+import math
+
+from pyluopan import instrument
+from pyluopan.kml import FOLDER_CLOSE, FOLDER_OPEN, POINT_PLACEMARK
+from pyluopan.lod import region
+
+# 各级: 罗盘外接框在屏幕上的最小像素尺寸 (Region的minLodPixels)
+DECLUTTER_LEVELS = (128, 512, 2048, 8192)
+# 同时显示的标签数上限
+MAX_VISIBLE_LABELS = 256
+# scale=1 时一个汉字标签的像素尺寸 (Google Earth 默认字号的近似值)，ASCII字符按半宽计
+LABEL_FONT_PX = 16
+ASCII_WIDTH = 0.55
+# 标签之间至少留出的像素
+LABEL_PADDING_PX = 2
+
+# text: 标签文字；style_url: 标签样式；r, bearing: 位置 (米, 度)；scale: LabelStyle的scale
+Label = collections.namedtuple("Label", "text style_url r bearing scale")
+
+
+def label_size_px(text, scale):
+    """
+    估算标签在屏幕上的 (宽, 高) 像素，多行文字按最长一行计宽。
+    """
+    lines = text.split("\n")
+    width = max(sum(1 if ord(ch) > 0x7f else ASCII_WIDTH for ch in line) for line in lines)
+    return width * LABEL_FONT_PX * scale + LABEL_PADDING_PX, len(lines) * LABEL_FONT_PX * scale + LABEL_PADDING_PX
+
+
+class CollisionIndex:
+    """
+    平面上轴对齐矩形 (x0, y0, x1, y1) 的均匀网格碰撞索引。cell 取与矩形大小相当的尺寸时每次查询只看少数几个格子。
+    """
+
+    def __init__(self, cell):
+        self.cell = cell
+        self._cells = {}
+
+    def _keys(self, box):
+        c = self.cell
+        i0, j0, i1, j1 = (math.floor(v / c) for v in box)
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+    def collides(self, box):
+        x0, y0, x1, y1 = box
+        for key in self._keys(box):
+            for ox0, oy0, ox1, oy1 in self._cells.get(key, ()):
+                if x0 < ox1 and ox0 < x1 and y0 < oy1 and oy0 < y1:
+                    return True
+        return False
+
+    def insert(self, box):
+        for key in self._keys(box):
+            self._cells.setdefault(key, []).append(box)
+
+
+def place_labels(labels, extent_m, levels=DECLUTTER_LEVELS, max_visible=MAX_VISIBLE_LABELS):
+    """
+    逐级放置标签，返回与levels对应的 [[Label, ...], ...]: 每一级新显示的标签 (按输入顺序)。
+
+    参数:
+    labels (序列): Label 候选
+    extent_m (float): Region范围的边长 (米)，即罗盘外接框在屏幕上占 min_px 像素时的地面长度
+    """
+    positions = [(l.r * math.sin(math.radians(l.bearing)), l.r * math.cos(math.radians(l.bearing))) for l in labels]
+    sizes = [label_size_px(l.text, l.scale) for l in labels]
+    remaining = sorted(range(len(labels)), key=lambda i: -labels[i].scale)
+    placed = []; result = []
+    for min_px in levels:
+        m_per_px = extent_m / min_px
+
+        def box(i):
+            (x, y), (w, h) = positions[i], sizes[i]
+            return (x - w * m_per_px / 2, y - h * m_per_px / 2, x + w * m_per_px / 2, y + h * m_per_px / 2)
+
+        index = CollisionIndex(max((max(s) for s in sizes), default=1) * m_per_px)
+        for i in placed:
+            index.insert(box(i))
+        new = []; rest = []
+        for i in remaining:
+            if len(placed) + len(new) >= max_visible or index.collides(box(i)):
+                rest.append(i)
+                continue
+            index.insert(box(i)); new.append(i)
+        placed += new; remaining = rest
+        result.append([labels[i] for i in sorted(new)])
+    return result
+
+
+def decluttered_label_placemarks(arcs, labels, extent_r, levels=DECLUTTER_LEVELS, max_visible=MAX_VISIBLE_LABELS):
+    """
+    产出避让后的标签片段: 每一级一个带Region的子Folder。extent_r 为Region外接框的半径 (米)，应包含全部标签。
+    """
+    with instrument.stage("labels"):
+        placed = place_labels(labels, 2 * extent_r, levels, max_visible)
+    for min_px, level in zip(levels, placed):
+        if not level:
+            continue
+        yield from FOLDER_OPEN.parts(f"{min_px}像素")
+        yield region(arcs, extent_r, min_px, -1)
+        for label in level:
+            with instrument.stage("labels"):
+                coord = arcs.point_coord(label.r, label.bearing)
+            yield from POINT_PLACEMARK.parts(label.text, label.style_url, coord)
+        yield FOLDER_CLOSE
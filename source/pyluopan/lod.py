@@ -0,0 +1,41 @@
+"""
+多级精度 (KML Region/Lod)。
+
+每个环按 粗/中/细 三级精度各输出一份，分别包在带 <Region> 的Folder里。
+Region的范围取该环外圆的经纬度外接框，Google Earth按这个框在屏幕上的像素大小
+(minLodPixels/maxLodPixels) 只绘制当前缩放级别需要的那一级。
+因此切换时机由各环自己的半径自动决定：外环比内环更早切换到细级。
+"""
+from pyluopan.kml import FOLDER_CLOSE, FOLDER_OPEN, ring_placemarks
+
+# 各级精度: (名称, minLodPixels, maxLodPixels, 取点视口像素, 是否包含标签)
+# 取点视口像素为None的一级沿用调用方的原始精度；粗级不显示标签，避免缩小时文字堆叠。
+LOD_LEVELS = (
+    ("粗", 16, 256, 256, False),
+    ("中", 256, 1024, 1024, True),
+    ("细", 1024, -1, None, True),
+)
+# 各级弧线允许的屏幕误差 (像素)
+LOD_TOLERANCE_PX = 0.5
+
+
+def region(arcs, r, min_lod, max_lod):
+    """
+    返回以圆心为中心、半径r的外接框为范围的 <Region> 片段。
+    """
+    north = arcs.point(r, 0)[0]; south = arcs.point(r, 180)[0]
+    east = arcs.point(r, 90)[1]; west = arcs.point(r, 270)[1]
+    return (f'<Region><LatLonAltBox><north>{north}</north><south>{south}</south><east>{east}</east><west>{west}</west></LatLonAltBox>'
+            f'<Lod><minLodPixels>{min_lod}</minLodPixels><maxLodPixels>{max_lod}</maxLodPixels></Lod></Region>')
+
+
+def lod_ring_placemarks(arcs, data, r_outer, r_inner, label_style, style_map_func, levels=LOD_LEVELS, merge=False, labels=True, wireframe=False):
+    """
+    与 ring_placemarks 相同，但按 levels 逐级产出带Region的子Folder。labels=False 时各级都不含标签。
+    """
+    for name, min_lod, max_lod, viewport_px, level_labels in levels:
+        level_arcs = arcs if viewport_px is None else arcs.derived(tolerance_px=LOD_TOLERANCE_PX, viewport_px=viewport_px)
+        yield from FOLDER_OPEN.parts(name)
+        yield region(arcs, r_outer, min_lod, max_lod)
+        yield from ring_placemarks(level_arcs, data, r_outer, r_inner, label_style, style_map_func, labels and level_labels, merge, wireframe)
+        yield FOLDER_CLOSE
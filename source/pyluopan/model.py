@@ -0,0 +1,82 @@
+"""
+与输出格式无关的罗盘几何模型。
+
+罗盘的扇区、标签和中心标记先一次性计算为内存中的要素 (Feature)，每个要素带
+编号、所属环、名称、五行等属性、样式和顶点数组；再由 export 中的各格式写出器
+(KML、GeoJSON、FlatGeobuf) 序列化。顶点与 compass.write_compass 使用的圆弧缓存完全相同，
+写成KML时与 create_kml_compass 的输出一致。
+
+坐标为 (经度, 纬度)，WGS84 (EPSG:4326)。
+"""
+import collections
+
+from pyluopan.arcs import ArcCache
+from pyluopan.compass import (ANGLE_LABEL_FACTOR, DEFAULT_GAP_PERCENTS, DEFAULT_RINGS, DEFAULT_THICKNESS_PERCENTS, resolve_ring,
+                              ring_radii)
+from pyluopan.geodesy import get_mid_angle
+from pyluopan.registry import get_ring
+
+# id: 要素编号，如 "28xiu/3"、"28xiu/3/label"；kind: segment 扇区 / label 扇区标签 / crosshair 中心十字 / angle 外部角度标签
+# ring: 环键 (中心与外部标记为None)；name: 扇区名称；title: 显示名称 (KML的Placemark名称)；element: 五行 (没有时为None)
+# style: 样式id (不含#)；geometry: Polygon / Point / MultiLineString；parts: [[(经度, 纬度), ...], ...]，Point只有一个顶点
+Feature = collections.namedtuple("Feature", "id kind ring name title element style geometry parts")
+# name: Folder名称 (如 "环1：二十八宿")
+Folder = collections.namedtuple("Folder", "name features")
+Compass = collections.namedtuple("Compass", "name description lat lon folders")
+
+
+def _points(lons, lats):
+    return list(zip(lons, lats))
+
+
+def ring_features(arcs, key, r_outer, r_inner):
+    """
+    返回一环的扇区和标签要素 (与 kml.ring_placemarks 的顺序相同: 每个扇区之后紧跟其标签)。
+    """
+    name, data, label_style, style_map_func = resolve_ring(key)
+    ring = get_ring(key)
+    elements = ring.attributes.get("五行", {})
+    arcs.prepare_ring(r_outer, r_inner, data)
+    features = []
+    for i, (item_name, start, end) in enumerate(data):
+        style_url, title, label_text = style_map_func(i, item_name)
+        element = elements.get(item_name)
+        features.append(Feature(f"{ring.key}/{i}", "segment", ring.key, item_name, title, element, style_url[1:], "Polygon",
+                                [_points(*arcs.segment_points(r_outer, r_inner, start, end))]))
+        lat, lon = arcs.point((r_outer + r_inner) / 2, get_mid_angle(start, end))
+        features.append(Feature(f"{ring.key}/{i}/label", "label", ring.key, item_name, label_text, element, label_style, "Point", [[(lon, lat)]]))
+    return features
+
+
+def marker_features(arcs, r1_outer_m, r_innermost):
+    """
+    返回中心十字和外部角度标签要素。
+    """
+    features = []
+    if r_innermost > 0:
+        (n, s, e, w) = [arcs.point(r_innermost * 0.9, b)[::-1] for b in (0, 180, 90, 270)]
+        features.append(Feature("crosshair", "crosshair", None, "中心十字", "中心十字", None, "styleCrosshair", "MultiLineString", [[n, s], [e, w]]))
+    r = r1_outer_m * ANGLE_LABEL_FACTOR
+    arcs.prefetch(r, list(range(0, 360, 15)))
+    for angle in range(0, 360, 15):
+        lat, lon = arcs.point(r, angle)
+        features.append(Feature(f"angle/{angle}", "angle", None, f"{angle}°", f"{angle}°", None, "styleAngleLabel", "Point", [[(lon, lat)]]))
+    return features
+
+
+def build_compass(center_lat, center_lon, r1_outer_m, rings=DEFAULT_RINGS, thick_pcts=DEFAULT_THICKNESS_PERCENTS, gap_pcts=DEFAULT_GAP_PERCENTS,
+                  name="四环-天文地理总图(V11)", description=None, tolerance_m=None, model="sphere", local_tolerance_m=None, arcs=None):
+    """
+    计算一个罗盘的全部要素，返回 Compass。参数同 compass.create_kml_compass (坐标精度和高度在写出时决定)。
+    """
+    if len(thick_pcts) != len(rings) or len(gap_pcts) < len(rings) - 1:
+        raise ValueError(f"环数({len(rings)})与厚度({len(thick_pcts)})/间距({len(gap_pcts)})参数个数不匹配")
+    if description is None:
+        description = f"从外到内:{'、'.join(resolve_ring(key)[0] for key in rings)}。"
+    if arcs is None:
+        arcs = ArcCache(center_lat, center_lon, tolerance_m=tolerance_m, model=model, local_tolerance_m=local_tolerance_m)
+    radii = ring_radii(r1_outer_m, thick_pcts, gap_pcts)
+    folders = [Folder(f"环{n}：{resolve_ring(key)[0]}", ring_features(arcs, key, r_outer, r_inner))
+               for n, (key, (r_outer, r_inner)) in enumerate(zip(rings, radii), 1)]
+    folders.append(Folder("中心与外部标记", marker_features(arcs, r1_outer_m, radii[-1][1] if radii else 0)))
+    return Compass(name, description, center_lat, center_lon, folders)
@@ -0,0 +1,274 @@
+"""
+环定义注册表。
+
+环的内容 (名称、起止角、五行等属性) 以 database/绘制罗盘数据.xlsx 为准。
+工作簿只在内容变化时解析一次，编译成JSON缓存；之后每次运行直接读取缓存 (毫秒级)。
+缓存按工作簿的修改时间和大小判断是否有效，两者变化时再比较内容哈希，哈希不同才重新解析。
+包中另附编译好的 rings.json: 非可编辑安装时没有 database/ 目录，默认工作簿不存在时读取它。
+
+工作表的格式: 第1行为表头，各环的表格从左到右排列，之间用空列隔开。
+每个表格含 名称、起点、终点 三列，其余列 (如 五行) 作为扇区属性。
+
+另有不在工作簿中、按等分生成的密集环 (见 DENSE_RINGS)，以及任意等分的 "dense<扇区数>"，如 "dense72"。
+
+用法:
+    python -m pyluopan.registry              # 编译并列出所有环
+    python -m pyluopan.registry other.xlsx --force
+    python -m pyluopan.registry --bundle      # 工作簿修改后重新生成包内的 rings.json
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+import re
+import sys
+
+_SOURCE_DATABASE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "database", "绘制罗盘数据.xlsx")
+DATABASE_FILE = os.environ.get("PYLUOPAN_DATABASE") or _SOURCE_DATABASE
+# 随包发布的编译结果 (由默认工作簿生成)
+BUNDLED_RINGS = "rings.json"
+CACHE_DIR = os.environ.get("PYLUOPAN_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pyluopan")
+
+# 工作表中从左到右的表格依次对应的环: (键, 名称)。多出的表格按 "table序号" 命名。
+SHEET_TABLES = (("8gua", "八卦"), ("12dizhi", "十二地支"), ("24shan", "二十四山"), ("28xiu", "二十八宿"))
+
+# 编译格式的版本，格式变化时旧缓存自动失效
+CACHE_VERSION = 1
+
+# key: 环键；name: 环名称；sectors: [(名称, 起始角, 终止角), ...]；attributes: {列名: {扇区名称: 值}}
+Ring = collections.namedtuple("Ring", "key name sectors attributes")
+
+# 六十甲子的天干、地支 (甲子=0)
+STEMS = "甲乙丙丁戊己庚辛壬癸"
+BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+
+# 内置的密集环: 键 -> (名称, 扇区数, 第一个扇区的起始角, 扇区名称)。扇区名称为None时按起始度数命名。
+# 透地六十龙每个地支下依次为该支的五个甲子 (子: 甲子、丙子、戊子、庚子、壬子)，与工作簿中的十二地支 (子: 345~15) 对齐。
+DENSE_RINGS = {
+    "60toudi": ("透地六十龙", 60, 345.0, [STEMS[(b + 12 * k) % 10] + BRANCHES[b] for b in range(12) for k in range(5)]),
+    "360du": ("周天度数", 360, 0.0, None),
+}
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_loaded = {}
+
+
+# ==============================================================================
+# 解析工作簿
+# ==============================================================================
+
+def _column_index(ref):
+    n = 0
+    for ch in re.match(r"[A-Z]+", ref).group():
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def read_sheet(path):
+    """
+    读取工作簿第一个工作表的单元格值 (公式取缓存的计算结果)，返回按行排列的列表的列表。
+    只用标准库解析xlsx，不依赖openpyxl；只在编译时才导入zip/XML模块。
+    """
+    import xml.etree.ElementTree as ET
+    import zipfile
+
+    with zipfile.ZipFile(path) as z:
+        strings = []
+        if "xl/sharedStrings.xml" in z.namelist():
+            for si in ET.fromstring(z.read("xl/sharedStrings.xml")).iter(f"{_XLSX_NS}si"):
+                strings.append("".join(t.text or "" for t in si.iter(f"{_XLSX_NS}t")))
+        sheet = ET.fromstring(z.read("xl/worksheets/sheet1.xml"))
+    rows = []
+    for row in sheet.iter(f"{_XLSX_NS}row"):
+        values = {}
+        for c in row.iter(f"{_XLSX_NS}c"):
+            v = c.find(f"{_XLSX_NS}v")
+            if v is None or v.text is None:
+                continue
+            values[_column_index(c.get("r"))] = strings[int(v.text)] if c.get("t") == "s" else v.text
+        rows.append([values.get(i) for i in range(max(values) + 1)] if values else [])
+    return rows
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def compile_rings(path=DATABASE_FILE):
+    """
+    解析工作簿，返回 {环键: {"name", "sectors", "attributes"}} (可直接存为JSON)。
+    """
+    rows = read_sheet(path)
+    header = rows[0] if rows else []
+    # 表头中被空列隔开的连续列为一个表格
+    tables = []
+    for i, title in enumerate(header):
+        if title is None:
+            continue
+        if not tables or header[i - 1] is None:
+            tables.append({})
+        tables[-1][title] = i
+
+    rings = {}
+    for n, columns in enumerate(tables):
+        if not {"名称", "起点", "终点"} <= columns.keys():
+            raise ValueError(f"{path}: 第{n + 1}个表格缺少 名称/起点/终点 列")
+        key, name = SHEET_TABLES[n] if n < len(SHEET_TABLES) else (f"table{n + 1}", f"表格{n + 1}")
+        extra = [title for title in columns if title not in ("名称", "起点", "终点")]
+        sectors = []; attributes = {title: {} for title in extra}
+        for row in rows[1:]:
+            cell = lambda title: row[columns[title]] if columns[title] < len(row) else None
+            if cell("名称") is None:
+                continue
+            sectors.append([cell("名称"), _number(cell("起点")), _number(cell("终点"))])
+            for title in extra:
+                attributes[title][cell("名称")] = cell(title)
+        rings[key] = {"name": name, "sectors": sectors, "attributes": attributes}
+    return rings
+
+
+# ==============================================================================
+# 编译缓存
+# ==============================================================================
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_file_for(path):
+    """
+    返回工作簿对应的缓存文件名 (按工作簿绝对路径区分)。
+    """
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"rings-{tag}.json")
+
+
+def _to_rings(compiled):
+    return {key: Ring(key, r["name"], [tuple(s) for s in r["sectors"]], r["attributes"]) for key, r in compiled.items()}
+
+
+def read_bundled():
+    """
+    读取包内的 rings.json，返回 {"version", "sha256", "rings"}。
+    """
+    from importlib import resources
+    if hasattr(resources, "files"):
+        text = resources.files(__package__).joinpath(BUNDLED_RINGS).read_text(encoding="utf-8")
+    else:  # Python 3.7/3.8
+        text = resources.read_text(__package__, BUNDLED_RINGS, encoding="utf-8")
+    return json.loads(text)
+
+
+def write_bundled(path=_SOURCE_DATABASE):
+    """
+    由工作簿重新生成包内的 rings.json，返回文件名。
+    """
+    out = os.path.join(os.path.dirname(os.path.abspath(__file__)), BUNDLED_RINGS)
+    with open(out, "w", encoding="utf-8", newline="\n") as f:
+        json.dump({"version": CACHE_VERSION, "sha256": _sha256(path), "rings": compile_rings(path)}, f, ensure_ascii=False)
+        f.write("\n")
+    return out
+
+
+def load_rings(path=DATABASE_FILE, cache_file=None, force=False):
+    """
+    加载所有环定义，返回 {环键: Ring}，键的顺序与工作表中表格的顺序一致。
+
+    同一进程内只加载一次；缓存有效时不解析工作簿。缓存目录不可写时只是不保存缓存。
+    默认工作簿不存在 (非可编辑安装) 时使用包内的 rings.json。
+    """
+    path = os.path.abspath(path)
+    if not force and path in _loaded:
+        return _loaded[path]
+    if path == _SOURCE_DATABASE and not os.path.exists(path):
+        rings = _loaded[path] = _to_rings(read_bundled()["rings"])
+        return rings
+    cache_file = cache_file or cache_file_for(path)
+    st = os.stat(path)
+    source = {"version": CACHE_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    cached = None
+    if not force:
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+    if cached and cached.get("version") == CACHE_VERSION and cached.get("size") == st.st_size \
+            and (cached.get("mtime_ns") == st.st_mtime_ns or cached.get("sha256") == _sha256(path)):
+        compiled = cached["rings"]
+        stale = cached.get("mtime_ns") != st.st_mtime_ns  # 内容未变，只需更新时间戳
+    else:
+        compiled = compile_rings(path)
+        stale = True
+    if stale:
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(dict(source, sha256=_sha256(path), rings=compiled), f, ensure_ascii=False)
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass
+
+    rings = _loaded[path] = _to_rings(compiled)
+    return rings
+
+
+def dense_ring(key, name, count, start=0.0, names=None):
+    """
+    生成count等分的密集环，从start度起顺时针排列。names 缺省时扇区按起始度数命名 (如 "15°")。
+    """
+    width = 360.0 / count
+    bounds = [round((start + i * width) % 360, 9) for i in range(count + 1)]
+    names = names or [f"{b:g}°" for b in bounds[:count]]
+    return Ring(key, name, [(names[i], bounds[i], bounds[i + 1]) for i in range(count)], {})
+
+
+def get_ring(key, path=DATABASE_FILE):
+    """
+    按键 ("24shan") 或名称 ("二十四山") 查找一个环。工作簿中没有时再查找密集环 (DENSE_RINGS 和 "dense<扇区数>")。
+    """
+    rings = load_rings(path)
+    if key in rings:
+        return rings[key]
+    for ring in rings.values():
+        if ring.name == key:
+            return ring
+    for dense_key, (name, count, start, names) in DENSE_RINGS.items():
+        if key in (dense_key, name):
+            return dense_ring(dense_key, name, count, start, names)
+    match = re.fullmatch(r"dense(\d+)", str(key))
+    if match and int(match.group(1)) >= 1 and 360 % int(match.group(1)) == 0:
+        return dense_ring(key, f"{match.group(1)}等分", int(match.group(1)))
+    raise KeyError(f"未知的环: {key}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把罗盘数据工作簿编译为环定义缓存")
+    parser.add_argument("database", nargs="?", default=DATABASE_FILE, help="罗盘数据工作簿 (.xlsx)")
+    parser.add_argument("--force", action="store_true", help="忽略已有缓存，重新解析工作簿")
+    parser.add_argument("--bundle", action="store_true", help="由工作簿重新生成包内的 rings.json")
+    args = parser.parse_args(argv)
+
+    if args.bundle:
+        print(f"成功！文件 '{write_bundled(args.database)}' 已生成。", file=sys.stderr)
+        return 0
+
+    rings = load_rings(args.database, force=args.force)
+    for ring in rings.values():
+        attributes = f"  属性: {'、'.join(ring.attributes)}" if ring.attributes else ""
+        print(f"{ring.key:8} {ring.name}  {len(ring.sectors)} 个扇区{attributes}")
+    if os.path.exists(args.database):
+        print(f"缓存: {cache_file_for(args.database)}", file=sys.stderr)
+    else:
+        print(f"工作簿 '{args.database}' 不存在，使用包内的 {BUNDLED_RINGS}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+本地罗盘服务：按需生成罗盘KML，供浏览器或Google Earth的NetworkLink直接加载。
+
+    GET /compass.kml?lat=39.9163&lon=116.3972&r=1000&rings=28xiu;24shan
+    GET /compass.kmz?...            同上，输出KMZ
+    GET /link.kml?...               返回指向 /compass.kml 的NetworkLink，在Google Earth中打开即可
+
+参数与批量模式的站点字段相同: lat, lon, r (或 radius), rings, thickness, gaps, tolerance, lod, geodesic, precision, altitude, template, merge, declutter, wireframe, fill。
+
+生成的文档按规范化后的参数缓存在内存中 (LRU)，可选地把被淘汰的文档溢出到磁盘目录。
+响应带ETag，NetworkLink刷新时带 If-None-Match 的请求在内容未变时只返回304。
+只监听本机地址，完全离线运行，多个请求并发处理。
+
+用法:
+    python -m pyluopan.server                       # http://127.0.0.1:8765/
+    python -m pyluopan.server --port 9000 --cache-size 256 --spill-dir ~/.cache/pyluopan/server
+"""
+import argparse
+import collections
+import hashlib
+import html
+import io
+import math
+import os
+import sys
+import threading
+import urllib.parse
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyluopan.batch import parse_site
+from pyluopan.compass import create_kml_compass
+from pyluopan.kml import KMZ_COMPRESSLEVEL
+from pyluopan.registry import get_ring
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 内存中最多缓存的文档数
+DEFAULT_CACHE_SIZE = 128
+
+CONTENT_TYPES = {
+    ".kml": "application/vnd.google-earth.kml+xml; charset=utf-8",
+    ".kmz": "application/vnd.google-earth.kmz",
+}
+
+NETWORK_LINK = '<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2"><NetworkLink><name>{name}</name><Link><href>{href}</href><refreshMode>onInterval</refreshMode><refreshInterval>{interval}</refreshInterval></Link></NetworkLink></kml>\n'
+
+
+def normalize_params(query):
+    """
+    把查询参数规范化为 create_kml_compass 的参数和缓存键。
+    环名统一为键，数值统一为float，因此 "r=1000" 与 "r=1000.0"、"rings=二十八宿" 与 "rings=28xiu" 命中同一缓存。
+    """
+    row = {k: v[-1] for k, v in query.items()}
+    if "r" in row and "radius" not in row:
+        row["radius"] = row["r"]
+    params = parse_site(row)
+    # NaN与任何数比较都为False，因此也会被拒绝
+    if not (-90 <= params["center_lat"] <= 90 and -180 <= params["center_lon"] <= 180):
+        raise ValueError(f"圆心坐标超出范围: lat={params['center_lat']}, lon={params['center_lon']}")
+    for option in ("r1_outer_m", "tolerance_m", "local_tolerance_m"):
+        value = params[option]
+        if value is not None and not (0 < value < math.inf):
+            raise ValueError(f"{option}={value} 必须为有限的正数")
+    params["rings"] = tuple(get_ring(key).key for key in params["rings"])
+    params["fill_rings"] = tuple(sorted({get_ring(key).key for key in params["fill_rings"]}))
+    return params, tuple(sorted((k, tuple(v) if isinstance(v, tuple) else v) for k, v in params.items()))
+
+
+class DocumentCache:
+    """
+    线程安全的LRU文档缓存，值为 (etag, 内容bytes)。
+
+    参数:
+    max_entries (int): 内存中最多保存的文档数
+    spill_dir (str): 设置后，被淘汰的文档写入该目录，未命中内存时再从磁盘读回
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, spill_dir=None):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.hits = self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, hashlib.sha1(repr(key).encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item
+        if self.spill_dir:
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    body = f.read()
+            except OSError:
+                return None
+            item = (make_etag(body), body)
+            self.put(key, item)
+            with self._lock:
+                self.hits += 1
+            return item
+        return None
+
+    def put(self, key, item):
+        evicted = []
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                evicted.append(self._items.popitem(last=False))
+        if self.spill_dir:
+            for old_key, (_, body) in evicted:
+                path = self._spill_path(old_key)
+                if not os.path.exists(path):
+                    tmp = f"{path}.{threading.get_ident()}.tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(body)
+                    os.replace(tmp, path)
+
+    def get_or_render(self, key, render):
+        """
+        取缓存；未命中时调用 render() 生成。同一个键并发请求时只生成一次，其余请求等待结果。
+        """
+        item = self.get(key)
+        if item is not None:
+            return item
+        with self._lock:
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = self._pending[key] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.get(key) or self.get_or_render(key, render)
+        try:
+            body = render()
+            item = (make_etag(body), body)
+            self.put(key, item)
+            with self._lock:
+                self.misses += 1
+            return item
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+
+def make_etag(body):
+    return f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def render_compass(params, kmz=False, compresslevel=KMZ_COMPRESSLEVEL):
+    """
+    在内存中生成一个罗盘文档，返回bytes。
+    """
+    if kmz:
+        buf = io.BytesIO()
+        create_kml_compass(file_name=buf, kmz=True, compresslevel=compresslevel, **params)
+        return buf.getvalue()
+    buf = io.StringIO()
+    create_kml_compass(file_name=buf, **params)
+    return buf.getvalue().encode("utf-8")
+
+
+class CompassRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PyLuoPan"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        route, ext = os.path.splitext(url.path)
+        if route == "/compass" and ext in CONTENT_TYPES:
+            self._compass(query, ext)
+        elif url.path == "/link.kml":
+            self._network_link(url.query)
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"未知的路径: {url.path}")
+
+    def _compass(self, query, ext):
+        try:
+            params, key = normalize_params(query)
+        except Exception as e:  # 参数无法规范化的请求一律回应400
+            self._send_error(HTTPStatus.BAD_REQUEST, f"参数错误: {type(e).__name__}: {e}")
+            return
+        try:
+            etag, body = self.server.cache.get_or_render(key + (ext,), lambda: render_compass(params, kmz=ext == ".kmz"))
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, f"参数错误: {e}")
+            return
+        except Exception as e:  # 生成失败时也要回应，否则处理线程退出，客户端只看到连接被关闭
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"生成失败: {type(e).__name__}: {e}")
+            return
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(HTTPStatus.OK, CONTENT_TYPES[ext], body, etag)
+
+    def _network_link(self, query):
+        host = self.headers.get("Host") or f"{DEFAULT_HOST}:{self.server.server_address[1]}"
+        href = html.escape(f"http://{host}/compass.kml?{query}")
+        interval = self.server.refresh_interval
+        self._send(HTTPStatus.OK, CONTENT_TYPES[".kml"], NETWORK_LINK.format(name="罗盘", href=href, interval=interval).encode("utf-8"))
+
+    def _send(self, status, content_type, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, "text/plain; charset=utf-8", f"{message}\n".encode("utf-8"))
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class CompassServer(ThreadingHTTPServer):
+    """
+    多线程的罗盘HTTP服务，每个请求一个线程，共用同一个文档缓存。
+    """
+    daemon_threads = True
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), cache_size=DEFAULT_CACHE_SIZE, spill_dir=None, refresh_interval=60, quiet=False):
+        super().__init__(address, CompassRequestHandler)
+        self.cache = DocumentCache(cache_size, spill_dir)
+        self.refresh_interval = refresh_interval
+        self.quiet = quiet
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地罗盘KML服务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址 (默认只监听本机)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="内存中最多缓存的文档数")
+    parser.add_argument("--spill-dir", default=None, help="被淘汰的文档溢出到此目录 (默认不溢出)")
+    parser.add_argument("--refresh", type=int, default=60, help="/link.kml 中NetworkLink的刷新间隔 (秒)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出访问日志")
+    args = parser.parse_args(argv)
+
+    spill_dir = os.path.expanduser(args.spill_dir) if args.spill_dir else None
+    with CompassServer((args.host, args.port), args.cache_size, spill_dir, args.refresh, args.quiet) as server:
+        host, port = server.server_address[:2]
+        print(f"罗盘服务已启动: http://{host}:{port}/compass.kml?lat=39.9163&lon=116.3972&r=1000", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+时间序列罗盘：按年/按月等高亮不同扇区的动画 (Google Earth 时间滑块)。
+
+罗盘的几何只输出一次 (静态，始终可见)，之后只输出各帧之间的差异:
+每个高亮扇区是一个带 <TimeSpan> 的叠加多边形，引用共享的高亮样式 (styleUrl)；
+连续多帧高亮同一扇区时合并为一个TimeSpan，因此输出量与"变化次数"成正比，而不是与帧数成正比。
+帧按顺序流式处理，内存中只保存当前正在高亮的扇区。
+
+帧 (Frame):
+    begin, end   时间 (date/datetime 或KML时间字符串，如 "2024-02")
+    highlights   {环键或名称: [扇区名称, ...]} 或 {环键或名称: {扇区名称: 样式id}}
+    name         可选，该帧的标题，显示在圆心处
+
+用法:
+    python -m pyluopan.timeseries --lat 39.9163 --lon 116.3972 -r 1000 --start 2024 --count 10 -o years.kml
+    python -m pyluopan.timeseries --lat 39.9163 --lon 116.3972 -r 1000 --start 2024-01 --count 120 --monthly -o months.kml
+"""
+import argparse
+import collections
+import datetime
+import sys
+
+from pyluopan.arcs import ArcCache
+from pyluopan.compass import (DEFAULT_GAP_PERCENTS, DEFAULT_RINGS, DEFAULT_THICKNESS_PERCENTS, DOCUMENT_FOOTER, DOCUMENT_HEADER,
+                              register_styles, resolve_ring, ring_layout, ring_radii, write_compass)
+from pyluopan.kml import KMZ_COMPRESSLEVEL, KMLWriter, StyleRegistry, Template, escape_text
+from pyluopan.registry import get_ring
+
+Frame = collections.namedtuple("Frame", "begin end highlights name", defaults=(None,))
+
+HIGHLIGHT_STYLE = "styleHighlight"
+HIGHLIGHT_STYLES = (
+    (HIGHLIGHT_STYLE, '<LineStyle><width>3</width><color>ff00ffff</color></LineStyle><PolyStyle><color>a000d7ff</color></PolyStyle>'),
+    ("styleFrameLabel", '<IconStyle><scale>0</scale></IconStyle><LabelStyle><color>ff00ffff</color><scale>1.4</scale><bgColor>b3000000</bgColor></LabelStyle>'),
+)
+
+TIMED_POLYGON = Template('<Placemark><name>{}</name><TimeSpan><begin>{}</begin><end>{}</end></TimeSpan><styleUrl>{}</styleUrl><Polygon><altitudeMode>clampToGround</altitudeMode><outerBoundaryIs><LinearRing><coordinates>{}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>', escape=(0,))
+TIMED_POINT = Template('<Placemark><name>{}</name><TimeSpan><begin>{}</begin><end>{}</end></TimeSpan><styleUrl>{}</styleUrl><Point><coordinates>{}</coordinates></Point></Placemark>', escape=(0,))
+
+# 十二地支 (子=0)，以及六十甲子的天干
+BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+STEMS = "甲乙丙丁戊己庚辛壬癸"
+
+
+def kml_time(t):
+    return t.isoformat() if hasattr(t, "isoformat") else str(t)
+
+
+# ==============================================================================
+# 常用的帧序列
+# ==============================================================================
+
+def yearly_branch_frames(start_year, count, ring="12dizhi"):
+    """
+    逐年高亮当年的地支。年以立春 (按2月4日近似) 为界，帧名为干支纪年，如 "2024 甲辰"。
+    """
+    for year in range(start_year, start_year + count):
+        yield Frame(datetime.date(year, 2, 4), datetime.date(year + 1, 2, 4), {ring: [BRANCHES[(year - 4) % 12]]},
+                    f"{year} {STEMS[(year - 4) % 10]}{BRANCHES[(year - 4) % 12]}")
+
+
+def monthly_branch_frames(start_year, start_month, count, ring="12dizhi"):
+    """
+    逐月高亮当月的月建地支 (寅月起于立春)。月以公历月近似节气，1月为丑、2月为寅、……、12月为子。
+    """
+    year, month = start_year, start_month
+    for _ in range(count):
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        yield Frame(datetime.date(year, month, 1), datetime.date(next_year, next_month, 1), {ring: [BRANCHES[month % 12]]},
+                    f"{year}-{month:02d} {BRANCHES[month % 12]}月")
+        year, month = next_year, next_month
+
+
+# ==============================================================================
+# 生成
+# ==============================================================================
+
+def _highlight_items(highlights):
+    for ring, sectors in highlights.items():
+        items = sectors.items() if isinstance(sectors, dict) else ((name, None) for name in sectors)
+        for name, style_id in items:
+            yield ring, name, style_id or HIGHLIGHT_STYLE
+
+
+def write_frames(kml, arcs, frames, ring_geometry, styles):
+    """
+    流式写出各帧的高亮差异。连续帧中保持高亮的扇区合并为一个TimeSpan。
+
+    参数:
+    arcs (ArcCache): 与静态罗盘共用的圆弧缓存 (高亮多边形直接复用其整圆)
+    frames (可迭代): Frame 序列，按时间顺序
+    ring_geometry (dict): {环键: (外半径, 内半径, {扇区名称: (起始角, 终止角)})}
+    styles (StyleRegistry): 文档样式表，帧中引用的样式id必须已登记
+
+    返回:
+    写出的帧数
+    """
+    runs = {}  # (环键, 扇区, 样式id) -> [开始时间, 最后一帧的结束时间]
+    label_coord = arcs.point_coord(0, 0)
+    count = 0
+
+    def close(key):
+        ring, name, style_id = key
+        begin, end = runs.pop(key)
+        r_outer, r_inner, sectors = ring_geometry[ring]
+        start, stop = sectors[name]
+        kml.writelines(TIMED_POLYGON.parts(name, kml_time(begin), kml_time(end), styles.url(style_id), arcs.segment_coords(r_outer, r_inner, start, stop)))
+
+    for frame in frames:
+        count += 1
+        current = {}  # 按高亮顺序排列 (不用set: 字符串的哈希随进程变化，输出顺序将无法复现)
+        for ring, name, style_id in _highlight_items(frame.highlights):
+            ring = get_ring(ring).key
+            if ring not in ring_geometry:
+                raise ValueError(f"帧 {kml_time(frame.begin)} 高亮的环 '{ring}' 不在罗盘中")
+            if name not in ring_geometry[ring][2]:
+                raise ValueError(f"帧 {kml_time(frame.begin)} 高亮的扇区 '{name}' 不在环 '{ring}' 中")
+            current[(ring, name, style_id)] = None
+        # 本帧不再高亮、或与上一帧不连续的扇区在此结束
+        for key in [k for k, run in runs.items() if k not in current or run[1] != frame.begin]:
+            close(key)
+        for key in current:
+            if key in runs:
+                runs[key][1] = frame.end
+            else:
+                runs[key] = [frame.begin, frame.end]
+        if frame.name:
+            kml.writelines(TIMED_POINT.parts(frame.name, kml_time(frame.begin), kml_time(frame.end), styles.url("styleFrameLabel"), label_coord))
+    for key in list(runs):
+        close(key)
+    return count
+
+
+def create_kml_timeseries(center_lat, center_lon, r1_outer_m, file_name, frames, rings=DEFAULT_RINGS, thick_pcts=DEFAULT_THICKNESS_PERCENTS,
+                          gap_pcts=DEFAULT_GAP_PERCENTS, extra_styles=(), name="罗盘时间序列", description=None, compresslevel=KMZ_COMPRESSLEVEL,
+                          tolerance_m=None, model="sphere", precision=None, altitude=True, kmz=None):
+    """
+    生成时间序列罗盘: 静态罗盘 + 按帧高亮的扇区。
+
+    参数:
+    frames (可迭代): Frame 序列 (可以是生成器)，按时间顺序
+    extra_styles (序列): 帧中用到的其他样式 [(样式id, 样式内容), ...]
+    其余参数同 compass.create_kml_compass
+
+    返回:
+    帧数
+    """
+    if description is None:
+        description = f"从外到内:{'、'.join(resolve_ring(key)[0] for key in rings)}。拖动时间滑块查看各帧。"
+    arcs = ArcCache(center_lat, center_lon, tolerance_m=tolerance_m, model=model, precision=precision, altitude=altitude)
+    ring_geometry = {}
+    for key, (r_outer, r_inner) in zip(rings, ring_radii(r1_outer_m, thick_pcts, gap_pcts)):
+        ring = get_ring(key)
+        ring_geometry[ring.key] = (r_outer, r_inner, {s[0]: (s[1], s[2]) for s in ring.sectors})
+
+    styles = register_styles(StyleRegistry())
+    for style_id, body in HIGHLIGHT_STYLES + tuple(extra_styles):
+        styles.register(style_id, body)
+    with KMLWriter(file_name, kmz=kmz, compresslevel=compresslevel) as kml:
+        kml.write(DOCUMENT_HEADER.format(name=escape_text(name), description=escape_text(description)))
+        styles.write(kml)
+        write_compass(kml, center_lat, center_lon, r1_outer_m, rings, thick_pcts, gap_pcts, arcs=arcs)
+        with kml.folder("时间序列"):
+            count = write_frames(kml, arcs, frames, ring_geometry, styles)
+        kml.write(DOCUMENT_FOOTER)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成逐年/逐月高亮地支的时间序列罗盘")
+    parser.add_argument("--lat", type=float, required=True, help="圆心纬度")
+    parser.add_argument("--lon", type=float, required=True, help="圆心经度")
+    parser.add_argument("-r", "--radius", type=float, required=True, help="最外环外部半径 (米)")
+    parser.add_argument("--start", required=True, help="起始年 (YYYY) 或起始月 (YYYY-MM，配合 --monthly)")
+    parser.add_argument("--count", type=int, default=10, help="帧数")
+    parser.add_argument("--monthly", action="store_true", help="逐月高亮月建地支 (默认逐年高亮年支)")
+    parser.add_argument("--rings", nargs="+", default=list(DEFAULT_RINGS), help="罗盘的环 (从外到内)，须包含十二地支")
+    parser.add_argument("--thickness", nargs="+", type=float, default=None, metavar="PCT", help="各环厚度 (本环外半径的百分比)")
+    parser.add_argument("--gap", nargs="+", type=float, default=None, metavar="PCT", help="相邻环间距 (最外环半径的百分比)")
+    parser.add_argument("--tolerance", type=float, default=None, help="弧线最大弦高误差 (米)")
+    parser.add_argument("-o", "--output", default="-", help="输出文件 (.kml/.kmz，'-' 为标准输出)")
+    args = parser.parse_args(argv)
+
+    year, _, month = args.start.partition("-")
+    if args.monthly:
+        frames = monthly_branch_frames(int(year), int(month or 1), args.count)
+    else:
+        frames = yearly_branch_frames(int(year), args.count)
+    try:
+        thick_pcts, gap_pcts = ring_layout(args.rings, args.thickness, args.gap)
+    except ValueError as e:
+        parser.error(f"{e}，请指定 --thickness/--gap")
+    count = create_kml_timeseries(args.lat, args.lon, args.radius, args.output, frames, rings=args.rings,
+                                  thick_pcts=thick_pcts, gap_pcts=gap_pcts, tolerance_m=args.tolerance)
+    if args.output != "-":
+        print(f"成功！文件 '{args.output}' 已生成，共 {count} 帧。", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
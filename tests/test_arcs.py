@@ -0,0 +1,55 @@
+import math
+from fractions import Fraction
+
+import pytest
+
+from pyluopan.arcs import BASE_STEP, MIN_STEP, ArcCache, densify_step, grid_divisions
+
+
+@pytest.mark.parametrize("tolerance", [0, -1.0, math.nan])
+def test_densify_step_rejects_bad_tolerance(tolerance):
+    with pytest.raises(ValueError):
+        densify_step(1000, tolerance_m=tolerance)
+    with pytest.raises(ValueError):
+        densify_step(1000, tolerance_px=tolerance)
+
+
+@pytest.mark.parametrize("option", ["tolerance_m", "tolerance_px"])
+def test_arc_cache_rejects_bad_tolerance(option):
+    with pytest.raises(ValueError):
+        ArcCache(39.9, 116.4, **{option: 0})
+
+
+@pytest.mark.parametrize("r", [1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000])
+@pytest.mark.parametrize("tolerance_m", [1e-4, 0.01, 0.5, 10])
+def test_densify_step_is_exact_grid_divisor(r, tolerance_m):
+    step = densify_step(r, tolerance_m=tolerance_m)
+    k = BASE_STEP / step
+    assert k.is_integer()
+    # 间隔为有限二进制小数: 逐次累加到 BASE_STEP 没有舍入误差
+    assert Fraction(step) * int(k) == Fraction(BASE_STEP)
+    total = 0.0
+    for _ in range(int(k)):
+        total += step
+    assert total == BASE_STEP
+    assert MIN_STEP <= step <= BASE_STEP
+    if step > MIN_STEP * 2:
+        assert r * (1 - math.cos(math.radians(step) / 2)) <= tolerance_m * (1 + 1e-9)
+
+
+def test_grid_divisions():
+    assert grid_divisions(11) == 12
+    assert grid_divisions(12) == 12
+    assert grid_divisions(150, down=True) == 128
+    assert grid_divisions(1) == 1
+
+
+@pytest.mark.parametrize("r", [10, 1000, 100_000])
+def test_adaptive_grid_hits_sector_boundaries(r):
+    arcs = ArcCache(39.9, 116.4, tolerance_m=0.01)
+    # 二十八宿以外各环的边界都是7.5度的整数倍，必须正好落在网格上，才能共用整圆的顶点
+    for bearing in (0, 7.5, 15, 22.5, 337.5, 345, 352.5):
+        assert arcs._grid_index(r, bearing) is not None
+    lons, lats = arcs.arc_points(r, 345, 15)
+    assert (lats[0], lons[0]) == arcs.point(r, 345)
+    assert (lats[-1], lons[-1]) == arcs.point(r, 15)
@@ -0,0 +1,67 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from pyluopan.batch import InvalidRow, read_sites, run_batch, safe_file_stem, site_file_stems
+from pyluopan.compass import create_kml_compass
+
+SITE = {"lat": "39.9", "lon": "116.4", "radius": "500", "rings": "24shan;8gua", "thickness": "30;20", "gaps": "5"}
+
+
+def test_safe_file_stem():
+    assert safe_file_stem("故宫") == "故宫"
+    assert "/" not in safe_file_stem("../../etc/passwd") and not safe_file_stem("../x").startswith(".")
+    assert safe_file_stem("/abs/path") == "_abs_path"
+    assert safe_file_stem("CON") == "_CON" and safe_file_stem("nul.txt") == "_nul.txt"
+    assert safe_file_stem(" .. ") == "site"
+    assert len(safe_file_stem("x" * 300)) == 100
+
+
+def test_site_file_stems_are_unique():
+    rows = [{"id": "A"}, {"id": "a"}, {"id": "a/"}, {"id": "a_"}, {}, {"id": "site5"}]
+    stems = site_file_stems(rows)
+    assert len({s.lower() for s in stems}) == len(stems)
+    assert stems[:2] == ["A", "a-2"]
+
+
+def test_files_stay_in_output_directory(tmp_path):
+    out = tmp_path / "out"
+    rows = [dict(SITE, id=site_id) for site_id in ("../escape", "R&D", "r&d", "<A>")]
+    done, errors = run_batch(rows, str(out), workers=1, progress=None)
+    assert (done, errors) == (4, [])
+    assert sorted(os.listdir(str(tmp_path))) == ["out"]
+    assert len(os.listdir(str(out))) == 4
+
+
+def test_names_are_escaped(tmp_path):
+    rows = [dict(SITE, id=site_id) for site_id in ("R&D", "<A>")]
+    combined = str(tmp_path / "all.kml")
+    run_batch(rows, combined, combined=True, workers=1, progress=None)
+    ns = "{http://www.opengis.net/kml/2.2}"
+    names = [e.text for e in ET.parse(combined).iter(f"{ns}name")]
+    assert "R&D" in names and "<A>" in names
+
+    single = str(tmp_path / "one.kml")
+    create_kml_compass(39.9, 116.4, 500, single, name="a&b<c>")
+    assert ET.parse(single).find(f"{ns}Document/{ns}name").text == "a&b<c>"
+
+
+def test_bad_jsonl_rows_are_site_errors(tmp_path):
+    sites = tmp_path / "sites.jsonl"
+    good = json.dumps(dict(SITE, id="ok"))
+    sites.write_text("\n".join([good, '{"id": "broken", "lat": ', "[1, 2]", "null", "", json.dumps(dict(SITE, id="ok2"))]) + "\n",
+                     encoding="utf-8")
+    rows = read_sites(str(sites))
+    assert len(rows) == 5 and isinstance(rows[1], InvalidRow) and rows[1].line == 2
+    for workers in (1, 2):
+        out = tmp_path / f"out{workers}"
+        done, errors = run_batch(rows, str(out), workers=workers, progress=None)
+        assert done == 2
+        assert [site_id for site_id, _ in errors] == ["site2", "site3", "site4"]
+        assert "第2行不是有效的JSON" in errors[0][1] and "不是JSON对象" in errors[1][1]
+        assert sorted(os.listdir(str(out))) == ["ok.kml", "ok2.kml"]
+
+        combined = str(tmp_path / f"all{workers}.kml")
+        done, errors = run_batch(rows, combined, combined=True, workers=workers, progress=None)
+        assert done == 2 and len(errors) == 3
+        ET.parse(combined)
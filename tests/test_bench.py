@@ -0,0 +1,18 @@
+import pytest
+
+import bench
+
+
+def test_compare_without_baseline_fails_fast(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(bench, "build_cases", lambda: pytest.fail("不应运行用例"))
+    with pytest.raises(SystemExit) as e:
+        bench.main(["--compare", "--baseline", str(tmp_path / "baseline.json")])
+    assert e.value.code == 2
+    assert "--save-baseline" in capsys.readouterr().err
+
+
+def test_compare_flags_regressions():
+    baseline = {"compass": {"seconds": 1.0, "peak_bytes": 1000, "vertices": 10, "bytes": 100}}
+    results = {"compass": {"seconds": 2.0, "peak_bytes": 1000, "vertices": 10, "bytes": 100}}
+    assert [r[:2] for r in bench.compare(results, baseline)] == [("compass", "seconds")]
+    assert bench.compare(baseline, baseline) == []
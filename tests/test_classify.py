@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyluopan.arcs import ArcCache  # noqa: E402
+from pyluopan.classify import SectorIndex, classify_points, inverse_points, read_points  # noqa: E402
+from pyluopan.registry import get_ring  # noqa: E402
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "source")
+CENTER = (39.911198, 116.380719)
+
+
+def _points(bearings, r=1000.0):
+    arcs = ArcCache(*CENTER)
+    points = [arcs.point(r, b) for b in bearings]
+    return [p[0] for p in points], [p[1] for p in points]
+
+
+def test_inverse_points_round_trip():
+    bearings = [0.0, 7.5, 90.0, 181.25, 359.5]
+    lats, lons = _points(bearings, 2500.0)
+    b, d = inverse_points(*CENTER, lats, lons)
+    assert b == pytest.approx(bearings, abs=1e-9)
+    assert d == pytest.approx([2500.0] * 5, abs=1e-6)
+
+
+def test_zi_sector_wraps_past_zero():
+    # 十二地支的子为 345~15 度，跨越0度
+    lats, lons = _points([345.001, 350.0, 0.0, 10.0, 14.999, 15.001, 344.999])
+    table = classify_points(*CENTER, lats, lons, rings=["12dizhi"])
+    assert list(table["12dizhi"]) == ["子", "子", "子", "子", "子", "丑", "亥"]
+    sectors = get_ring("12dizhi").sectors
+    assert [sectors[i][0] for i in table["12dizhi_index"]] == list(table["12dizhi"])
+    # 恰好在边界上的方位角属于从该边界开始的扇区
+    index = SectorIndex(sectors)
+    assert list(index.names_of(index.lookup([345.0, 15.0, 360.0, -15.0]))) == ["子", "丑", "子", "子"]
+
+
+def test_every_ring_matches_sector_bounds():
+    bearings = np.arange(0.25, 360.0, 0.5)
+    lats, lons = _points(bearings)
+    table = classify_points(*CENTER, lats, lons)
+    for key in ("28xiu", "24shan", "12dizhi", "8gua"):
+        for bearing, name in zip(bearings, table[key]):
+            start, end = next((s, e) for n, s, e in get_ring(key).sectors if n == name)
+            assert (bearing - start) % 360 < (end - start) % 360
+
+
+def test_points_outside_every_sector():
+    index = SectorIndex([("甲", 350.0, 10.0), ("乙", 90.0, 180.0)])
+    indices = index.lookup([355.0, 5.0, 10.0, 45.0, 90.0, 179.9, 180.0, 300.0])
+    assert list(indices) == [0, 0, -1, -1, 1, 1, -1, -1]
+    assert list(index.names_of(indices)) == ["甲", "甲", "", "", "乙", "乙", "", ""]
+
+
+def test_read_points_uses_header_names(tmp_path):
+    path = tmp_path / "points.csv"
+    path.write_text('﻿"name", y ,x\n"a,b",39.9,116.4\nc,40.0,116.5\n', encoding="utf-8")
+    lats, lons = read_points(str(path), "y", "x")
+    assert list(lats) == [39.9, 40.0] and list(lons) == [116.4, 116.5]
+    with pytest.raises(KeyError):
+        read_points(str(path))
+
+
+def test_numpy_switch_is_honoured():
+    env = dict(os.environ, PYLUOPAN_NUMPY="0", PYTHONPATH=SOURCE_DIR)
+    code = ("import sys, pyluopan.classify as c\n"
+            "assert 'numpy' not in sys.modules\n"
+            "try:\n    c.classify_points(0, 0, [1], [1])\nexcept ImportError:\n    pass\nelse:\n    sys.exit(1)\n")
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
@@ -0,0 +1,43 @@
+import pytest
+
+from pyluopan.cli import main as cli_main
+from pyluopan.compass import DEFAULT_GAP_PERCENTS, DEFAULT_THICKNESS_PERCENTS, ring_layout, ring_radii
+from pyluopan.export import main as export_main
+
+SIX_RINGS = ["28xiu", "24shan", "12dizhi", "8gua", "60toudi", "dense72"]
+
+
+def test_default_layout_up_to_four_rings():
+    assert ring_layout(["28xiu", "24shan", "12dizhi", "8gua"]) == (DEFAULT_THICKNESS_PERCENTS, DEFAULT_GAP_PERCENTS)
+    assert ring_layout(["24shan", "8gua"]) == ((20, 20), (5,))
+    assert ring_layout(["8gua"]) == ((20,), ())
+
+
+@pytest.mark.parametrize("n", [5, 6, 12])
+def test_default_layout_for_more_rings(n):
+    thick_pcts, gap_pcts = ring_layout(SIX_RINGS[:1] * n)
+    radii = ring_radii(100.0, thick_pcts, gap_pcts)
+    widths = [r_outer - r_inner for r_outer, r_inner in radii]
+    assert widths == pytest.approx([75.0 / n] * n)
+    assert radii[-1][1] == pytest.approx(10.0)
+
+
+@pytest.mark.parametrize("thick_pcts, gap_pcts", [((20,), None), ((20, 20, 20), None), ((20, 0), (5,)), ((60, 60), (50,))])
+def test_bad_layout(thick_pcts, gap_pcts):
+    with pytest.raises(ValueError):
+        ring_layout(["24shan", "8gua"], thick_pcts, gap_pcts)
+
+
+def test_export_more_than_four_rings(tmp_path, capsys):
+    out = str(tmp_path / "six.geojson")
+    assert export_main(["--lat", "39.9", "--lon", "116.4", "-r", "1000", "--rings", *SIX_RINGS, "-o", out]) == 0
+    with pytest.raises(SystemExit) as e:
+        export_main(["--lat", "39.9", "--lon", "116.4", "-r", "1000", "--rings", *SIX_RINGS, "--thickness", "10", "-o", out])
+    assert e.value.code == 2
+    assert "请指定 --thickness/--gap" in capsys.readouterr().err
+
+
+def test_render_rejects_oversized_layout(tmp_path):
+    with pytest.raises(SystemExit):
+        cli_main(["render", "--lat", "39.9", "--lon", "116.4", "-r", "1000", "--rings", "24shan", "8gua",
+                  "--thickness", "60", "60", "--gap", "50", "-o", str(tmp_path / "x.kml")])
@@ -0,0 +1,102 @@
+import io
+import struct
+
+import pytest
+
+from pyluopan.flatgeobuf import MAGIC, hilbert, hilbert_order, level_bounds, packed_rtree, write_flatgeobuf
+
+COLUMNS = [("name", "String"), ("index", "Int")]
+
+
+def _square(x, y, size=1.0):
+    return [[(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)]]
+
+
+def _features(count):
+    return [("Polygon", _square(i % 10, i // 10), {"name": f"扇区{i}", "index": i}) for i in range(count)]
+
+
+def _write(features, **options):
+    buf = io.BytesIO()
+    write_flatgeobuf(buf, features, COLUMNS, name="罗盘", **options)
+    return buf.getvalue()
+
+
+def _split(data, count, node_size):
+    """
+    按长度前缀切分文件: 返回 (头部, 索引, [要素, ...])。
+    """
+    assert data[:8] == MAGIC
+    header_size, = struct.unpack_from("<I", data, 8)
+    header = data[12:12 + header_size]
+    pos = 12 + header_size
+    index_size = 40 * level_bounds(count, node_size)[0][1] if node_size else 0
+    index = data[pos:pos + index_size]; pos += index_size
+    features = []
+    while pos < len(data):
+        size, = struct.unpack_from("<I", data, pos)
+        features.append(data[pos + 4:pos + 4 + size]); pos += 4 + size
+    assert pos == len(data)
+    return header, index, features
+
+
+def test_level_bounds():
+    assert level_bounds(1, 16) == [(1, 2), (0, 1)]
+    assert level_bounds(100, 16) == [(8, 108), (1, 8), (0, 1)]
+    assert level_bounds(16, 16) == [(1, 17), (0, 1)]
+
+
+def test_hilbert_corners():
+    assert hilbert(0, 0) == 0
+    assert len({hilbert(x, y) for x in range(0, 0x10000, 0x1000) for y in range(0, 0x10000, 0x1000)}) == 256
+
+
+@pytest.mark.parametrize("count, node_size", [(1, 16), (37, 16), (100, 4), (20, 0)])
+def test_layout(count, node_size):
+    features = _features(count)
+    header, index, encoded = _split(_write(features, node_size=node_size), count, node_size)
+    assert len(encoded) == count
+    assert "罗盘".encode("utf-8") in header
+    if not node_size:
+        assert index == b""
+        return
+    nodes = [struct.unpack_from("<4dQ", index, i) for i in range(0, len(index), 40)]
+    # 根节点的外包框为全部要素的范围
+    assert nodes[0][:4] == (0.0, 0.0, float(min(count, 10)), float((count - 1) // 10 + 1))
+    # 叶子节点按Hilbert顺序排列，偏移指向对应要素的长度前缀
+    leaf_start = level_bounds(count, node_size)[0][0]
+    boxes = [(x, y, x + 1.0, y + 1.0) for x, y in ((i % 10, i // 10) for i in range(count))]
+    order = hilbert_order(boxes, nodes[0][:4])
+    offset = 0
+    for k, i in enumerate(order):
+        leaf = nodes[leaf_start + k]
+        assert leaf[:4] == boxes[i] and leaf[4] == offset
+        assert f"扇区{i}".encode("utf-8") in encoded[k]
+        offset += 4 + len(encoded[k])
+
+
+def test_packed_rtree_parents_contain_children():
+    boxes = [(float(i), float(i % 7), i + 0.5, i % 7 + 0.5) for i in range(50)]
+    index = packed_rtree(boxes, list(range(50)), node_size=4)
+    nodes = [struct.unpack_from("<4dQ", index, i) for i in range(0, len(index), 40)]
+    bounds = level_bounds(50, 4)
+    for (child_start, child_end), (parent_start, parent_end) in zip(bounds, bounds[1:]):
+        for parent in range(parent_start, parent_end):
+            first = nodes[parent][4]
+            assert child_start <= first < child_end
+            for child in nodes[first:min(first + 4, child_end)]:
+                assert nodes[parent][0] <= child[0] and nodes[parent][1] <= child[1]
+                assert child[2] <= nodes[parent][2] and child[3] <= nodes[parent][3]
+
+
+def test_read_back_with_gdal(tmp_path):
+    pyogrio = pytest.importorskip("pyogrio")
+    path = tmp_path / "compass.fgb"
+    path.write_bytes(_write(_features(37)))
+    meta = pyogrio.read_info(str(path))
+    assert meta["features"] == 37 and list(meta["fields"]) == ["name", "index"]
+    _, _, geometry, fields = pyogrio.raw.read(str(path))
+    rows = sorted(zip(fields[1], fields[0]))
+    assert [index for index, _ in rows] == list(range(37))
+    assert all(name == f"扇区{index}" for index, name in rows)
+    assert len(geometry) == 37
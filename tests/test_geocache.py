@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from pyluopan.geocache import GeometryStore  # noqa: E402
+
+ENTRY = {"lats": [0.0] * 100, "lons": [1.0] * 100}  # 两个 .npy 各 128 + 800 字节
+
+
+def _touch(store, key, t):
+    os.utime(os.path.join(store.directory, key), (t, t))
+
+
+def test_save_and_load(tmp_path):
+    store = GeometryStore(str(tmp_path))
+    key = GeometryStore.key("circle", 39.9, 116.4, 1000.0)
+    assert store.load(key) is None
+    store.save(key, ENTRY)
+    arrays = store.load(key)
+    assert list(arrays["lats"]) == ENTRY["lats"] and list(arrays["lons"]) == ENTRY["lons"]
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_running_total_matches_directory(tmp_path):
+    store = GeometryStore(str(tmp_path))
+    for i in range(5):
+        store.save(GeometryStore.key(i), ENTRY)
+    on_disk = sum(size for _, size, _ in store._entries())
+    assert store.total_bytes == on_disk
+    # 重新打开时由目录统计
+    assert GeometryStore(str(tmp_path)).total_bytes == on_disk
+
+
+def test_save_does_not_rescan_below_limit(tmp_path, monkeypatch):
+    store = GeometryStore(str(tmp_path))
+    scans = []
+    monkeypatch.setattr(store, "_entries", lambda: scans.append(1) or [])
+    for i in range(10):
+        store.save(GeometryStore.key(i), ENTRY)
+    assert scans == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    store = GeometryStore(str(tmp_path))
+    keys = [GeometryStore.key(i) for i in range(4)]
+    for t, key in enumerate(keys):
+        store.save(key, ENTRY)
+        _touch(store, key, 1_000_000 + t)
+    entry_size = store.total_bytes // len(keys)
+    _touch(store, keys[0], 2_000_000)  # 最早的条目刚刚被使用过
+
+    store.max_bytes = entry_size * 4
+    store.save(GeometryStore.key("new"), ENTRY)
+    remaining = set(os.listdir(str(tmp_path)))
+    assert keys[1] not in remaining
+    assert {keys[0], keys[2], keys[3], GeometryStore.key("new")} <= remaining
+    assert store.total_bytes == entry_size * 4 == sum(size for _, size, _ in store._entries())
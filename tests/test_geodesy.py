@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from pyluopan.geodesy import destination_points, get_destination_point, get_destination_point_wgs84, vincenty_direct
+
+
+def _dms(d, m, s):
+    sign = -1 if d < 0 else 1
+    return sign * (abs(d) + m / 60 + s / 3600)
+
+
+# Vincenty (1975) 的算例: Flinders Peak -> Buninyong
+FLINDERS_PEAK = (_dms(-37, 57, 3.72030), _dms(144, 25, 29.52440))
+BUNINYONG = (_dms(-37, 39, 10.15610), _dms(143, 55, 35.38390))
+AZIMUTH = _dms(306, 52, 5.37)
+DISTANCE = 54972.271
+TOLERANCE_DEG = 1e-8  # 约1毫米
+
+
+def test_scalar_wgs84_reference_case():
+    lat, lon = get_destination_point_wgs84(*FLINDERS_PEAK, AZIMUTH, DISTANCE)
+    assert lat == pytest.approx(BUNINYONG[0], abs=TOLERANCE_DEG)
+    assert lon == pytest.approx(BUNINYONG[1], abs=TOLERANCE_DEG)
+
+
+def test_vincenty_direct_reference_case():
+    pytest.importorskip("numpy")
+    lats, lons, converged = vincenty_direct(*FLINDERS_PEAK, [AZIMUTH], [DISTANCE])
+    assert converged.all()
+    assert lats[0] == pytest.approx(BUNINYONG[0], abs=TOLERANCE_DEG)
+    assert lons[0] == pytest.approx(BUNINYONG[1], abs=TOLERANCE_DEG)
+
+
+@pytest.mark.parametrize("lat, lon", [(39.911198, 116.380719), (-37.95, 144.42), (0.0, 0.0), (85.0, -170.0)])
+def test_vincenty_direct_matches_scalar(lat, lon):
+    pytest.importorskip("numpy")
+    rng = random.Random(42)
+    bearings = [rng.uniform(0, 360) for _ in range(200)] + [0.0, 90.0, 180.0, 270.0]
+    dists = [10 ** rng.uniform(0, 6) for _ in range(200)] + [1000.0] * 4
+    lats, lons, converged = vincenty_direct(lat, lon, bearings, dists)
+    assert converged.all()
+    expected = [get_destination_point_wgs84(lat, lon, b, d) for b, d in zip(bearings, dists)]
+    assert list(lats) == pytest.approx([p[0] for p in expected], abs=1e-10)
+    assert list(lons) == pytest.approx([p[1] for p in expected], abs=1e-10)
+
+
+@pytest.mark.parametrize("model, scalar", [("sphere", get_destination_point), ("wgs84", get_destination_point_wgs84)])
+def test_destination_points_numpy_and_python_paths_agree(model, scalar):
+    pytest.importorskip("numpy")
+    bearings = [i * 0.5 for i in range(720)]
+    lats, lons = destination_points(39.9, 116.4, bearings, 100000.0, model=model)
+    expected = [scalar(39.9, 116.4, b, 100000.0) for b in bearings]
+    assert lats == pytest.approx([p[0] for p in expected], abs=1e-10)
+    assert lons == pytest.approx([p[1] for p in expected], abs=1e-10)
@@ -0,0 +1,57 @@
+"""
+回归测试: 用 kmldiff 把生成的KML与 kml/ 中的参考文件逐个地标比较。
+"""
+import os
+
+import pytest
+
+import bench
+from pyluopan.compass import create_kml_compass
+from pyluopan.export import main as export_main
+from pyluopan.kmldiff import diff_kml
+
+SCRIPTS = ("import math.py", "28xiu.py", "28xiu+24shan.py", "28xiu+24shan+12dizhi.py", "28xiu+24shan+12dizhi+8卦.py")
+V11_REFERENCE = os.path.join(bench.REFERENCE_DIR, "celestial_final_map_v11.kml")
+
+
+@pytest.mark.parametrize("file_name", SCRIPTS)
+def test_script_matches_reference(file_name):
+    reference = os.path.join(bench.REFERENCE_DIR, bench._scripts()[file_name].OUTPUT_KML_FILE)
+    expected = bench.EXPECTED_DIFFERENCES.get(os.path.basename(reference), ())
+    report = bench.compare_reference(bench.script_call(file_name), reference, expected=expected)
+    assert report.ok, report.text()
+
+
+@pytest.mark.parametrize("suffix, options", [(".kml", {}), (".kmz", {}), (".kml", {"workers": 2})])
+def test_compass_matches_reference(tmp_path, suffix, options):
+    out = str(tmp_path / f"compass{suffix}")
+    create_kml_compass(39.911198, 116.380719, 1000, out, **options)
+    report = diff_kml(V11_REFERENCE, out)
+    assert report.ok, report.text()
+
+
+def test_export_kml_matches_reference(tmp_path):
+    # export 的 write_kml 与 create_kml_compass 共用 kml.py 中的片段模板 (含中心十字的 MultiGeometry)
+    out = str(tmp_path / "export.kml")
+    assert export_main(["--lat", "39.911198", "--lon", "116.380719", "-r", "1000", "-o", out]) == 0
+    report = diff_kml(V11_REFERENCE, out)
+    assert report.ok, report.text()
+
+
+def test_triple_ring_zi_spans_boundary():
+    # 参考文件中三环图的子 (345~15度) 画错了；修正后只有这一个扇区与参考文件不同
+    reference = os.path.join(bench.REFERENCE_DIR, "celestial_triple_ring_map.kml")
+    report = bench.compare_reference(bench.script_call("28xiu+24shan+12dizhi.py"), reference)
+    failed = {"/".join(path): f for path, f in report.folders.items() if not f.ok}
+    assert list(failed) == ["环3：十二地支"]
+    diff = failed["环3：十二地支"]
+    assert diff.coordinate_mismatches == 1 and diff.style_mismatches == diff.missing == diff.extra == 0
+    assert all(d.startswith("子") for d in diff.details)
+
+
+def test_diff_detects_moved_compass(tmp_path):
+    out = str(tmp_path / "moved.kml")
+    create_kml_compass(39.911198, 116.380719 + 1e-7, 1000, out)
+    report = diff_kml(V11_REFERENCE, out, tolerance_m=0.001)
+    assert not report.ok
+    assert 0.005 < report.max_deviation_m < 0.02
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from pyluopan import registry
+
+
+def test_bundled_rings_match_workbook():
+    # 工作簿修改后须运行 pyluopan rings --bundle 重新生成包内的 rings.json
+    bundled = registry.read_bundled()
+    assert bundled["version"] == registry.CACHE_VERSION
+    if not os.path.exists(registry._SOURCE_DATABASE):
+        pytest.skip("没有 database/ 目录")
+    assert bundled["sha256"] == registry._sha256(registry._SOURCE_DATABASE)
+    assert bundled["rings"] == registry.compile_rings(registry._SOURCE_DATABASE)
+
+
+def test_falls_back_to_bundled_rings(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "_SOURCE_DATABASE", str(tmp_path / "missing.xlsx"))
+    monkeypatch.setattr(registry, "_loaded", {})
+    rings = registry.load_rings(registry._SOURCE_DATABASE)
+    assert list(rings) == ["8gua", "12dizhi", "24shan", "28xiu"]
+    assert rings["28xiu"].attributes["五行"]
+
+
+def test_missing_explicit_workbook_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        registry.load_rings(str(tmp_path / "other.xlsx"))
+
+
+def test_dense_rings():
+    ring = registry.get_ring("dense72")
+    assert len(ring.sectors) == 72 and ring.sectors[1][1] == 5.0
+    assert registry.get_ring("透地六十龙").sectors[0][0] == "甲子"
+
+
+@pytest.mark.parametrize("key", ["dense0", "dense000", "dense7", "dense-4", "dense"])
+def test_unknown_dense_ring(key):
+    with pytest.raises(KeyError, match="未知的环"):
+        registry.get_ring(key)
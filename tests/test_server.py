@@ -0,0 +1,75 @@
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from pyluopan import server
+
+
+@pytest.fixture
+def base_url():
+    httpd = server.CompassServer(("127.0.0.1", 0), quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _query(**params):
+    return urllib.parse.urlencode(dict({"lat": 39.9, "lon": 116.4, "r": 500, "rings": "24shan;8gua"}, **params))
+
+
+def test_normalize_params_shares_cache_key():
+    _, a = server.normalize_params({"lat": ["39.9"], "lon": ["116.4"], "r": ["1000"], "rings": ["二十四山"]})
+    _, b = server.normalize_params({"lat": ["39.9"], "lon": ["116.4"], "radius": ["1000.0"], "rings": ["24shan"]})
+    assert a == b
+
+
+@pytest.mark.parametrize("params", [{"lat": "nan"}, {"lat": "91"}, {"lon": "-180.5"}, {"lon": "inf"}, {"r": "0"}, {"r": "-5"},
+                                    {"tolerance": "0"}, {"tolerance": "nan"}, {"template": "-1"}])
+def test_normalize_params_rejects(params):
+    with pytest.raises(ValueError):
+        server.normalize_params({k: [str(v)] for k, v in dict({"lat": 39.9, "lon": 116.4, "r": 500}, **params).items()})
+
+
+def test_bad_request(base_url):
+    status, body = _get(f"{base_url}/compass.kml?{_query(lat='nan')}")
+    assert status == 400 and "参数错误" in body.decode("utf-8")
+
+
+def test_render_failure_is_500(base_url, monkeypatch):
+    def fail(params, kmz=False):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(server, "render_compass", fail)
+    status, body = _get(f"{base_url}/compass.kml?{_query()}")
+    assert status == 500 and "RuntimeError" in body.decode("utf-8")
+
+
+def test_compass(base_url):
+    status, body = _get(f"{base_url}/compass.kml?{_query()}")
+    assert status == 200 and body.startswith(b"<?xml")
+
+
+@pytest.mark.parametrize("rings", ["dense0", "dense7", "无此环"])
+def test_unknown_ring_is_400(base_url, rings):
+    status, body = _get(f"{base_url}/compass.kml?{_query(rings=rings)}")
+    assert status == 400 and "未知的环" in body.decode("utf-8")
+
+
+def test_any_normalization_failure_is_400(base_url, monkeypatch):
+    def fail(key):
+        raise ZeroDivisionError("division by zero")
+    monkeypatch.setattr(server, "get_ring", fail)
+    status, body = _get(f"{base_url}/compass.kml?{_query()}")
+    assert status == 400 and "ZeroDivisionError" in body.decode("utf-8")
@@ -0,0 +1,47 @@
+import os
+import re
+import subprocess
+import sys
+
+from pyluopan.timeseries import BRANCHES, Frame, create_kml_timeseries, monthly_branch_frames
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "source")
+
+# 每帧同时高亮多个环的多个扇区，部分扇区跨帧保持高亮
+SCRIPT = """
+import sys
+from pyluopan.timeseries import Frame, create_kml_timeseries
+frames = [Frame(f"{2000 + i}", f"{2001 + i}", {"12dizhi": ["子", "丑", "寅"][i % 3:] + ["卯"], "24shan": ["壬", "子", "癸", "丑"][: 4 - i % 2],
+                                                 "8gua": ["坎", "艮", "震", "巽"][i % 4:]}) for i in range(8)]
+create_kml_timeseries(39.9, 116.4, 500, sys.stdout, frames)
+"""
+
+
+def _run(seed):
+    env = dict(os.environ, PYTHONHASHSEED=str(seed), PYTHONPATH=SOURCE_DIR)
+    return subprocess.run([sys.executable, "-c", SCRIPT], env=env, stdout=subprocess.PIPE, check=True).stdout
+
+
+def test_output_does_not_depend_on_hash_seed():
+    first = _run(0)
+    assert b"<TimeSpan>" in first
+    for seed in (1, 2, 12345):
+        assert _run(seed) == first
+
+
+def test_consecutive_frames_share_one_time_span(tmp_path):
+    out = str(tmp_path / "series.kml")
+    frames = [Frame("2000", "2001", {"12dizhi": ["子", "午"]}), Frame("2001", "2002", {"12dizhi": ["子"]}),
+              Frame("2003", "2004", {"12dizhi": ["子"]})]
+    assert create_kml_timeseries(39.9, 116.4, 500, out, frames) == 3
+    with open(out, encoding="utf-8") as f:
+        text = f.read()
+    spans = re.findall(r"<name>(.)</name><TimeSpan><begin>(\d+)</begin><end>(\d+)</end>", text)
+    # 子 在2000~2002连续高亮，2003又单独高亮一次；午 只在第一帧
+    assert sorted(spans) == [("午", "2000", "2001"), ("子", "2000", "2002"), ("子", "2003", "2004")]
+
+
+def test_monthly_frames():
+    frames = list(monthly_branch_frames(2024, 11, 3))
+    assert [f.highlights["12dizhi"] for f in frames] == [[BRANCHES[11]], [BRANCHES[0]], [BRANCHES[1]]]
+    assert frames[1].end.year == 2025 and frames[1].end.month == 1